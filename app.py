@@ -1,17 +1,26 @@
 import os
+import time
 import streamlit as st
 import sys
 
+# スクリプトの開始時刻（再実行ごとの所要時間の計測に使用する）
+script_started_at = time.perf_counter()
+
 # スタイルとタイトル設定
 st.set_page_config(page_title="OpenAI Agents UI", layout="wide")
 st.title("OpenAI Agents デモ")
 st.markdown("OpenAI Agents SDKを使用した対話型アシスタント")
 
-# モジュールからインポート
-from src.config.settings import load_config
-from src.ui.sidebar import setup_sidebar, show_error_sidebar
-from src.ui.chat import initialize_chat, process_message
-from src.ui.guide import show_usage_guide
+# モジュールからインポート（読み込みはプロセスで最初の実行時のみ行われ、以降の再実行ではキャッシュが使われる）
+# agents / openai SDK はここでは読み込まず、最初にエージェントを実行する時点で読み込む
+from src.utils.startup_metrics import get_startup_metrics
+with get_startup_metrics().measure("アプリのモジュール"):
+    from src.config.settings import load_config
+    from src.ui.sidebar import (
+        setup_sidebar, setup_runtime_options, show_cache_stats, show_error_sidebar, show_scheduler_stats, show_startup_stats
+    )
+    from src.ui.chat import initialize_chat, process_message
+    from src.ui.guide import show_usage_guide
 
 # 設定の読み込み
 api_key = load_config()
@@ -22,17 +31,34 @@ else:
     # 環境変数を設定
     os.environ["OPENAI_API_KEY"] = api_key
 
+# エージェント実行用のイベントループと共有クライアントは、最初の実行時に run_async が準備する
+# （agents SDK の読み込みを含むため、画面の表示を待たせないよう起動時には行わない）
+
 # サイドバーセットアップ
 agent_name, instructions, selected_model = setup_sidebar()
+runtime_options = setup_runtime_options()
 
 # チャットインターフェース初期化
 user_input = initialize_chat()
 
 # ユーザー入力があれば処理
 if user_input:
-    error_message = process_message(user_input, agent_name, instructions, selected_model)
+    error_message = process_message(
+        user_input, agent_name, instructions, selected_model,
+        stream=runtime_options["stream"],
+        use_cache=runtime_options["use_cache"],
+        similarity=runtime_options["similarity_cache"]
+    )
     if error_message:
         show_error_sidebar(error_message)
 
 # 使い方ガイド表示
-show_usage_guide() 
\ No newline at end of file
+show_usage_guide()
+
+# キャッシュの統計情報表示
+show_cache_stats()
+show_scheduler_stats()
+show_startup_stats()
+
+# スクリプト全体の所要時間を記録（プロセスで最初の実行はコールドスタートとして記録される）
+get_startup_metrics().record_script_run(script_started_at)
@@ -1,51 +1,51 @@
 import os
+import time
 import streamlit as st
 import sys
-import json
-import pickle
-from pathlib import Path
+
+# スクリプトの開始時刻（再実行ごとの所要時間の計測に使用する）
+script_started_at = time.perf_counter()
 
 # スタイルとタイトル設定
 st.set_page_config(page_title="OpenAI Multi-Agent Builder", layout="wide")
 st.title("OpenAI マルチエージェントビルダー")
 st.markdown("複数のAIエージェントを組み合わせたワークフローを構築・実行できます")
 
-# モジュールからインポート
-from src.config.settings import load_config
-from src.agent_builder import agent_builder_ui, list_agents_ui
-from src.agent_flow import agent_flow_builder_ui, list_flows_ui, run_flow_ui
-
-# セッションデータの保存先
-DATA_DIR = Path("data")
-AGENTS_FILE = DATA_DIR / "agents.pickle"
-FLOWS_FILE = DATA_DIR / "flows.pickle"
-
-# データディレクトリが存在しない場合は作成
-DATA_DIR.mkdir(exist_ok=True)
+# モジュールからインポート（読み込みはプロセスで最初の実行時のみ行われ、以降の再実行ではキャッシュが使われる）
+# agents / openai SDK はここでは読み込まず、最初にエージェントを実行する時点で読み込む
+from src.utils.startup_metrics import get_startup_metrics
+with get_startup_metrics().measure("アプリのモジュール"):
+    from src.config.settings import load_config
+    from src.agent_builder import agent_builder_ui, list_agents_ui
+    from src.agent_flow import agent_flow_builder_ui, list_flows_ui, run_flow_ui
+    from src.ui.sidebar import show_cache_stats, show_cascade_stats, show_scheduler_stats, show_startup_stats
+    from src.utils.persistence import load_agents, load_flows, record_digests, save_agents, save_flows
 
-# 保存されたデータの読み込み
+# 保存されたデータの読み込み（セッションの開始時に一度だけ行う）
 def load_saved_data():
+    if "agents" in st.session_state and "flows" in st.session_state:
+        return
     try:
-        if AGENTS_FILE.exists():
-            with open(AGENTS_FILE, "rb") as f:
-                st.session_state.agents = pickle.load(f)
-        
-        if FLOWS_FILE.exists():
-            with open(FLOWS_FILE, "rb") as f:
-                st.session_state.flows = pickle.load(f)
+        st.session_state.agents = load_agents()
+        st.session_state.flows = load_flows()
+        # 保存時に変更されたレコードだけを書き込むため、読み込んだ時点の内容を記録しておく
+        st.session_state.saved_agents = record_digests(st.session_state.agents)
+        st.session_state.saved_flows = record_digests(st.session_state.flows)
                 
-        st.sidebar.success("保存されたデータを読み込みました")
+        if st.session_state.agents or st.session_state.flows:
+            st.sidebar.success("保存されたデータを読み込みました")
     except Exception as e:
         st.sidebar.warning(f"データの読み込みに失敗しました: {str(e)}")
 
-# データの保存
+# データの保存（変更されたエージェント・フローのみを書き込む）
 def save_data():
     try:
-        with open(AGENTS_FILE, "wb") as f:
-            pickle.dump(st.session_state.agents, f)
-        
-        with open(FLOWS_FILE, "wb") as f:
-            pickle.dump(st.session_state.flows, f)
+        st.session_state.saved_agents = save_agents(
+            st.session_state.agents, st.session_state.get("saved_agents", {})
+        )
+        st.session_state.saved_flows = save_flows(
+            st.session_state.flows, st.session_state.get("saved_flows", {})
+        )
             
         return True
     except Exception as e:
@@ -61,6 +61,9 @@ else:
     # 環境変数を設定
     os.environ["OPENAI_API_KEY"] = api_key
 
+# エージェント実行用のイベントループと共有クライアントは、最初の実行時に run_async が準備する
+# （agents SDK の読み込みを含むため、画面の表示を待たせないよう起動時には行わない）
+
 # 既存データの読み込み
 load_saved_data()
 
@@ -108,4 +111,13 @@ elif page == "フロー実行":
         
         # 選択されたフローを実行
         selected_flow = st.session_state.flows[flow_ids[selected_index]]
-        run_flow_ui(selected_flow) 
\ No newline at end of file
+        run_flow_ui(selected_flow)
+
+# キャッシュの統計情報表示
+show_cache_stats()
+show_scheduler_stats()
+show_cascade_stats()
+show_startup_stats()
+
+# スクリプト全体の所要時間を記録（プロセスで最初の実行はコールドスタートとして記録される）
+get_startup_metrics().record_script_run(script_started_at)
@@ -1,4 +1,4 @@
-from src.agent_builder.agent_types import AgentConfig, ConnectionType, AgentConnection, AgentFlow
+from src.agent_builder.agent_types import AgentConfig, ConnectionType, AgentConnection, AgentFlow, CONNECTION_TYPE_LABELS
 from src.agent_builder.builder_ui import agent_builder_ui, list_agents_ui
 
 __all__ = [
@@ -6,6 +6,7 @@ __all__ = [
     'ConnectionType',
     'AgentConnection',
     'AgentFlow',
+    'CONNECTION_TYPE_LABELS',
     'agent_builder_ui',
     'list_agents_ui'
 ] 
\ No newline at end of file
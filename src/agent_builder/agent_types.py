@@ -9,6 +9,10 @@ class AgentConfig(BaseModel):
     instructions: str
     model: str
     tools: List[str] = []
+    cache_enabled: bool = True  # レスポンスキャッシュを使用するかどうか
+    cascade_model: Optional[str] = None  # 先に回答させる高速なモデル（Noneの場合はカスケードしない）
+    cascade_rule: Optional[str] = None   # 高速なモデルの応答を採用する条件（Noneの場合は既定の条件）
+    similarity_cache: bool = False  # 類似した質問の応答を再利用するかどうか（レスポンスキャッシュを使用する場合のみ）
     
     def to_dict(self) -> Dict[str, Any]:
         """エージェント設定を辞書形式で返す"""
@@ -17,7 +21,11 @@ class AgentConfig(BaseModel):
             "name": self.name,
             "instructions": self.instructions,
             "model": self.model,
-            "tools": self.tools
+            "tools": self.tools,
+            "cache_enabled": self.cache_enabled,
+            "cascade_model": self.cascade_model,
+            "cascade_rule": self.cascade_rule,
+            "similarity_cache": self.similarity_cache
         }
     
     @classmethod
@@ -30,6 +38,17 @@ class ConnectionType:
     HANDOFF = "handoff"         # エージェント間のハンドオフ
     SEQUENTIAL = "sequential"   # 順次実行
     CONDITIONAL = "conditional" # 条件分岐
+    PARALLEL = "parallel"       # 並列実行（すべての接続先を同時に実行）
+    JOIN = "join"               # 合流（並列実行の結果をまとめて接続先に渡す）
+
+# 接続タイプの表示名
+CONNECTION_TYPE_LABELS = {
+    ConnectionType.HANDOFF: "ハンドオフ",
+    ConnectionType.SEQUENTIAL: "順次実行",
+    ConnectionType.CONDITIONAL: "条件分岐",
+    ConnectionType.PARALLEL: "並列実行",
+    ConnectionType.JOIN: "合流"
+}
 
 class AgentConnection(BaseModel):
     """エージェント間の接続定義"""
@@ -2,7 +2,8 @@ import streamlit as st
 import uuid
 from typing import Dict, List, Any
 from src.agent_builder.agent_types import AgentConfig, AGENT_TEMPLATES, AVAILABLE_TOOLS
-from src.config.settings import AVAILABLE_MODELS
+from src.agent_flow.conditions import ConditionError, compile_condition
+from src.config.settings import AVAILABLE_MODELS, CASCADE_DEFAULT_RULE
 
 def agent_builder_ui():
     """
@@ -81,6 +82,43 @@ def agent_builder_ui():
         format_func=lambda x: f"{x} - {AVAILABLE_TOOLS[x]}"
     )
     
+    # レスポンスキャッシュの使用有無
+    cache_enabled = st.checkbox(
+        "レスポンスキャッシュを使用",
+        value=True if editing_new else current_agent.cache_enabled,
+        help="同じ入力に対する応答を再利用します。毎回異なる応答が必要なエージェントではオフにしてください。"
+    )
+    similarity_cache = st.checkbox(
+        "類似した質問の応答を再利用",
+        value=False if editing_new else current_agent.similarity_cache,
+        disabled=not cache_enabled,
+        help="句読点や丁寧表現だけが異なる質問に、過去の応答を再利用します。同じような問い合わせが多いエージェントに向いています。"
+    )
+    
+    # モデルカスケード（高速なモデルで先に回答し、採用条件を満たさない場合のみ上記のモデルで回答し直す）
+    fast_models = [model for model in AVAILABLE_MODELS if model != selected_model]
+    default_cascade_model = None if editing_new else current_agent.cascade_model
+    cascade_on = st.checkbox(
+        "モデルカスケードを使用",
+        value=bool(default_cascade_model),
+        disabled=not fast_models,
+        help="先に高速なモデルで回答し、採用条件を満たさない場合のみ上記のモデルで回答し直します。"
+    )
+    cascade_model = None
+    cascade_rule = None if editing_new else current_agent.cascade_rule
+    if cascade_on and fast_models:
+        cascade_model = st.selectbox(
+            "先に回答させるモデル",
+            fast_models,
+            index=fast_models.index(default_cascade_model) if default_cascade_model in fast_models else 0
+        )
+        cascade_rule = st.text_input(
+            "採用条件",
+            value=cascade_rule or CASCADE_DEFAULT_RULE,
+            help="フローの条件分岐と同じ構文で記述します。confidence は応答の末尾の自己評価（0〜100）で、"
+                 "条件に含めると自己評価を付けるよう指示します。例: confidence >= 70 and not contains('わかりません')"
+        )
+    
     # 保存ボタン
     col1, col2 = st.columns([1, 1])
     with col1:
@@ -98,6 +136,13 @@ def agent_builder_ui():
     
     # エージェント保存処理
     if save_clicked and agent_name and agent_instructions:
+        if cascade_model:
+            try:
+                compile_condition(cascade_rule)
+            except ConditionError as e:
+                st.error(f"採用条件の構文エラー: {e}")
+                return None
+        
         agent_id = str(uuid.uuid4()) if editing_new else current_agent.id
         
         # 新しいエージェント設定を作成
@@ -106,7 +151,11 @@ def agent_builder_ui():
             name=agent_name,
             instructions=agent_instructions,
             model=selected_model,
-            tools=selected_tools
+            tools=selected_tools,
+            cache_enabled=cache_enabled,
+            similarity_cache=cache_enabled and similarity_cache,
+            cascade_model=cascade_model,
+            cascade_rule=cascade_rule if cascade_model else None
         )
         
         # エージェントをセッション状態に保存
@@ -137,4 +186,8 @@ def list_agents_ui():
             if agent.tools:
                 st.write(f"**ツール:** {', '.join(agent.tools)}")
             else:
-                st.write("**ツール:** なし") 
\ No newline at end of file
+                st.write("**ツール:** なし")
+            st.write(f"**レスポンスキャッシュ:** {'使用する' if agent.cache_enabled else '使用しない'}"
+                     + ("（類似した質問の応答も再利用）" if agent.cache_enabled and agent.similarity_cache else ""))
+            if agent.cascade_model:
+                st.write(f"**モデルカスケード:** {agent.cascade_model} → {agent.model}（採用条件: {agent.cascade_rule or CASCADE_DEFAULT_RULE}）") 
\ No newline at end of file
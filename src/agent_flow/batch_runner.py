@@ -0,0 +1,200 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO
+
+from src.agent_builder.agent_types import AgentFlow
+from src.agent_flow.flow_runtime import FlowRuntime
+from src.models.single_flight import get_single_flight
+from src.config.settings import BATCH_CONCURRENCY, load_config
+from src.utils.persistence import load_flows
+
+
+def read_inputs(input_file: TextIO) -> Iterator[Dict[str, Any]]:
+    """
+    JSONLファイルから入力を1件ずつ読み込む
+
+    各行は {"id": ..., "input": "..."} 形式のオブジェクト、またはJSON文字列とする。
+    idが省略された場合は行番号を使用する。
+    読み込めない行は中断せず、行番号をIDとしてエラー内容を付けて返す
+
+    Args:
+        input_file: 入力JSONLファイル
+
+    Yields:
+        Dict[str, Any]: {"id": 入力ID, "input": 入力メッセージ}（読み込めない行は "error" にエラー内容を含む）
+    """
+    for line_number, line in enumerate(input_file, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {"id": line_number, "input": None, "error": f"JSONとして読み込めません: {e}"}
+            continue
+        if isinstance(record, str):
+            record = {"input": record}
+        if not isinstance(record, dict) or not isinstance(record.get("input"), str):
+            yield {"id": line_number, "input": None, "error": "\"input\" に入力メッセージの文字列が必要です"}
+            continue
+        yield {"id": record.get("id", line_number), "input": record["input"]}
+
+
+def find_flow(flows: Dict[str, AgentFlow], flow_key: str) -> AgentFlow:
+    """
+    IDまたは名前でフローを検索する
+
+    Args:
+        flows: フローID -> フロー
+        flow_key: フローIDまたはフロー名
+
+    Returns:
+        AgentFlow: 見つかったフロー
+    """
+    if flow_key in flows:
+        return flows[flow_key]
+    matches = [flow for flow in flows.values() if flow.name == flow_key]
+    if not matches:
+        raise KeyError(f"フロー '{flow_key}' が見つかりません")
+    if len(matches) > 1:
+        raise KeyError(f"フロー名 '{flow_key}' が複数あります。IDで指定してください")
+    return matches[0]
+
+
+async def run_one(flow: AgentFlow, item: Dict[str, Any], include_chat: bool = False,
+                  view=None, stream: bool = False) -> Dict[str, Any]:
+    """
+    1件の入力に対してフローを実行する
+
+    Args:
+        flow: 実行するエージェントフロー
+        item: {"id": 入力ID, "input": 入力メッセージ}（"error" を含む場合は実行せずエラーとして返す）
+        include_chat: 結果にチャット履歴を含めるかどうか
+        view: 実行中のメッセージとログを受け取るビュー（FlowRunView と同じメソッドを持つオブジェクト）
+        stream: 生成途中の応答をビューに逐次渡すかどうか
+
+    Returns:
+        Dict[str, Any]: 実行結果（出力・ホップごとの所要時間と内訳・エラー・トレースID・実行ID）
+    """
+    started_at = time.perf_counter()
+    record = {"id": item["id"], "input": item["input"]}
+    if "error" in item:
+        record.update({"status": "error", "final_response": None, "hops": [], "errors": [{"error": item["error"]}],
+                       "latency": 0.0})
+        return record
+    try:
+        runtime = FlowRuntime(flow)
+        result = await runtime.run_flow(item["input"], view, stream=stream)
+        record.update({
+            "status": "error" if result["errors"] else "ok",
+            "final_response": result["final_response"],
+            "hops": [
+                {"agent_id": hop["agent_id"], "agent_name": hop["agent_name"],
+                 "latency": round(hop["latency"], 4), "error": hop["error"],
+                 "metrics": {key: round(value, 2) for key, value in hop.get("metrics", {}).items()},
+                 **({"similar": hop["similar"]} if "similar" in hop else {})}
+                for hop in result["hops"]
+            ],
+            "errors": result["errors"],
+            "trace_id": result["trace"]["trace_id"],
+            # 失敗した入力は FlowRuntime.resume(run_id) で失敗したホップから再開できる
+            "run_id": result["run_id"]
+        })
+        if include_chat:
+            record["chat_history"] = result["chat_history"]
+    except Exception as e:
+        record.update({"status": "error", "final_response": None, "hops": [], "errors": [{"error": str(e)}]})
+    record["latency"] = round(time.perf_counter() - started_at, 4)
+    return record
+
+
+async def run_batch(flow: AgentFlow, items: Iterable[Dict[str, Any]], output_file: TextIO,
+                    concurrency: int = BATCH_CONCURRENCY, include_chat: bool = False) -> Dict[str, Any]:
+    """
+    複数の入力に対してフローを同時実行し、完了したものから結果をJSONLで書き出す
+
+    入力は同時実行数の分だけ順に取り出すため、大量の入力でもタスクを一度に作成しない
+
+    Args:
+        flow: 実行するエージェントフロー
+        items: {"id": 入力ID, "input": 入力メッセージ} のイテラブル
+        output_file: 結果を書き出すファイル
+        concurrency: 同時に実行するフローの最大数
+        include_chat: 結果にチャット履歴を含めるかどうか
+
+    Returns:
+        Dict[str, Any]: 件数・所要時間・他の入力と共有したエージェント呼び出しの数などの集計
+    """
+    iterator = iter(items)
+    summary = {"total": 0, "ok": 0, "error": 0}
+    started_at = time.perf_counter()
+    coalesced_before = get_single_flight().get_stats()["coalesced"]
+
+    async def worker():
+        for item in iterator:
+            record = await run_one(flow, item, include_chat)
+            output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output_file.flush()
+            summary["total"] += 1
+            summary[record["status"]] += 1
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    summary["elapsed"] = round(time.perf_counter() - started_at, 4)
+    summary["coalesced"] = get_single_flight().get_stats()["coalesced"] - coalesced_before
+    return summary
+
+
+async def run_batch_file(flow: AgentFlow, input_path: str, output_path: str,
+                         concurrency: int = BATCH_CONCURRENCY, include_chat: bool = False) -> Dict[str, Any]:
+    """
+    JSONLファイルの入力に対してフローを実行し、結果をJSONLファイルに書き出す
+
+    Args:
+        flow: 実行するエージェントフロー
+        input_path: 入力JSONLファイルのパス
+        output_path: 出力JSONLファイルのパス
+        concurrency: 同時に実行するフローの最大数
+        include_chat: 結果にチャット履歴を含めるかどうか
+
+    Returns:
+        Dict[str, Any]: 件数・所要時間などの集計
+    """
+    from src.models.openai_client import install_shared_client
+
+    # バッチ全体で接続を再利用するため、このイベントループ上で共有クライアントを作成
+    install_shared_client()
+    with open(input_path, encoding="utf-8") as input_file, open(output_path, "w", encoding="utf-8") as output_file:
+        return await run_batch(flow, read_inputs(input_file), output_file, concurrency, include_chat)
+
+
+def main(argv: Optional[list] = None):
+    """
+    コマンドラインからバッチ実行する
+
+    例: python -m src.agent_flow.batch_runner --flow "問い合わせ対応" --input tickets.jsonl --output results.jsonl
+    """
+    parser = argparse.ArgumentParser(description="保存済みのエージェントフローをJSONLの入力に対して一括実行します")
+    parser.add_argument("--flow", required=True, help="実行するフローのIDまたは名前")
+    parser.add_argument("--input", required=True, help="入力JSONLファイル（各行 {\"id\": ..., \"input\": \"...\"}）")
+    parser.add_argument("--output", required=True, help="結果を書き出すJSONLファイル")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="同時に実行するフローの最大数")
+    parser.add_argument("--include-chat", action="store_true", help="結果にチャット履歴を含める")
+    args = parser.parse_args(argv)
+
+    api_key = load_config()
+    if api_key is None:
+        print("APIキーが見つかりません。'.env'ファイルを確認してください。", file=sys.stderr)
+        sys.exit(1)
+    os.environ["OPENAI_API_KEY"] = api_key
+
+    flow = find_flow(load_flows(), args.flow)
+    summary = asyncio.run(run_batch_file(flow, args.input, args.output, args.concurrency, args.include_chat))
+    print(json.dumps(summary, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from agents import RunConfig
+
+from src.agent_builder.agent_types import AgentConfig, AgentConnection, AgentFlow, ConnectionType
+from src.agent_flow.flow_runtime import FlowRuntime
+from src.config.settings import AVAILABLE_MODELS, BASE_DIR, DATA_DIR
+from src.models.agent import AgentManager
+from src.models.local_model import LatencyModel, LocalModelProvider
+from src.models.scheduler import RequestScheduler, get_scheduler, install_scheduler
+from src.utils.run_log import RunLog
+
+# 合成フローの形（並列実行の形は合流接続も含む）
+SHAPES = ("handoff", "sequential", "conditional", "parallel")
+
+# ベンチマーク結果の保存先
+BENCHMARK_DIR = os.path.join(DATA_DIR, "benchmarks")
+
+# レート制限で待たされないよう、ベンチマーク中のスケジューラに設定する上限
+UNLIMITED_RATE = {"rpm": 1e12, "tpm": 1e12}
+
+
+def build_synthetic_flow(shape: str, agent_count: int, model: str = AVAILABLE_MODELS[0]) -> AgentFlow:
+    """
+    ベンチマーク用の合成フローを作成する
+
+    - handoff / sequential: 指定した接続タイプで全エージェントを直列につなぐ
+    - conditional: 直列につなぎ、各エージェントに成立しない条件と成立する条件の2本の条件分岐を持たせる
+    - parallel: 先頭のエージェントから残りに並列実行し、最後のエージェントに合流する
+
+    Args:
+        shape: フローの形（SHAPESのいずれか）
+        agent_count: エージェント数（2以上）
+        model: エージェントのモデル名
+
+    Returns:
+        AgentFlow: 合成フロー
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"不明なフローの形です: {shape}")
+    if agent_count < 2:
+        raise ValueError("エージェント数は2以上を指定してください")
+
+    # ローカルモデルは指示の1行目を応答に含めるため、条件分岐は指示の1行目で制御できる
+    agents = [
+        AgentConfig(name=f"agent-{i}", instructions=f"agent-{i}\nベンチマーク用のエージェントです",
+                    model=model, cache_enabled=False)
+        for i in range(agent_count)
+    ]
+    connections: List[AgentConnection] = []
+
+    def connect(source: AgentConfig, target: AgentConfig, connection_type: str, condition: Optional[str] = None):
+        connections.append(AgentConnection(
+            source_id=source.id, target_id=target.id, connection_type=connection_type, condition=condition
+        ))
+
+    if shape == "parallel":
+        branches = agents[1:-1] if agent_count > 2 else agents[1:]
+        for branch in branches:
+            connect(agents[0], branch, ConnectionType.PARALLEL)
+        if agent_count > 2:
+            for branch in branches:
+                connect(branch, agents[-1], ConnectionType.JOIN)
+    else:
+        for source, target in zip(agents, agents[1:]):
+            if shape == "conditional":
+                connect(source, agents[-1], ConnectionType.CONDITIONAL, "contains('no-such-keyword')")
+                connect(source, target, ConnectionType.CONDITIONAL, f"contains('{source.name}')")
+            else:
+                connect(source, target, shape)
+
+    return AgentFlow(
+        name=f"benchmark-{shape}-{agent_count}",
+        description=f"{shape} 形の合成フロー（{agent_count} エージェント）",
+        agents=agents,
+        connections=connections,
+        entry_point_id=agents[0].id
+    )
+
+
+class NullFlowView:
+    """
+    描画しないフロー実行ビュー
+
+    FlowRunViewと同じ呼び出しを受け付け、ログはUIと同様に差分だけ整形して読み捨てる
+    """
+
+    def __init__(self):
+        self._log_cursor = 0
+
+    def add_message(self, msg: Dict[str, Any], stream_key: Optional[object] = None):
+        pass
+
+    def update_streaming(self, stream_key: object, name: str, text: str):
+        pass
+
+    def discard_streaming(self, stream_key: object):
+        pass
+
+    def sync_logs(self, logs: RunLog):
+        entries = logs.entries(after_seq=self._log_cursor)
+        if entries:
+            self._log_cursor = entries[-1]["seq"]
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """
+    値のリストから代表的なパーセンタイルを計算する
+
+    Args:
+        values: 値のリスト
+
+    Returns:
+        Dict[str, float]: mean / p50 / p90 / p99 / max
+    """
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(round(p * len(ordered))) - 1))]
+
+    return {
+        "mean": sum(ordered) / len(ordered),
+        "p50": rank(0.50),
+        "p90": rank(0.90),
+        "p99": rank(0.99),
+        "max": ordered[-1]
+    }
+
+
+async def run_once(flow: AgentFlow, stream: bool = False) -> Dict[str, Any]:
+    """
+    フローを1回実行し、所要時間とホップ数を返す
+
+    Args:
+        flow: 実行するフロー
+        stream: ストリーミングで実行するかどうか
+
+    Returns:
+        Dict[str, Any]: {"elapsed": 所要時間（秒）, "hops": 実行したホップ数, "errors": エラー数}
+    """
+    runtime = FlowRuntime(flow)
+    # 計測のたびにトレースファイルが書き込まれないようにする
+    runtime.trace_export_path = None
+    runtime.checkpoints = None
+    view = NullFlowView() if stream else None
+    started_at = time.perf_counter()
+    result = await runtime.run_flow("benchmark input", view, stream=stream)
+    elapsed = time.perf_counter() - started_at
+    return {"elapsed": elapsed, "hops": len(result["hops"]), "errors": len(result["errors"])}
+
+
+def use_model_provider(provider: LocalModelProvider):
+    """エージェントの呼び出し先をローカルモデルに切り替える"""
+    AgentManager.run_config = RunConfig(model_provider=provider, tracing_disabled=True)
+
+
+async def benchmark_case(shape: str, agent_count: int, runs: int, latency: LatencyModel,
+                         output_tokens: int, concurrency: int, stream: bool) -> Dict[str, Any]:
+    """
+    1つの合成フローについて各指標を計測する
+
+    - エンジンのオーバーヘッド: 遅延0のモデルで実行し、1ホップあたりの所要時間を計測
+    - レイテンシ: 指定した遅延分布のモデルで逐次実行し、エンドツーエンドの所要時間の分布を計測
+    - メモリ: 1回の実行中に確保されたメモリのピークを計測
+    - スループット: 指定した同時実行数で実行し、1秒あたりの実行数を計測
+
+    Args:
+        shape: フローの形
+        agent_count: エージェント数
+        runs: 各計測での実行回数
+        latency: モデルの遅延分布
+        output_tokens: モデルの出力単語数
+        concurrency: スループット計測時の同時実行数
+        stream: ストリーミングで実行するかどうか
+
+    Returns:
+        Dict[str, Any]: 計測結果
+    """
+    flow = build_synthetic_flow(shape, agent_count)
+
+    # エンジンのオーバーヘッド（最初の1回はエージェントの作成などを含むため除外）
+    use_model_provider(LocalModelProvider(output_tokens=output_tokens))
+    await run_once(flow, stream)
+    overhead = [await run_once(flow, stream) for _ in range(runs)]
+    hops = overhead[-1]["hops"]
+    errors = sum(run["errors"] for run in overhead)
+    per_hop = [run["elapsed"] / max(1, run["hops"]) for run in overhead]
+
+    # メモリ
+    tracemalloc.start()
+    errors += (await run_once(flow, stream))["errors"]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # レイテンシ
+    use_model_provider(LocalModelProvider(latency=latency, output_tokens=output_tokens))
+    latency_runs = [await run_once(flow, stream) for _ in range(runs)]
+    latencies = [run["elapsed"] for run in latency_runs]
+    errors += sum(run["errors"] for run in latency_runs)
+
+    # スループット
+    remaining = iter(range(runs))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            errors += (await run_once(flow, stream))["errors"]
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    throughput_elapsed = time.perf_counter() - started_at
+
+    return {
+        "shape": shape,
+        "agents": agent_count,
+        "hops": hops,
+        "errors": errors,
+        "overhead_per_hop_ms": {key: value * 1000 for key, value in percentiles(per_hop).items()},
+        "latency_ms": {key: value * 1000 for key, value in percentiles(latencies).items()},
+        "peak_memory_kib": peak / 1024,
+        "throughput_runs_per_sec": runs / throughput_elapsed,
+        "throughput_hops_per_sec": runs * hops / throughput_elapsed
+    }
+
+
+async def run_benchmark(shapes: List[str], sizes: List[int], runs: int, latency: LatencyModel,
+                        output_tokens: int = 50, concurrency: int = 8, stream: bool = False) -> Dict[str, Any]:
+    """
+    合成フローの形とエージェント数の組み合わせごとにベンチマークを実行する
+
+    Args:
+        shapes: フローの形のリスト
+        sizes: エージェント数のリスト
+        runs: 各計測での実行回数
+        latency: モデルの遅延分布
+        output_tokens: モデルの出力単語数
+        concurrency: スループット計測時の同時実行数
+        stream: ストリーミングで実行するかどうか
+
+    Returns:
+        Dict[str, Any]: 実行環境の情報と計測結果
+    """
+    # レート制限で待たされるとエンジンの性能が測れないため、上限のないスケジューラに差し替える
+    # （呼び出し先のモデルと合わせて、終了後に元に戻す）
+    previous_scheduler = get_scheduler()
+    previous_run_config = AgentManager.run_config
+    install_scheduler(RequestScheduler({model: UNLIMITED_RATE for model in AVAILABLE_MODELS}))
+
+    cases = []
+    try:
+        for shape in shapes:
+            for size in sizes:
+                case = await benchmark_case(shape, size, runs, latency, output_tokens, concurrency, stream)
+                print(format_case(case), file=sys.stderr)
+                cases.append(case)
+    finally:
+        install_scheduler(previous_scheduler)
+        AgentManager.run_config = previous_run_config
+
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": {
+                "runs": runs, "output_tokens": output_tokens, "concurrency": concurrency, "stream": stream,
+                "latency": {"distribution": latency.distribution, "mean": latency.mean, "jitter": latency.jitter}
+            }
+        },
+        "cases": cases
+    }
+
+
+def git_commit() -> Optional[str]:
+    """計測したコードのコミットIDを取得（gitが使えない場合はNone）"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_case(case: Dict[str, Any]) -> str:
+    """計測結果を1行に整形"""
+    return (
+        f"{case['shape']:<12} agents={case['agents']:<4} "
+        f"overhead/hop p50={case['overhead_per_hop_ms']['p50']:.3f}ms "
+        f"latency p50={case['latency_ms']['p50']:.1f}ms p99={case['latency_ms']['p99']:.1f}ms "
+        f"peak={case['peak_memory_kib']:.0f}KiB "
+        f"throughput={case['throughput_runs_per_sec']:.1f}runs/s"
+        + (f" errors={case['errors']}" if case["errors"] else "")
+    )
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """
+    2つのベンチマーク結果を比較する
+
+    Args:
+        baseline: 比較元の結果
+        current: 比較先の結果
+
+    Returns:
+        List[str]: 形とエージェント数ごとの比較結果（比率が1未満なら改善）
+    """
+    baseline_cases = {(case["shape"], case["agents"]): case for case in baseline["cases"]}
+    lines = [f"比較元: {baseline['meta'].get('git_commit')} -> 比較先: {current['meta'].get('git_commit')}"]
+    for case in current["cases"]:
+        base = baseline_cases.get((case["shape"], case["agents"]))
+        if base is None:
+            continue
+
+        def ratio(value: float, base_value: float) -> str:
+            return f"{value / base_value:.2f}x" if base_value else "-"
+
+        lines.append(
+            f"{case['shape']:<12} agents={case['agents']:<4} "
+            f"overhead/hop {ratio(case['overhead_per_hop_ms']['p50'], base['overhead_per_hop_ms']['p50'])} "
+            f"latency p50 {ratio(case['latency_ms']['p50'], base['latency_ms']['p50'])} "
+            f"p99 {ratio(case['latency_ms']['p99'], base['latency_ms']['p99'])} "
+            f"peak {ratio(case['peak_memory_kib'], base['peak_memory_kib'])} "
+            f"throughput {ratio(case['throughput_runs_per_sec'], base['throughput_runs_per_sec'])}"
+        )
+    return lines
+
+
+def main(argv: Optional[list] = None):
+    """
+    コマンドラインからベンチマークを実行する
+
+    例: python -m src.agent_flow.benchmark --sizes 2,10,100,500 --latency lognormal --latency-mean 0.05
+    """
+    parser = argparse.ArgumentParser(description="ローカルモデルでフローエンジンの性能を計測します（APIキー不要）")
+    parser.add_argument("--shapes", default=",".join(SHAPES), help=f"フローの形（カンマ区切り: {', '.join(SHAPES)}）")
+    parser.add_argument("--sizes", default="2,10,100,500", help="エージェント数（カンマ区切り）")
+    parser.add_argument("--runs", type=int, default=20, help="各計測での実行回数")
+    parser.add_argument("--latency", default="fixed", choices=LatencyModel.DISTRIBUTIONS, help="モデルの遅延分布")
+    parser.add_argument("--latency-mean", type=float, default=0.01, help="モデルの遅延の平均（lognormalの場合は中央値）（秒）")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="モデルの遅延のばらつき")
+    parser.add_argument("--output-tokens", type=int, default=50, help="モデルの出力単語数")
+    parser.add_argument("--concurrency", type=int, default=8, help="スループット計測時の同時実行数")
+    parser.add_argument("--stream", action="store_true", help="ストリーミングで実行する")
+    parser.add_argument("--seed", type=int, default=0, help="遅延の乱数シード")
+    parser.add_argument("--output", help="結果を保存するJSONファイル（省略時は data/benchmarks/ に保存）")
+    parser.add_argument("--compare", help="比較元のベンチマーク結果のJSONファイル")
+    args = parser.parse_args(argv)
+
+    latency = LatencyModel(args.latency, args.latency_mean, args.latency_jitter, args.seed)
+    shapes = [shape.strip() for shape in args.shapes.split(",") if shape.strip()]
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    results = asyncio.run(run_benchmark(
+        shapes, sizes, args.runs, latency, args.output_tokens, args.concurrency, args.stream
+    ))
+
+    output_path = args.output or os.path.join(BENCHMARK_DIR, f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"結果を保存しました: {output_path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("\n".join(compare_results(baseline, results)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+from src.agent_builder.agent_types import AgentConfig
+from src.agent_flow.conditions import compile_condition, strip_confidence
+from src.config.settings import CASCADE_CONFIDENCE_INSTRUCTIONS, CASCADE_DEFAULT_RULE
+from src.models.agent import AgentError, AgentManager
+from src.models.agent_registry import get_agent_registry
+from src.utils.tracing import start_span
+
+
+@lru_cache(maxsize=256)
+def compile_rule(rule: str) -> Callable[[str], bool]:
+    """
+    カスケードの採用条件をコンパイルする（同じ条件は再利用する）
+
+    Args:
+        rule: 採用条件（フローの条件分岐と同じ構文）
+
+    Returns:
+        Callable[[str], bool]: 高速なモデルの応答を受け取り、採用するかどうかを返す関数
+
+    Raises:
+        ConditionError: 採用条件に構文エラーがある場合
+    """
+    return compile_condition(rule)
+
+
+def cascade_enabled(config: AgentConfig) -> bool:
+    """
+    エージェント設定でモデルカスケードが有効かどうか
+
+    Args:
+        config: エージェント設定
+
+    Returns:
+        bool: 設定したモデルと異なる高速なモデルが指定されている場合はTrue
+    """
+    return bool(config.cascade_model) and config.cascade_model != config.model
+
+
+class CascadeStats:
+    """
+    エージェントごとのモデルカスケードの統計情報
+
+    呼び出し回数・昇格（設定したモデルでの回答し直し）の回数と、高速なモデルの応答を採用した場合・
+    昇格した場合の所要時間を集計し、設定したモデルだけを使った場合と比べて短縮できた時間を見積もる
+    """
+
+    def __init__(self):
+        """CascadeStatsの初期化"""
+        self._stats: Dict[str, Dict[str, Any]] = {}  # エージェントID -> 集計値
+        self._lock = threading.Lock()
+
+    def record(self, config: AgentConfig, escalated: bool, fast_latency: float, total_latency: float):
+        """
+        1回の呼び出しを記録する
+
+        Args:
+            config: エージェント設定
+            escalated: 設定したモデルに昇格したかどうか
+            fast_latency: 高速なモデルの所要時間（秒）
+            total_latency: 呼び出し全体の所要時間（秒）
+        """
+        with self._lock:
+            stats = self._stats.setdefault(config.id, {
+                "calls": 0, "escalations": 0, "accepted_latency": 0.0,
+                "escalated_latency": 0.0, "model_latency": 0.0
+            })
+            stats.update(name=config.name, model=config.model, cascade_model=config.cascade_model)
+            stats["calls"] += 1
+            if escalated:
+                stats["escalations"] += 1
+                stats["escalated_latency"] += total_latency
+                stats["model_latency"] += total_latency - fast_latency
+            else:
+                stats["accepted_latency"] += total_latency
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        エージェントごとの統計情報を取得する
+
+        Returns:
+            Dict[str, Dict[str, Any]]: エージェントID -> 呼び出し回数・昇格率・平均所要時間・短縮できた時間の見積もり
+            （設定したモデルの平均所要時間は昇格時の呼び出しから求めるため、昇格がない場合はNone）
+        """
+        with self._lock:
+            snapshot = {agent_id: dict(stats) for agent_id, stats in self._stats.items()}
+
+        result = {}
+        for agent_id, stats in snapshot.items():
+            accepted = stats["calls"] - stats["escalations"]
+            escalations = stats["escalations"]
+            accepted_avg = stats["accepted_latency"] / accepted if accepted else None
+            model_avg = stats["model_latency"] / escalations if escalations else None
+            latency_saved = None
+            if model_avg is not None:
+                # すべての呼び出しを設定したモデルだけで実行した場合との差
+                latency_saved = model_avg * stats["calls"] - stats["accepted_latency"] - stats["escalated_latency"]
+            result[agent_id] = {
+                "name": stats["name"],
+                "model": stats["model"],
+                "cascade_model": stats["cascade_model"],
+                "calls": stats["calls"],
+                "escalations": escalations,
+                "escalation_rate": escalations / stats["calls"],
+                "accepted_latency_avg": accepted_avg,
+                "escalated_latency_avg": stats["escalated_latency"] / escalations if escalations else None,
+                "model_latency_avg": model_avg,
+                "latency_saved": latency_saved
+            }
+        return result
+
+
+_cascade_stats: Optional[CascadeStats] = None
+_cascade_stats_lock = threading.Lock()
+
+
+def get_cascade_stats() -> CascadeStats:
+    """
+    プロセス全体で共有するモデルカスケードの統計情報を取得する
+
+    Returns:
+        CascadeStats: モデルカスケードの統計情報
+    """
+    global _cascade_stats
+    if _cascade_stats is None:
+        with _cascade_stats_lock:
+            if _cascade_stats is None:
+                _cascade_stats = CascadeStats()
+    return _cascade_stats
+
+
+async def run_with_cascade(config: AgentConfig, agent, user_input: str, on_delta=None, use_cache: bool = True,
+                           reservation=None, on_similar_hit=None) -> str:
+    """
+    高速なモデルで先に回答し、採用条件を満たさない場合のみ設定したモデルで回答し直す
+
+    高速なモデルの応答は採用が決まるまで表示しない（ストリーミングの場合は採用した応答を一度に渡し、
+    昇格した場合は設定したモデルの応答をストリーミングする）
+
+    Args:
+        config: エージェント設定
+        agent (Agent): 設定したモデルのエージェント
+        user_input: ユーザー入力
+        on_delta: ストリーミングモードで応答テキストの差分を受け取る関数
+        use_cache: レスポンスキャッシュを使用するかどうか
+        reservation (Reservation, optional): 前もって確保した高速なモデルの順番
+        on_similar_hit (callable, optional): 類似した質問の応答を再利用した場合に SimilarHit を受け取る関数
+
+    Returns:
+        str: 採用した応答
+
+    Raises:
+        AgentError: 設定したモデルでの実行に失敗した場合
+    """
+    rule = config.cascade_rule or CASCADE_DEFAULT_RULE
+    accept = compile_rule(rule)
+    instructions = config.instructions
+    if "confidence" in rule:
+        # 採用条件で確信度を使う場合は、応答の末尾に自己評価を付けるよう指示する
+        instructions += CASCADE_CONFIDENCE_INSTRUCTIONS
+    fast_agent = get_agent_registry().get_or_create(config.name, instructions, config.cascade_model, config.tools)
+
+    started_at = time.perf_counter()
+    with start_span("agent.cascade", {"cascade.model": config.cascade_model, "cascade.rule": rule}) as span:
+        try:
+            draft = await AgentManager.run_agent(fast_agent, user_input, use_cache=use_cache, reservation=reservation,
+                                                 similarity=config.similarity_cache, on_similar_hit=on_similar_hit)
+        except AgentError as e:
+            # 高速なモデルの失敗は昇格で補う
+            span.set_attribute("cascade.fast_error", str(e))
+            draft = None
+        fast_latency = time.perf_counter() - started_at
+
+        escalated = not (isinstance(draft, str) and accept(draft))
+        span.set_attribute("cascade.escalated", escalated)
+        try:
+            if escalated:
+                response = await AgentManager.run_agent(agent, user_input, on_delta=on_delta, use_cache=use_cache,
+                                                        similarity=config.similarity_cache,
+                                                        on_similar_hit=on_similar_hit)
+            else:
+                response = strip_confidence(draft)
+                if on_delta is not None:
+                    on_delta(response)
+        finally:
+            get_cascade_stats().record(config, escalated, fast_latency, time.perf_counter() - started_at)
+        return response
@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.agent_builder.agent_types import AgentFlow
+from src.config.settings import FLOW_CHECKPOINT_DIR, FLOW_CHECKPOINT_TTL
+
+
+class CheckpointStore:
+    """
+    フロー実行のチェックポイントを保存するストア
+
+    実行ごとに1つのJSONLファイルを持ち、先頭行に実行の情報（フロー・ユーザー入力）、
+    以降の行に完了したホップ（エージェントID・入力・出力・次のエージェントID）を追記する。
+    正常に完了した実行のファイルは削除するため、残っているのは再開可能な実行のみとなる。
+    """
+
+    def __init__(self, directory: str = FLOW_CHECKPOINT_DIR, ttl: float = FLOW_CHECKPOINT_TTL):
+        """
+        CheckpointStoreの初期化
+
+        Args:
+            directory: チェックポイントの保存先ディレクトリ
+            ttl: チェックポイントの保持期間（秒）
+        """
+        self.directory = directory
+        self.ttl = ttl
+
+    def start(self, run_id: str, flow: AgentFlow, fingerprint: str, user_input: str):
+        """
+        実行の開始を記録する（再開時など、既に記録がある場合は何もしない）
+
+        Args:
+            run_id: 実行ID
+            flow: 実行するフロー
+            fingerprint: フロー内容のハッシュ値
+            user_input: ユーザー入力
+        """
+        if os.path.exists(self._path(run_id)):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._append(run_id, {
+            "type": "run", "run_id": run_id, "flow_id": flow.id, "flow_name": flow.name,
+            "fingerprint": fingerprint, "user_input": user_input, "created_at": time.time()
+        })
+
+    def record_hop(self, run_id: str, agent_id: str, agent_input: str, output: str, next_id: Any):
+        """
+        完了したホップを記録する
+
+        Args:
+            run_id: 実行ID
+            agent_id: 実行したエージェントのID
+            agent_input: エージェントへの入力
+            output: エージェントの応答
+            next_id: 次のエージェントID（並列実行の場合は接続先IDのリスト、終了時はNone）
+        """
+        self._append(run_id, {
+            "type": "hop", "agent_id": agent_id, "input": agent_input, "output": output,
+            "next_id": next_id, "recorded_at": time.time()
+        })
+
+    def record_failure(self, run_id: str, agent_id: str, error: str):
+        """
+        エージェントの失敗を記録する
+
+        Args:
+            run_id: 実行ID
+            agent_id: 失敗したエージェントのID
+            error: エラーメッセージ
+        """
+        self._append(run_id, {"type": "error", "agent_id": agent_id, "error": error, "recorded_at": time.time()})
+
+    def complete(self, run_id: str):
+        """正常に完了した実行のチェックポイントを削除する"""
+        self.delete(run_id)
+
+    def delete(self, run_id: str):
+        """チェックポイントを削除する"""
+        try:
+            os.remove(self._path(run_id))
+        except FileNotFoundError:
+            pass
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """
+        チェックポイントを読み込む
+
+        Args:
+            run_id: 実行ID
+
+        Returns:
+            Optional[Dict[str, Any]]: 実行の情報に "hops"（完了したホップのリスト）と
+            "error"（最後のエラー）を加えたもの。存在しない場合はNone
+        """
+        try:
+            with open(self._path(run_id), encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return None
+        if not records or records[0].get("type") != "run":
+            return None
+
+        checkpoint = dict(records[0])
+        checkpoint["hops"] = [record for record in records if record["type"] == "hop"]
+        errors = [record for record in records if record["type"] == "error"]
+        checkpoint["error"] = errors[-1] if errors else None
+        checkpoint["updated_at"] = records[-1].get("recorded_at", checkpoint["created_at"])
+        return checkpoint
+
+    def list_resumable(self, flow_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        再開可能な実行の一覧を取得する（保持期間を過ぎたものは削除する）
+
+        Args:
+            flow_id: 指定した場合はこのフローの実行のみを返す
+
+        Returns:
+            List[Dict[str, Any]]: チェックポイントのリスト（新しい順）
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        now = time.time()
+        checkpoints = []
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith(".jsonl"):
+                continue
+            path = os.path.join(self.directory, file_name)
+            if now - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                continue
+            checkpoint = self.load(file_name[:-len(".jsonl")])
+            if checkpoint is None or checkpoint["error"] is None:
+                # 実行中のもの、または失敗を記録していないものは再開対象にしない
+                continue
+            if flow_id is None or checkpoint["flow_id"] == flow_id:
+                checkpoints.append(checkpoint)
+        return sorted(checkpoints, key=lambda checkpoint: checkpoint["updated_at"], reverse=True)
+
+    def _path(self, run_id: str) -> str:
+        """チェックポイントファイルのパス"""
+        return os.path.join(self.directory, f"{run_id}.jsonl")
+
+    def _append(self, run_id: str, record: Dict[str, Any]):
+        """チェックポイントファイルに1行追記"""
+        with open(self._path(run_id), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+_checkpoint_store: Optional[CheckpointStore] = None
+_checkpoint_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """
+    プロセス全体で共有するチェックポイントストアを取得する
+
+    Returns:
+        CheckpointStore: チェックポイントストア
+    """
+    global _checkpoint_store
+    if _checkpoint_store is None:
+        with _checkpoint_store_lock:
+            if _checkpoint_store is None:
+                _checkpoint_store = CheckpointStore()
+    return _checkpoint_store
@@ -0,0 +1,356 @@
+import ast
+import operator
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.config.settings import FLOW_KEYWORD_SCAN_THRESHOLD
+
+# 条件式をコンパイルした述語（応答テキストと、一致したキーワードのビット集合を受け取る）
+Predicate = Callable[[str, int], bool]
+
+# 字句の定義（空白を読み飛ばしてから、文字列・数値・記号・名前のいずれかに一致させる）
+_TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+      | (?P<number>\d+)
+      | (?P<symbol><=|>=|==|!=|<|>|\(|\)|,|\.)
+      | (?P<name>[A-Za-z_]\w*)
+    )""", re.VERBOSE)
+
+_COMPARISONS = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt,
+    ">=": operator.ge, "==": operator.eq, "!=": operator.ne
+}
+
+# 応答の末尾に付けられた自己評価の確信度（例: [confidence: 80]）
+_CONFIDENCE_PATTERN = re.compile(r"\s*\[\s*confidence\s*[:：]\s*(\d{1,3})\s*\]\s*$", re.IGNORECASE)
+
+
+class ConditionError(ValueError):
+    """条件式の構文エラー"""
+    pass
+
+
+def response_confidence(response: str) -> Optional[int]:
+    """
+    応答の末尾に付けられた自己評価の確信度を取得する
+
+    Args:
+        response: エージェントの応答
+
+    Returns:
+        Optional[int]: 確信度（0〜100）。付けられていない場合はNone
+    """
+    match = _CONFIDENCE_PATTERN.search(response)
+    return min(int(match.group(1)), 100) if match else None
+
+
+def strip_confidence(response: str) -> str:
+    """
+    応答の末尾に付けられた自己評価の確信度を取り除く
+
+    Args:
+        response: エージェントの応答
+
+    Returns:
+        str: 確信度を取り除いた応答
+    """
+    return _CONFIDENCE_PATTERN.sub("", response)
+
+
+def compile_condition(source: str) -> Callable[[str], bool]:
+    """
+    単独の条件式をコンパイルする（接続元ごとにまとめる必要がない場合に使用する）
+
+    Args:
+        source: 条件式
+
+    Returns:
+        Callable[[str], bool]: 応答テキストを受け取り、条件の真偽を返す関数
+
+    Raises:
+        ConditionError: 条件式に構文エラーがある場合
+    """
+    condition_set = ConditionSet()
+    predicate = condition_set.compile(source)
+    matcher = condition_set.matcher()
+    return lambda response: predicate(response, matcher.search(response.lower()))
+
+
+class KeywordMatcher:
+    """
+    接続元のすべての contains のキーワードを応答テキストから検索する
+
+    キーワード数が FLOW_KEYWORD_SCAN_THRESHOLD を超える場合は、キーワードのトライ木を
+    正規表現にコンパイルしたオートマトンで応答を1回だけ走査する。先読みで各位置の最長一致を求め、
+    同じ位置から一致するより短いキーワード（最長一致の接頭辞）は事前に求めたビット集合で補う。
+    キーワードが少ない場合は、キーワードごとの部分文字列検索の方が速いためそちらを使う。
+    キーワードは小文字化して登録し、検索対象のテキストも小文字化して渡す。
+    検索結果は一致したキーワードの番号をビットで表した整数として返す。
+    """
+
+    __slots__ = ("keywords", "_pattern", "_prefix_masks", "_all")
+
+    def __init__(self, keywords: Sequence[str], scan_threshold: int = FLOW_KEYWORD_SCAN_THRESHOLD):
+        """
+        KeywordMatcherの初期化
+
+        Args:
+            keywords: 小文字化済みの空でないキーワード（番号はリスト内の位置）
+            scan_threshold: 1回の走査で検索するキーワード数の下限
+        """
+        self.keywords = tuple(keywords)
+        self._all = (1 << len(self.keywords)) - 1
+        self._pattern = None
+        self._prefix_masks: Dict[str, int] = {}
+        if len(self.keywords) <= scan_threshold:
+            return
+
+        trie: Dict[str, dict] = {}
+        for keyword in self.keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[""] = {}
+        self._pattern = re.compile(f"(?=({_trie_pattern(trie)}))")
+        # 各キーワードについて、そのキーワードの接頭辞になっているキーワード（自身を含む）のビット集合
+        indexes = {keyword: index for index, keyword in enumerate(self.keywords)}
+        for keyword in self.keywords:
+            node = trie
+            mask = 0
+            for length, char in enumerate(keyword, 1):
+                node = node[char]
+                if "" in node:
+                    mask |= 1 << indexes[keyword[:length]]
+            self._prefix_masks[keyword] = mask
+
+    def search(self, text: str) -> int:
+        """
+        テキストに含まれるキーワードを検索する（すべて見つかった時点で打ち切る）
+
+        Args:
+            text: 小文字化済みの検索対象のテキスト
+
+        Returns:
+            int: 一致したキーワードの番号のビット集合
+        """
+        if self._pattern is None:
+            return sum(1 << index for index, keyword in enumerate(self.keywords) if keyword in text)
+        prefix_masks, all_matched = self._prefix_masks, self._all
+        matched = 0
+        for match in self._pattern.finditer(text):
+            matched |= prefix_masks[match.group(1)]
+            if matched == all_matched:
+                break
+        return matched
+
+
+def _trie_pattern(node: Dict[str, dict]) -> str:
+    """トライ木を、最長一致を優先する正規表現に変換する"""
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+    # キーワードの終端を含むノードでは続きを省略可能にする（貪欲なので長い方が優先される）
+    return f"(?:{pattern})?" if "" in node else pattern
+
+
+class ConditionSet:
+    """
+    接続元1つ分の条件式をまとめてコンパイルする
+
+    条件式は次の構文をサポートする（eval は使用しない）
+    - contains('語', ...): 応答にいずれかの語が含まれる（大文字小文字を区別しない）
+    - regex('パターン'): 応答が正規表現に一致する（大文字小文字を区別する。区別しない場合は (?i) を付ける）
+    - length > 100: 応答の文字数の比較（<, <=, >, >=, ==, !=）
+    - confidence >= 70: 応答の末尾の自己評価の確信度（[confidence: 0〜100]、付いていない場合は0）の比較
+    - and / or / not / 括弧 / true / false
+    以前の形式との互換のため、'語' in response・response.contains('語')・len(response) も受け付ける。
+    contains の語は接続元のすべての条件式で共有する KeywordMatcher に登録され、応答ごとにまとめて判定される。
+    """
+
+    def __init__(self):
+        """ConditionSetの初期化"""
+        self._keywords: Dict[str, int] = {}  # 小文字化したキーワード -> 番号
+
+    def compile(self, source: str) -> Predicate:
+        """
+        条件式をコンパイルする
+
+        Args:
+            source: 条件式
+
+        Returns:
+            Predicate: 応答テキストと KeywordMatcher.search の結果を受け取り、条件の真偽を返す関数
+
+        Raises:
+            ConditionError: 条件式に構文エラーがある場合
+        """
+        return _Parser(source, self._keywords).parse()
+
+    def matcher(self) -> KeywordMatcher:
+        """
+        登録されたキーワードをまとめて検索する KeywordMatcher を作成する
+
+        Returns:
+            KeywordMatcher: キーワードの検索
+        """
+        return KeywordMatcher(sorted(self._keywords, key=self._keywords.get))
+
+
+class _Parser:
+    """条件式の再帰下降パーサー（構文木を作らずに述語のクロージャを直接組み立てる）"""
+
+    def __init__(self, source: str, keywords: Dict[str, int]):
+        self.source = source
+        self.keywords = keywords
+        self.tokens = self._tokenize(source)
+        self.position = 0
+
+    def _tokenize(self, source: str) -> List[Tuple[str, str, int]]:
+        """条件式を (種類, 値, 位置) の字句のリストに分割する"""
+        tokens = []
+        position = 0
+        length = len(source)
+        while True:
+            while position < length and source[position].isspace():
+                position += 1
+            if position >= length:
+                break
+            match = _TOKEN_PATTERN.match(source, position)
+            if not match:
+                raise ConditionError(f"位置 {position + 1}: 解釈できない文字があります: {source[position]!r}")
+            kind = match.lastgroup
+            tokens.append((kind, match.group(kind), match.start(kind)))
+            position = match.end()
+        tokens.append(("end", "", length))
+        return tokens
+
+    def _peek(self) -> Tuple[str, str, int]:
+        return self.tokens[self.position]
+
+    def _next(self) -> Tuple[str, str, int]:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def _accept(self, kind: str, value: str = None) -> bool:
+        token_kind, token_value, _ = self._peek()
+        if token_kind == kind and (value is None or token_value == value):
+            self.position += 1
+            return True
+        return False
+
+    def _expect(self, kind: str, value: str = None, description: str = None) -> str:
+        token_kind, token_value, position = self._next()
+        if token_kind != kind or (value is not None and token_value != value):
+            expected = description or f"'{value}'"
+            found = token_value or "式の終わり"
+            raise ConditionError(f"位置 {position + 1}: {expected}が必要ですが '{found}' があります")
+        return token_value
+
+    def _string(self) -> str:
+        return ast.literal_eval(self._expect("string", description="文字列"))
+
+    def parse(self) -> Predicate:
+        if self._peek()[0] == "end":
+            raise ConditionError("条件式が空です")
+        predicate = self._or()
+        kind, value, position = self._peek()
+        if kind != "end":
+            raise ConditionError(f"位置 {position + 1}: 余分な字句があります: '{value}'")
+        return predicate
+
+    def _or(self) -> Predicate:
+        operands = [self._and()]
+        while self._accept("name", "or"):
+            operands.append(self._and())
+        if len(operands) == 1:
+            return operands[0]
+        return lambda response, matched: any(operand(response, matched) for operand in operands)
+
+    def _and(self) -> Predicate:
+        operands = [self._not()]
+        while self._accept("name", "and"):
+            operands.append(self._not())
+        if len(operands) == 1:
+            return operands[0]
+        return lambda response, matched: all(operand(response, matched) for operand in operands)
+
+    def _not(self) -> Predicate:
+        if self._accept("name", "not"):
+            operand = self._not()
+            return lambda response, matched: not operand(response, matched)
+        return self._primary()
+
+    def _primary(self) -> Predicate:
+        kind, value, position = self._peek()
+        if self._accept("symbol", "("):
+            predicate = self._or()
+            self._expect("symbol", ")")
+            return predicate
+        if kind == "string":
+            # 互換: '語' in response
+            keyword = self._string()
+            self._expect("name", "in")
+            self._expect("name", "response")
+            return self._contains([keyword])
+        if kind != "name":
+            raise ConditionError(f"位置 {position + 1}: 条件が必要ですが '{value or '式の終わり'}' があります")
+
+        self.position += 1
+        if value in ("true", "True"):
+            return lambda response, matched: True
+        if value in ("false", "False"):
+            return lambda response, matched: False
+        if value == "response":
+            # 互換: response.contains('語')
+            self._expect("symbol", ".")
+            value = self._expect("name", "contains")
+        if value == "contains":
+            self._expect("symbol", "(")
+            keywords = [self._string()]
+            while self._accept("symbol", ","):
+                keywords.append(self._string())
+            self._expect("symbol", ")")
+            return self._contains(keywords)
+        if value == "regex":
+            self._expect("symbol", "(")
+            pattern_source = self._string()
+            self._expect("symbol", ")")
+            try:
+                pattern = re.compile(pattern_source)
+            except re.error as e:
+                raise ConditionError(f"位置 {position + 1}: 正規表現のエラー: {e}") from None
+            return lambda response, matched: pattern.search(response) is not None
+        if value in ("length", "len"):
+            if self._accept("symbol", "("):
+                if value == "len":
+                    self._expect("name", "response")
+                self._expect("symbol", ")")
+            compare, limit = self._comparison()
+            return lambda response, matched: compare(len(response), limit)
+        if value == "confidence":
+            compare, limit = self._comparison()
+            return lambda response, matched: compare(response_confidence(response) or 0, limit)
+        raise ConditionError(f"位置 {position + 1}: 不明な名前です: '{value}'")
+
+    def _comparison(self) -> Tuple[Callable[[int, int], bool], int]:
+        """比較演算子と数値を読み取る"""
+        op_kind, op, op_position = self._next()
+        compare = _COMPARISONS.get(op) if op_kind == "symbol" else None
+        if compare is None:
+            raise ConditionError(f"位置 {op_position + 1}: 比較演算子が必要ですが '{op or '式の終わり'}' があります")
+        return compare, int(self._expect("number", description="数値"))
+
+    def _contains(self, keywords: List[str]) -> Predicate:
+        """キーワードを登録し、いずれかが一致したかをビットで判定する述語を作成"""
+        mask = 0
+        for keyword in keywords:
+            keyword = keyword.lower()
+            if not keyword:
+                # 空文字列は常に含まれる
+                return lambda response, matched: True
+            index = self.keywords.setdefault(keyword, len(self.keywords))
+            mask |= 1 << index
+        return lambda response, matched: bool(matched & mask)
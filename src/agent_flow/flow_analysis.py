@@ -0,0 +1,267 @@
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple
+
+from src.agent_builder.agent_types import CONNECTION_TYPE_LABELS, ConnectionType
+from src.config.settings import FLOW_LOOP_ITERATIONS, FLOW_MAX_EXECUTIONS
+
+if TYPE_CHECKING:
+    from src.agent_flow.flow_plan import CompiledEdge
+
+# 問題の重大度
+ERROR = "error"      # 実行すると必ず失敗する、または意図どおりに動かない問題（保存できない）
+WARNING = "warning"  # 実行はできるが無駄や終了条件の問題がある
+
+
+class FlowIssue(NamedTuple):
+    """静的解析で見つかったフローの問題"""
+    level: str
+    code: str
+    message: str
+    agent_id: Optional[str] = None
+    connection_id: Optional[str] = None
+
+
+class FlowAnalysis:
+    """
+    フローの静的解析の結果
+
+    エントリーポイントから到達可能なエージェント、循環、実行回数の上限と、
+    見つかった問題をまとめたもの
+    """
+
+    __slots__ = ("reachable", "cycles", "execution_bound", "issues")
+
+    def __init__(self, reachable: FrozenSet[str], cycles: Tuple[Tuple[str, ...], ...],
+                 execution_bound: int, issues: Tuple[FlowIssue, ...]):
+        """
+        FlowAnalysisの初期化
+
+        Args:
+            reachable: エントリーポイントから到達可能なエージェントIDの集合
+            cycles: 循環を構成するエージェントIDの組（強連結成分）のリスト
+            execution_bound: フロー全体での実行回数の上限
+            issues: 見つかった問題
+        """
+        self.reachable = reachable
+        self.cycles = cycles
+        self.execution_bound = execution_bound
+        self.issues = issues
+
+    @property
+    def errors(self) -> Tuple[FlowIssue, ...]:
+        """保存できない問題"""
+        return tuple(issue for issue in self.issues if issue.level == ERROR)
+
+    @property
+    def warnings(self) -> Tuple[FlowIssue, ...]:
+        """警告"""
+        return tuple(issue for issue in self.issues if issue.level == WARNING)
+
+
+def analyze_flow(entry_point_id: Optional[str], names: Mapping[str, str],
+                 edges: Sequence["CompiledEdge"]) -> FlowAnalysis:
+    """
+    フローを静的に解析する
+
+    次の問題を検出する
+    - エントリーポイントの未設定・存在しないエージェントを参照する接続・不明な接続タイプ・接続IDの重複
+    - 条件式の構文エラー・条件が未設定の条件分岐
+    - エントリーポイントから到達できないエージェント（実行時の初期化対象から除く）
+    - 条件分岐しかなく、どの条件にも一致しない場合の接続先（フォールバック）がないエージェント
+    - 並列実行接続と同時に定義されたため使われない接続
+    - 循環（条件分岐で抜け出せない循環は警告）
+
+    また、循環がない場合はエントリーポイントからの経路数からフロー全体の実行回数の上限を求める
+
+    Args:
+        entry_point_id: エントリーポイントのエージェントID
+        names: エージェントID -> エージェント名
+        edges: コンパイル済みの接続
+
+    Returns:
+        FlowAnalysis: 解析結果
+    """
+    issues: List[FlowIssue] = []
+
+    if not entry_point_id:
+        issues.append(FlowIssue(ERROR, "entry_point_missing", "エントリーポイントが設定されていません"))
+    elif entry_point_id not in names:
+        issues.append(FlowIssue(ERROR, "entry_point_unknown",
+                                f"エントリーポイントのエージェント (ID: {entry_point_id}) がフローに含まれていません",
+                                agent_id=entry_point_id))
+
+    # 接続の検証（両端がフロー内にある接続だけをグラフに使う）
+    outgoing: Dict[str, List["CompiledEdge"]] = {agent_id: [] for agent_id in names}
+    seen_ids: Set[str] = set()
+    for edge in edges:
+        label = f"{names.get(edge.source_id, '不明')} → {names.get(edge.target_id, '不明')}"
+        if edge.connection_id in seen_ids:
+            issues.append(FlowIssue(ERROR, "duplicate_connection_id",
+                                    f"接続ID '{edge.connection_id}' が重複しています ({label})",
+                                    connection_id=edge.connection_id))
+        seen_ids.add(edge.connection_id)
+        if edge.connection_type not in CONNECTION_TYPE_LABELS:
+            issues.append(FlowIssue(ERROR, "unknown_connection_type",
+                                    f"不明な接続タイプです: {edge.connection_type} ({label})",
+                                    connection_id=edge.connection_id))
+            continue
+        unknown = [agent_id for agent_id in (edge.source_id, edge.target_id) if agent_id not in names]
+        if unknown:
+            issues.append(FlowIssue(ERROR, "unknown_agent",
+                                    f"接続がフローに含まれないエージェント (ID: {', '.join(unknown)}) を参照しています",
+                                    connection_id=edge.connection_id))
+            continue
+        if edge.connection_type == ConnectionType.CONDITIONAL:
+            if edge.condition_error:
+                issues.append(FlowIssue(ERROR, "condition_syntax",
+                                        f"条件式の構文エラー ({label}): {edge.condition_error}",
+                                        agent_id=edge.source_id, connection_id=edge.connection_id))
+            elif not edge.condition:
+                issues.append(FlowIssue(WARNING, "condition_missing",
+                                        f"条件分岐に条件が設定されていないため、この接続は使われません ({label})",
+                                        agent_id=edge.source_id, connection_id=edge.connection_id))
+        outgoing[edge.source_id].append(edge)
+
+    # エントリーポイントからの到達可能性
+    reachable: Set[str] = set()
+    if entry_point_id in names:
+        stack = [entry_point_id]
+        reachable.add(entry_point_id)
+        while stack:
+            agent_id = stack.pop()
+            for edge in outgoing[agent_id]:
+                if edge.target_id not in reachable:
+                    reachable.add(edge.target_id)
+                    stack.append(edge.target_id)
+        if not outgoing[entry_point_id] and len(names) > 1:
+            issues.append(FlowIssue(WARNING, "entry_point_isolated",
+                                    f"エントリーポイント '{names[entry_point_id]}' から出る接続がないため、"
+                                    "他のエージェントは実行されません", agent_id=entry_point_id))
+        for agent_id, name in names.items():
+            if agent_id not in reachable:
+                issues.append(FlowIssue(WARNING, "unreachable",
+                                        f"エージェント '{name}' はエントリーポイントから到達できないため実行されません",
+                                        agent_id=agent_id))
+
+    # ルーティングの検証
+    for agent_id in names:
+        if agent_id not in reachable:
+            continue
+        source_edges = outgoing[agent_id]
+        if any(edge.connection_type == ConnectionType.PARALLEL for edge in source_edges):
+            ignored = [edge for edge in source_edges
+                       if edge.connection_type not in (ConnectionType.PARALLEL, ConnectionType.JOIN)]
+            if ignored:
+                issues.append(FlowIssue(WARNING, "ignored_edges",
+                                        f"エージェント '{names[agent_id]}' は並列実行接続を持つため、"
+                                        f"他の接続 ({len(ignored)} 件) は使われません", agent_id=agent_id))
+        elif source_edges and all(edge.connection_type == ConnectionType.CONDITIONAL for edge in source_edges):
+            issues.append(FlowIssue(WARNING, "no_fallback",
+                                    f"エージェント '{names[agent_id]}' の接続は条件分岐のみのため、"
+                                    "どの条件にも一致しない場合はフローが終了します", agent_id=agent_id))
+
+    # 循環の検出（到達可能な範囲の強連結成分）
+    cycles = _find_cycles(reachable, outgoing)
+    for cycle in cycles:
+        cycle_names = " → ".join(names[agent_id] for agent_id in cycle)
+        has_exit = any(
+            edge.connection_type == ConnectionType.CONDITIONAL
+            for agent_id in cycle for edge in outgoing[agent_id]
+        )
+        if has_exit:
+            issues.append(FlowIssue(WARNING, "cycle",
+                                    f"循環があります: {cycle_names}（条件分岐で抜け出せない場合は実行回数の上限で停止します）",
+                                    agent_id=cycle[0]))
+        else:
+            issues.append(FlowIssue(WARNING, "unconditional_cycle",
+                                    f"条件分岐のない循環があります: {cycle_names}（常に実行回数の上限まで繰り返されます）",
+                                    agent_id=cycle[0]))
+
+    execution_bound = _execution_bound(entry_point_id, reachable, outgoing, bool(cycles))
+    # 循環がないフローは上限を超えて実行されることがないため、求めた上限をそのまま使う
+    if cycles and execution_bound > FLOW_MAX_EXECUTIONS:
+        issues.append(FlowIssue(WARNING, "execution_bound_capped",
+                                f"実行回数の上限 ({execution_bound} 回) が設定値 {FLOW_MAX_EXECUTIONS} 回を超えるため、"
+                                f"{FLOW_MAX_EXECUTIONS} 回で打ち切ります"))
+        execution_bound = FLOW_MAX_EXECUTIONS
+
+    return FlowAnalysis(frozenset(reachable), cycles, execution_bound, tuple(issues))
+
+
+def _find_cycles(reachable: Set[str], outgoing: Mapping[str, List["CompiledEdge"]]) -> Tuple[Tuple[str, ...], ...]:
+    """到達可能な範囲で循環を構成する強連結成分を求める（Tarjanのアルゴリズムを反復で実装）"""
+    index: Dict[str, int] = {}
+    lowlink: Dict[str, int] = {}
+    on_stack: Set[str] = set()
+    stack: List[str] = []
+    cycles: List[Tuple[str, ...]] = []
+    counter = 0
+    for root in reachable:
+        if root in index:
+            continue
+        work = [(root, iter(outgoing[root]))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, children = work[-1]
+            edge = next(children, None)
+            if edge is not None:
+                child = edge.target_id
+                if child not in index:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(outgoing[child])))
+                elif child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                self_loop = any(edge.target_id == node for edge in outgoing[node])
+                if len(component) > 1 or self_loop:
+                    cycles.append(tuple(reversed(component)))
+    return tuple(cycles)
+
+
+def _execution_bound(entry_point_id: Optional[str], reachable: Set[str],
+                     outgoing: Mapping[str, List["CompiledEdge"]], has_cycles: bool) -> int:
+    """
+    フロー全体での実行回数の上限を求める
+
+    循環がない場合、各エージェントが実行される回数はエントリーポイントからの経路数以下のため、
+    その合計を上限とする（並列実行の枝はそれぞれ別の経路として数えられる）。実行がこの上限に達することはないため、
+    FLOW_MAX_EXECUTIONS による打ち切りは行わない。
+    循環がある場合は到達可能なエージェント数 × FLOW_LOOP_ITERATIONS とする（FLOW_MAX_EXECUTIONS を超えない）。
+    """
+    if not reachable:
+        return 0
+    if has_cycles:
+        return len(reachable) * FLOW_LOOP_ITERATIONS
+
+    # トポロジカル順に経路数を伝播する
+    indegree = {agent_id: 0 for agent_id in reachable}
+    for agent_id in reachable:
+        for edge in outgoing[agent_id]:
+            indegree[edge.target_id] += 1
+    paths = {agent_id: 0 for agent_id in reachable}
+    paths[entry_point_id] = 1
+    queue = [entry_point_id]
+    for agent_id in queue:
+        for edge in outgoing[agent_id]:
+            paths[edge.target_id] += paths[agent_id]
+            indegree[edge.target_id] -= 1
+            if indegree[edge.target_id] == 0:
+                queue.append(edge.target_id)
+    return sum(paths.values())
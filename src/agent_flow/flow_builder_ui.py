@@ -3,7 +3,12 @@ import uuid
 from typing import Dict, List, Optional, Tuple, Any
 import json
 import base64
-from src.agent_builder.agent_types import AgentFlow, AgentConfig, AgentConnection, ConnectionType
+from src.agent_builder.agent_types import AgentFlow, AgentConfig, AgentConnection, ConnectionType, CONNECTION_TYPE_LABELS
+from src.agent_flow.conditions import ConditionError, ConditionSet
+from src.agent_flow.flow_analysis import FlowAnalysis
+from src.agent_flow.flow_diagram import get_flow_diagram
+from src.agent_flow.flow_plan import compile_flow
+from src.config.settings import FLOW_DIAGRAM_MAX_HEIGHT
 
 def agent_flow_builder_ui():
     """
@@ -14,6 +19,10 @@ def agent_flow_builder_ui():
     """
     st.header("エージェントフロービルダー")
     
+    # 直前に保存したフローの解析で見つかった警告（保存後の再読み込みで消えないようにセッション経由で表示）
+    for message in st.session_state.pop("flow_analysis_warnings", []):
+        st.warning(message)
+    
     # セッション状態の初期化
     if "flows" not in st.session_state:
         st.session_state.flows = {}
@@ -133,7 +142,7 @@ def agent_flow_builder_ui():
             for i, conn in enumerate(existing_connections):
                 source_name = next((a.name for a in flow_agents if a.id == conn.source_id), "不明")
                 target_name = next((a.name for a in flow_agents if a.id == conn.target_id), "不明")
-                conn_type_name = "ハンドオフ" if conn.connection_type == ConnectionType.HANDOFF else "順次実行" if conn.connection_type == ConnectionType.SEQUENTIAL else "条件分岐"
+                conn_type_name = CONNECTION_TYPE_LABELS.get(conn.connection_type, conn.connection_type)
                 
                 col1, col2, col3 = st.columns([3, 2, 1])
                 with col1:
@@ -225,8 +234,16 @@ def agent_flow_builder_ui():
             entry_point_id=entry_point_id
         )
         
+        # フローを静的解析し、実行できない問題がある場合は保存しない
+        analysis = compile_flow(flow_config).analysis
+        if analysis.errors:
+            show_flow_analysis(analysis)
+            st.error("フローに問題があるため保存できません。上記のエラーを修正してください")
+            return None
+        
         # フローをセッション状態に保存
         st.session_state.flows[flow_id] = flow_config
+        st.session_state.flow_analysis_warnings = [issue.message for issue in analysis.warnings]
         
         # 一時保存された接続情報をクリア
         if temp_connection_key in st.session_state.temp_connections:
@@ -244,6 +261,18 @@ def agent_flow_builder_ui():
     
     return None
 
+def show_flow_analysis(analysis: FlowAnalysis):
+    """
+    フローの静的解析の結果（エラーと警告）を表示
+    
+    Args:
+        analysis: フローの静的解析の結果
+    """
+    for issue in analysis.errors:
+        st.error(issue.message)
+    for issue in analysis.warnings:
+        st.warning(issue.message)
+
 def connection_ui(agents: List[AgentConfig], connections: List[AgentConnection], temp_connection_key: str):
     """
     エージェント間の新しい接続を作成するUI
@@ -292,17 +321,20 @@ def connection_ui(agents: List[AgentConfig], connections: List[AgentConnection],
         
         connection_type = st.selectbox(
             "接続タイプ",
-            options=[ConnectionType.HANDOFF, ConnectionType.SEQUENTIAL, ConnectionType.CONDITIONAL],
-            format_func=lambda x: "ハンドオフ" if x == ConnectionType.HANDOFF else "順次実行" if x == ConnectionType.SEQUENTIAL else "条件分岐",
+            options=list(CONNECTION_TYPE_LABELS.keys()),
+            format_func=lambda x: CONNECTION_TYPE_LABELS.get(x, x),
+            help="並列実行: 同じ接続元の並列実行接続先をすべて同時に実行します。合流: 並列実行された枝の結果をまとめて接続先に渡します。",
             key=f"{form_key}_type"
         )
         
         condition = None
         if connection_type == ConnectionType.CONDITIONAL:
             condition = st.text_area(
-                "条件式 (Python形式)",
-                value="response.contains('注文') or category == 'order'",
-                help="この条件が True の場合に接続先エージェントが実行されます。",
+                "条件式",
+                value="contains('注文', 'order')",
+                help="この条件が成り立つ場合に接続先エージェントが実行されます。"
+                     "contains('語', ...)（いずれかの語を含む）、regex('パターン')、length > 100 を "
+                     "and / or / not と括弧で組み合わせて記述します。",
                 key=f"{form_key}_condition"
             )
         
@@ -310,6 +342,14 @@ def connection_ui(agents: List[AgentConfig], connections: List[AgentConnection],
         submitted = st.form_submit_button("接続を追加")
     
     if submitted and target_id:
+        # 条件式は追加する時点で構文を検証する
+        condition_error = None
+        if condition:
+            try:
+                ConditionSet().compile(condition)
+            except ConditionError as e:
+                condition_error = str(e)
+        
         # 既に同じ接続元と接続先の組み合わせが存在するかチェック
         existing = any(conn.source_id == source_id and conn.target_id == target_id for conn in connections)
         
@@ -317,6 +357,8 @@ def connection_ui(agents: List[AgentConfig], connections: List[AgentConnection],
             st.warning("同じエージェント間の接続が既に存在します。")
         elif source_id == target_id:
             st.warning("自己参照の接続はサポートされていません。")
+        elif condition_error:
+            st.error(f"条件式の構文エラー: {condition_error}")
         else:
             # 新しい接続を作成
             new_connection = AgentConnection(
@@ -355,51 +397,26 @@ def flow_visualization(agents: List[AgentConfig], connections: List[AgentConnect
     if show_code:
         st.write(f"**エージェント数:** {len(agents)}")
         st.write(f"**接続数:** {len(connections)}")
+        agent_names = {agent.id: agent.name for agent in agents}
         for conn in connections:
-            source_name = next((a.name for a in agents if a.id == conn.source_id), "不明")
-            target_name = next((a.name for a in agents if a.id == conn.target_id), "不明")
+            source_name = agent_names.get(conn.source_id, "不明")
+            target_name = agent_names.get(conn.target_id, "不明")
             st.write(f"- 接続: {source_name} → {target_name} ({conn.connection_type})")
     
-    # Mermaid.jsを使ったフロー図の生成
-    mermaid_code = "graph LR\n"
-    
-    # エージェントのノードを追加（短いID表現を使用）
-    agent_short_ids = {}
-    for i, agent in enumerate(agents):
-        short_id = f"A{i+1}"
-        agent_short_ids[agent.id] = short_id
-        mermaid_code += f"    {short_id}[{agent.name}]\n"
-    
-    # 接続を追加（短いID表現を使用）
-    for conn in connections:
-        source_id = agent_short_ids.get(conn.source_id, conn.source_id)
-        target_id = agent_short_ids.get(conn.target_id, conn.target_id)
-        
-        if conn.connection_type == ConnectionType.HANDOFF:
-            mermaid_code += f"    {source_id} -->|ハンドオフ| {target_id}\n"
-        elif conn.connection_type == ConnectionType.SEQUENTIAL:
-            mermaid_code += f"    {source_id} -->|順次実行| {target_id}\n"
-        elif conn.connection_type == ConnectionType.CONDITIONAL:
-            mermaid_code += f"    {source_id} -->|条件分岐| {target_id}\n"
-    
-    # HTML埋め込みによるMermaid図の表示
-    html = f"""
-    <script src="https://cdn.jsdelivr.net/npm/mermaid@10/dist/mermaid.min.js"></script>
-    <div class="mermaid">
-    {mermaid_code}
-    </div>
-    <script>
-        mermaid.initialize({{ startOnLoad: true }});
-    </script>
-    """
+    # フロー図はサーバー側でSVGに描画し、エージェントと接続が変わらない限り描画済みのものを再利用する
+    # （外部のスクリプトを読み込まないため、オフラインでも表示できる）
+    diagram = get_flow_diagram(agents, connections)
     
     # コード表示（デバッグ用）- list_flows_ui 内では使用しない
     if show_code:
         st.write("**フロー図コード (Mermaid):**")
-        st.code(mermaid_code, language="markdown")
+        st.code(diagram.mermaid, language="markdown")
     
-    # HTMLをiframeで埋め込み
-    st.components.v1.html(html, height=300)
+    # 大きなフローは表示領域の中でスクロールする
+    st.markdown(
+        f'<div style="overflow:auto;max-height:{FLOW_DIAGRAM_MAX_HEIGHT}px">{diagram.svg}</div>',
+        unsafe_allow_html=True
+    )
 
 def list_flows_ui():
     """
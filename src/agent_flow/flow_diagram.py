@@ -0,0 +1,316 @@
+import hashlib
+import html
+import json
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.agent_builder.agent_types import AgentConfig, AgentConnection, ConnectionType, CONNECTION_TYPE_LABELS
+from src.config.settings import FLOW_DIAGRAM_CACHE_SIZE
+
+# 図の寸法（ピクセル）
+FONT_SIZE = 13
+LABEL_FONT_SIZE = 11
+NODE_HEIGHT = 36
+NODE_PADDING = 14        # ノード内の文字の左右の余白
+NODE_MIN_WIDTH = 80
+LAYER_GAP = 110          # 層（左から右への段）の間隔
+ROW_GAP = 28             # 同じ層のノードの間隔
+MARGIN = 24
+MAX_LABEL_CHARS = 24     # ノードに表示するエージェント名の最大文字数
+
+# 並列実行・合流は点線で表示する
+DASHED_TYPES = (ConnectionType.PARALLEL, ConnectionType.JOIN)
+
+
+class FlowDiagram:
+    """描画済みのフロー図"""
+
+    __slots__ = ("key", "mermaid", "svg", "width", "height")
+
+    def __init__(self, key: str, mermaid: str, svg: str, width: int, height: int):
+        """
+        FlowDiagramの初期化
+
+        Args:
+            key: エージェントと接続の内容ハッシュ
+            mermaid: Mermaid形式の図のコード
+            svg: SVG形式の図
+            width: 図の幅
+            height: 図の高さ
+        """
+        self.key = key
+        self.mermaid = mermaid
+        self.svg = svg
+        self.width = width
+        self.height = height
+
+
+def diagram_key(agents: Sequence[AgentConfig], connections: Sequence[AgentConnection]) -> str:
+    """
+    図の内容を決めるエージェントと接続のハッシュ値を計算する
+
+    Args:
+        agents: フロー内のエージェントリスト
+        connections: エージェント間の接続リスト
+
+    Returns:
+        str: 内容ハッシュ（SHA-256）
+    """
+    payload = json.dumps({
+        "agents": [(agent.id, agent.name) for agent in agents],
+        "connections": [(conn.source_id, conn.target_id, conn.connection_type) for conn in connections]
+    }, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def mermaid_source(agents: Sequence[AgentConfig], connections: Sequence[AgentConnection]) -> str:
+    """
+    フロー図をMermaid形式のコードとして作成する（表示・コピー用）
+
+    Args:
+        agents: フロー内のエージェントリスト
+        connections: エージェント間の接続リスト
+
+    Returns:
+        str: Mermaid形式のコード
+    """
+    lines = ["graph LR"]
+    # エージェントのノードを追加（短いID表現を使用）
+    agent_short_ids = {}
+    for i, agent in enumerate(agents):
+        short_id = f"A{i+1}"
+        agent_short_ids[agent.id] = short_id
+        lines.append(f"    {short_id}[{agent.name}]")
+    # 接続を追加（短いID表現を使用）
+    for conn in connections:
+        if conn.connection_type not in CONNECTION_TYPE_LABELS:
+            continue
+        source_id = agent_short_ids.get(conn.source_id, conn.source_id)
+        target_id = agent_short_ids.get(conn.target_id, conn.target_id)
+        label = CONNECTION_TYPE_LABELS[conn.connection_type]
+        arrow = "-.->" if conn.connection_type in DASHED_TYPES else "-->"
+        lines.append(f"    {source_id} {arrow}|{label}| {target_id}")
+    return "\n".join(lines) + "\n"
+
+
+def text_width(text: str, font_size: int = FONT_SIZE) -> float:
+    """文字列の表示幅を概算する（全角文字は半角文字の約2倍の幅として数える）"""
+    units = sum(2 if unicodedata.east_asian_width(char) in ("W", "F") else 1.1 for char in text)
+    return units * font_size * 0.5
+
+
+def layout(agents: Sequence[AgentConfig], edges: Sequence[Tuple[str, str]]) -> Tuple[Dict[str, int], List[List[str]]]:
+    """
+    ノードを左から右への層に配置する
+
+    循環する接続は深さ優先探索で見つけた逆向きの辺を除いて扱い、
+    接続元から最も長い経路の長さを層とする。同じ層の中の順序は、
+    前の層の接続元の位置の平均（重心）で並べ替えて辺の交差を減らす。
+
+    Args:
+        agents: フロー内のエージェントリスト
+        edges: (接続元ID, 接続先ID) のリスト（両端がフロー内にあるもの）
+
+    Returns:
+        Tuple[Dict[str, int], List[List[str]]]: (エージェントID -> 層, 層ごとのエージェントIDのリスト)
+    """
+    order = [agent.id for agent in agents]
+    successors: Dict[str, List[str]] = {agent_id: [] for agent_id in order}
+    for source, target in edges:
+        if source != target:
+            successors[source].append(target)
+
+    # 循環の原因となる辺（探索中のノードへ戻る辺）を除く
+    incoming = {target for _, target in edges}
+    roots = [agent_id for agent_id in order if agent_id not in incoming] + order
+    state: Dict[str, int] = {}  # 1: 探索中, 2: 探索済み
+    forward: Dict[str, List[str]] = {agent_id: [] for agent_id in order}
+    for root in roots:
+        if root in state:
+            continue
+        stack = [(root, iter(successors[root]))]
+        state[root] = 1
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                state[node] = 2
+                stack.pop()
+            elif child not in state:
+                forward[node].append(child)
+                state[child] = 1
+                stack.append((child, iter(successors[child])))
+            elif state[child] == 2:
+                forward[node].append(child)
+
+    # 最長経路で層を決める（トポロジカル順に処理）
+    indegree = {agent_id: 0 for agent_id in order}
+    for targets in forward.values():
+        for target in targets:
+            indegree[target] += 1
+    layer = {agent_id: 0 for agent_id in order}
+    queue = [agent_id for agent_id in order if indegree[agent_id] == 0]
+    for node in queue:
+        for target in forward[node]:
+            layer[target] = max(layer[target], layer[node] + 1)
+            indegree[target] -= 1
+            if indegree[target] == 0:
+                queue.append(target)
+
+    layers: List[List[str]] = [[] for _ in range(max(layer.values(), default=0) + 1)]
+    for agent_id in order:
+        layers[layer[agent_id]].append(agent_id)
+
+    # 重心法で層内の順序を並べ替える
+    predecessors: Dict[str, List[str]] = {agent_id: [] for agent_id in order}
+    for source, targets in forward.items():
+        for target in targets:
+            predecessors[target].append(source)
+    for _ in range(2):
+        position = {agent_id: index for nodes in layers for index, agent_id in enumerate(nodes)}
+        for nodes in layers[1:]:
+            def barycenter(agent_id: str, current: int) -> float:
+                sources = predecessors[agent_id]
+                return sum(position[source] for source in sources) / len(sources) if sources else current
+            nodes.sort(key=lambda agent_id: barycenter(agent_id, position[agent_id]))
+            position.update({agent_id: index for index, agent_id in enumerate(nodes)})
+    return layer, [nodes for nodes in layers if nodes]
+
+
+def render_svg(agents: Sequence[AgentConfig], connections: Sequence[AgentConnection]) -> Tuple[str, int, int]:
+    """
+    フロー図をSVGとして描画する（外部のスクリプトやネットワークを使用しない）
+
+    Args:
+        agents: フロー内のエージェントリスト
+        connections: エージェント間の接続リスト
+
+    Returns:
+        Tuple[str, int, int]: (SVG, 幅, 高さ)
+    """
+    names = {}
+    for agent in agents:
+        name = agent.name if len(agent.name) <= MAX_LABEL_CHARS else agent.name[:MAX_LABEL_CHARS - 1] + "…"
+        names[agent.id] = name
+    edges = [
+        conn for conn in connections
+        if conn.connection_type in CONNECTION_TYPE_LABELS and conn.source_id in names and conn.target_id in names
+    ]
+    layer, layers = layout(agents, [(conn.source_id, conn.target_id) for conn in edges])
+
+    # 層ごとの幅（最も長い名前に合わせる）とノードの座標
+    layer_widths = [
+        max(NODE_MIN_WIDTH, max(text_width(names[agent_id]) for agent_id in nodes) + NODE_PADDING * 2)
+        for nodes in layers
+    ]
+    tallest = max(len(nodes) for nodes in layers)
+    body_height = tallest * NODE_HEIGHT + (tallest - 1) * ROW_GAP
+    # 自分自身への接続はノードの上側にループを描くため、その分の余白をとる
+    top = MARGIN + (NODE_HEIGHT if any(conn.source_id == conn.target_id for conn in edges) else 0)
+    boxes: Dict[str, Tuple[float, float, float]] = {}  # エージェントID -> (左端x, 上端y, 幅)
+    x = MARGIN
+    for nodes, width in zip(layers, layer_widths):
+        column_height = len(nodes) * NODE_HEIGHT + (len(nodes) - 1) * ROW_GAP
+        y = top + (body_height - column_height) / 2
+        for agent_id in nodes:
+            boxes[agent_id] = (x, y, width)
+            y += NODE_HEIGHT + ROW_GAP
+        x += width + LAYER_GAP
+    # 逆向きの辺は図の下側を回り込むため、その分の余白をとる
+    has_back_edges = any(layer[conn.target_id] <= layer[conn.source_id] for conn in edges)
+    width = int(x - LAYER_GAP + MARGIN)
+    height = int(top + body_height + MARGIN + (NODE_HEIGHT if has_back_edges else 0))
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif">',
+        '<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="7" markerHeight="7" '
+        'orient="auto-start-reverse"><path d="M0,0 L10,5 L0,10 z" fill="#555"/></marker></defs>'
+    ]
+
+    labels = []
+    seen_pairs: Dict[Tuple[str, str], int] = {}
+    for conn in edges:
+        sx, sy, sw = boxes[conn.source_id]
+        tx, ty, tw = boxes[conn.target_id]
+        # 同じ接続元・接続先の組の接続はラベルを少しずつずらす
+        offset = seen_pairs.get((conn.source_id, conn.target_id), 0)
+        seen_pairs[(conn.source_id, conn.target_id)] = offset + 1
+        if conn.source_id == conn.target_id:
+            # 自分自身への接続は上側のループで描く
+            cx = sx + sw / 2
+            path = f"M{cx - 12:.1f},{sy:.1f} C{cx - 30:.1f},{sy - 34:.1f} {cx + 30:.1f},{sy - 34:.1f} {cx + 12:.1f},{sy:.1f}"
+            label_x, label_y = cx, sy - 30
+        elif layer[conn.target_id] > layer[conn.source_id]:
+            x1, y1 = sx + sw, sy + NODE_HEIGHT / 2
+            x2, y2 = tx, ty + NODE_HEIGHT / 2
+            bend = (x2 - x1) / 2
+            path = f"M{x1:.1f},{y1:.1f} C{x1 + bend:.1f},{y1:.1f} {x2 - bend:.1f},{y2:.1f} {x2:.1f},{y2:.1f}"
+            label_x, label_y = (x1 + x2) / 2, (y1 + y2) / 2
+        else:
+            # 逆向き・同じ層への接続は下側を回り込む
+            x1, y1 = sx + sw / 2, sy + NODE_HEIGHT
+            x2, y2 = tx + tw / 2, ty + NODE_HEIGHT
+            low = max(y1, y2) + NODE_HEIGHT
+            path = f"M{x1:.1f},{y1:.1f} C{x1:.1f},{low:.1f} {x2:.1f},{low:.1f} {x2:.1f},{y2:.1f}"
+            label_x, label_y = (x1 + x2) / 2, low - NODE_HEIGHT / 4
+        label_y += offset * (LABEL_FONT_SIZE + 4)
+        dash = ' stroke-dasharray="6,4"' if conn.connection_type in DASHED_TYPES else ""
+        parts.append(f'<path d="{path}" fill="none" stroke="#555" stroke-width="1.5"{dash} marker-end="url(#arrow)"/>')
+        label = CONNECTION_TYPE_LABELS[conn.connection_type]
+        label_width = text_width(label, LABEL_FONT_SIZE) + 8
+        labels.append(
+            f'<rect x="{label_x - label_width / 2:.1f}" y="{label_y - LABEL_FONT_SIZE / 2 - 3:.1f}" '
+            f'width="{label_width:.1f}" height="{LABEL_FONT_SIZE + 6}" rx="3" fill="#fff" fill-opacity="0.9"/>'
+            f'<text x="{label_x:.1f}" y="{label_y:.1f}" font-size="{LABEL_FONT_SIZE}" fill="#333" '
+            f'text-anchor="middle" dominant-baseline="central">{html.escape(label)}</text>'
+        )
+
+    for agent in agents:
+        bx, by, bw = boxes[agent.id]
+        parts.append(
+            f'<g><title>{html.escape(agent.name)}</title>'
+            f'<rect x="{bx:.1f}" y="{by:.1f}" width="{bw:.1f}" height="{NODE_HEIGHT}" rx="6" '
+            f'fill="#ECECFF" stroke="#9370DB" stroke-width="1.5"/>'
+            f'<text x="{bx + bw / 2:.1f}" y="{by + NODE_HEIGHT / 2:.1f}" font-size="{FONT_SIZE}" fill="#222" '
+            f'text-anchor="middle" dominant-baseline="central">{html.escape(names[agent.id])}</text></g>'
+        )
+    # ラベルは辺とノードの上に重ねる
+    parts.extend(labels)
+    parts.append("</svg>")
+    return "".join(parts), width, height
+
+
+_diagram_cache: "OrderedDict[str, FlowDiagram]" = OrderedDict()
+_diagram_cache_lock = threading.Lock()
+
+
+def get_flow_diagram(agents: Sequence[AgentConfig], connections: Sequence[AgentConnection]) -> Optional[FlowDiagram]:
+    """
+    フロー図を取得する（エージェントと接続が同じ内容の図は描画済みのものを再利用する）
+
+    Args:
+        agents: フロー内のエージェントリスト
+        connections: エージェント間の接続リスト
+
+    Returns:
+        Optional[FlowDiagram]: フロー図（エージェントがない場合はNone）
+    """
+    if not agents:
+        return None
+    key = diagram_key(agents, connections)
+    with _diagram_cache_lock:
+        diagram = _diagram_cache.get(key)
+        if diagram is not None:
+            _diagram_cache.move_to_end(key)
+            return diagram
+
+    svg, width, height = render_svg(agents, connections)
+    diagram = FlowDiagram(key, mermaid_source(agents, connections), svg, width, height)
+    with _diagram_cache_lock:
+        _diagram_cache[key] = diagram
+        while len(_diagram_cache) > FLOW_DIAGRAM_CACHE_SIZE:
+            _diagram_cache.popitem(last=False)
+    return diagram
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from src.agent_builder.agent_types import AgentConfig, AgentFlow, ConnectionType
+from src.agent_flow.conditions import ConditionError, ConditionSet, KeywordMatcher, Predicate
+from src.agent_flow.flow_analysis import FlowAnalysis, analyze_flow
+
+# コンパイル済みプランのキャッシュ上限
+PLAN_CACHE_SIZE = 64
+
+
+class CompiledEdge(NamedTuple):
+    """コンパイル済みの接続（ルーティング時に参照する情報をまとめたもの）"""
+    connection_id: str
+    source_id: str
+    target_id: str
+    target_name: str
+    connection_type: str
+    condition: Optional[str]
+    condition_predicate: Optional[Predicate]
+    condition_error: Optional[str]
+
+
+class FlowPlan:
+    """
+    AgentFlowから一度だけ構築される不変の実行プラン
+
+    エージェントIDからの設定・名前の引き当てと、接続元ごとの出力接続を
+    事前に索引化しておくことで、1ホップあたりのルーティングを出力接続数に比例する
+    コストに抑える。条件式は接続元ごとにまとめてコンパイルし、contains のキーワードは
+    接続元ごとの KeywordMatcher で応答ごとに一度だけまとめて判定できるようにする。
+    構築時に静的解析を行い、到達可能なエージェントと実行回数の上限を求める
+    """
+
+    __slots__ = ("flow_id", "fingerprint", "entry_point_id", "agents", "names", "outgoing", "parallel", "edges",
+                 "matchers", "analysis")
+
+    def __init__(self, flow: AgentFlow, fingerprint: str):
+        """
+        FlowPlanの初期化
+
+        Args:
+            flow: コンパイル対象のエージェントフロー
+            fingerprint: フロー内容のハッシュ値
+        """
+        agents: Dict[str, AgentConfig] = {}
+        names: Dict[str, str] = {}
+        for agent_config in flow.agents:
+            # 実行中にUI側で設定が編集されても影響を受けないようにコピーを保持
+            agents[agent_config.id] = agent_config.model_copy(deep=True)
+            names[agent_config.id] = agent_config.name
+
+        outgoing: Dict[str, List[CompiledEdge]] = {}
+        edges: List[CompiledEdge] = []
+        condition_sets: Dict[str, ConditionSet] = {}
+        for conn in flow.connections:
+            condition_predicate = None
+            condition_error = None
+            if conn.condition and conn.connection_type == ConnectionType.CONDITIONAL:
+                condition_set = condition_sets.setdefault(conn.source_id, ConditionSet())
+                try:
+                    condition_predicate = condition_set.compile(conn.condition)
+                except ConditionError as e:
+                    condition_error = str(e)
+
+            edge = CompiledEdge(
+                connection_id=conn.id,
+                source_id=conn.source_id,
+                target_id=conn.target_id,
+                target_name=names.get(conn.target_id, "不明"),
+                connection_type=conn.connection_type,
+                condition=conn.condition,
+                condition_predicate=condition_predicate,
+                condition_error=condition_error
+            )
+            edges.append(edge)
+            # 接続の定義順を保ったまま接続元ごとにまとめる
+            outgoing.setdefault(conn.source_id, []).append(edge)
+
+        self.flow_id = flow.id
+        self.fingerprint = fingerprint
+        self.entry_point_id = flow.entry_point_id
+        self.agents: Mapping[str, AgentConfig] = MappingProxyType(agents)
+        self.names: Mapping[str, str] = MappingProxyType(names)
+        self.outgoing: Mapping[str, Tuple[CompiledEdge, ...]] = MappingProxyType(
+            {source_id: tuple(source_edges) for source_id, source_edges in outgoing.items()}
+        )
+        # 並列実行接続は接続元ごとに別途まとめておく（ファンアウト判定を O(1) にするため）
+        parallel: Dict[str, Tuple[CompiledEdge, ...]] = {}
+        for source_id, source_edges in outgoing.items():
+            parallel_edges = tuple(e for e in source_edges if e.connection_type == ConnectionType.PARALLEL)
+            if parallel_edges:
+                parallel[source_id] = parallel_edges
+        self.parallel: Mapping[str, Tuple[CompiledEdge, ...]] = MappingProxyType(parallel)
+        self.edges: Tuple[CompiledEdge, ...] = tuple(edges)
+        self.matchers: Mapping[str, KeywordMatcher] = MappingProxyType(
+            {source_id: condition_set.matcher() for source_id, condition_set in condition_sets.items()}
+        )
+        # 循環・到達可能性・フォールバックの有無などの静的解析の結果
+        self.analysis: FlowAnalysis = analyze_flow(self.entry_point_id, self.names, self.edges)
+
+    def agent_name(self, agent_id: Optional[str], default: str = "不明") -> str:
+        """エージェントIDから名前を取得"""
+        return self.names.get(agent_id, default)
+
+    def outgoing_edges(self, agent_id: str) -> Tuple[CompiledEdge, ...]:
+        """エージェントから出る接続を定義順で取得"""
+        return self.outgoing.get(agent_id, ())
+
+    def parallel_edges(self, agent_id: str) -> Tuple[CompiledEdge, ...]:
+        """エージェントから出る並列実行接続を定義順で取得"""
+        return self.parallel.get(agent_id, ())
+
+    def keyword_matcher(self, agent_id: str) -> Optional[KeywordMatcher]:
+        """エージェントから出る条件分岐の contains のキーワードをまとめて検索する KeywordMatcher を取得"""
+        return self.matchers.get(agent_id)
+
+    def join_edge(self, agent_id: str) -> Optional[CompiledEdge]:
+        """エージェントから出る最初の合流接続を取得"""
+        for edge in self.outgoing.get(agent_id, ()):
+            if edge.connection_type == ConnectionType.JOIN:
+                return edge
+        return None
+
+
+def flow_fingerprint(flow: AgentFlow) -> str:
+    """
+    フローの内容からハッシュ値を計算する
+
+    Args:
+        flow: 対象のエージェントフロー
+
+    Returns:
+        str: フロー内容のSHA-256ハッシュ
+    """
+    payload = json.dumps(flow.to_dict(), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+_plan_cache: "OrderedDict[str, FlowPlan]" = OrderedDict()
+_plan_cache_lock = threading.Lock()
+
+
+def compile_flow(flow: AgentFlow) -> FlowPlan:
+    """
+    フローを実行プランにコンパイルする
+
+    同じ内容のフローに対しては以前にコンパイルしたプランを再利用する。
+    フローが編集された場合はハッシュ値が変わるため新しいプランが作成される。
+
+    Args:
+        flow: コンパイル対象のエージェントフロー
+
+    Returns:
+        FlowPlan: コンパイル済みの実行プラン
+    """
+    fingerprint = flow_fingerprint(flow)
+    with _plan_cache_lock:
+        plan = _plan_cache.get(fingerprint)
+        if plan is not None:
+            _plan_cache.move_to_end(fingerprint)
+            return plan
+
+    plan = FlowPlan(flow, fingerprint)
+    with _plan_cache_lock:
+        _plan_cache[fingerprint] = plan
+        while len(_plan_cache) > PLAN_CACHE_SIZE:
+            _plan_cache.popitem(last=False)
+    return plan
@@ -1,13 +1,32 @@
 import asyncio
 import streamlit as st
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import json
 import time
-from datetime import datetime
+import uuid
 
-from agents import Agent, Runner
-from src.agent_builder.agent_types import AgentConfig, AgentFlow, AgentConnection, ConnectionType
-from src.utils.async_helpers import run_async
+from src.agent_builder.agent_types import AgentConfig, AgentFlow, AgentConnection, ConnectionType, CONNECTION_TYPE_LABELS
+from src.agent_flow.cascade import cascade_enabled, run_with_cascade
+from src.agent_flow.checkpoint import get_checkpoint_store
+from src.agent_flow.flow_plan import CompiledEdge, compile_flow
+from src.agent_flow.flow_view import FlowEventState, FlowRunView, format_log_entry, format_message
+from src.agent_flow.job_queue import CANCELLED, FINISHED_STATUSES, QUEUED, get_job_queue
+from src.agent_flow.speculation import get_branch_stats
+from src.models.agent import AgentError, AgentManager
+from src.models.agent_registry import get_agent_registry
+from src.models.scheduler import Reservation, get_scheduler
+from src.utils.async_helpers import CallerThreadProxy, run_async
+from src.utils.run_log import DEBUG, RunLog, get_log_sink
+from src.utils.tracing import Tracer
+from src.config.settings import (
+    FLOW_CHECKPOINT_ENABLED,
+    FLOW_RUN_POLL_INTERVAL,
+    FLOW_SPECULATION_ENABLED,
+    FLOW_VIEW_LOG_CHUNK_SIZE,
+    FLOW_VIEW_MAX_MESSAGES,
+    TRACE_EXPORT_PATH,
+)
+from src.utils.streaming import STREAM_CURSOR, ThrottledStreamWriter
 
 class FlowRuntime:
     """
@@ -22,32 +41,48 @@ class FlowRuntime:
             flow: 実行するエージェントフロー
         """
         self.flow = flow
+        self.plan = compile_flow(flow)  # 索引化済みの実行プラン（同一内容のフローでは再利用される）
         self.agents_map = {}  # エージェントID -> Agent オブジェクトのマップ
         self.chat_history = []
-        self.logs = []
+        self.run_id = uuid.uuid4().hex
+        self.log = RunLog(run_id=self.run_id, sink=get_log_sink())  # 件数上限付きの構造化ログ
+        self.hops = []    # 実行したホップごとの記録（エージェント、所要時間など）
+        self.errors = []  # 実行中に発生したエラー
+        self.tracer = Tracer()  # ホップごとの所要時間・待ち時間・トークン数を記録するトレーサー
+        self.trace_export_path = TRACE_EXPORT_PATH  # トレースの出力先（空の場合は出力しない）
+        # ホップごとのチェックポイントの保存先（Noneの場合は保存しない）
+        self.checkpoints = get_checkpoint_store() if FLOW_CHECKPOINT_ENABLED else None
+        self._replay: Dict[Tuple[str, str], List[str]] = {}  # (エージェントID, 入力) -> 再開時に復元する応答
         self.current_agent_id = flow.entry_point_id
+        self.stream = False
+        self.execution_count = 0  # 並列実行の枝も含めたフロー全体での実行回数
+        self._bound_reached = False  # 実行回数の上限に達したかどうか
+        # 静的解析で求めたフロー全体の実行回数の上限（循環による無限ループを防ぐ）
+        self.max_executions = max(1, self.plan.analysis.execution_bound)
+        # 条件分岐の投機的実行（分岐先になる可能性が高いエージェントのリクエストの順番を前もって確保する）
+        self.speculative = FLOW_SPECULATION_ENABLED
+        self.speculation = {"reserved": 0, "hits": 0, "misses": 0, "saved": 0.0, "wasted": 0.0}
+        self._reservations = set()  # 確保したまま、まだ使用・返却していない順番
     
-    def log(self, message: str, level: str = "INFO"):
-        """ログメッセージを記録"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.logs.append({"timestamp": timestamp, "level": level, "message": message})
-    
-    def initialize_agents(self):
+    def get_agent(self, agent_id: str):
         """
-        フロー内のすべてのエージェントを初期化する
+        エージェントIDに対応するAgentオブジェクトを取得する（初回の使用時に初期化する）
+        
+        Args:
+            agent_id: エージェントID
+            
+        Returns:
+            Optional[Agent]: Agentオブジェクト、またはNone（フローに存在しない場合）
         """
-        for agent_config in self.flow.agents:
-            # OpenAI Agents SDKのAgentオブジェクトを作成
-            agent = Agent(
-                name=agent_config.name,
-                instructions=agent_config.instructions,
-                model=agent_config.model,
-                # tools=agent_config.tools  # これでは動作しない
-                # 実際はツールの実装が必要だが、簡易化のため今回は空のツールリストを渡す
-                tools=[]  # 必要に応じてツールを設定
-            )
-            self.agents_map[agent_config.id] = agent
-            self.log(f"エージェント '{agent_config.name}' を初期化しました")
+        agent = self.agents_map.get(agent_id)
+        if agent is None:
+            agent_config = self.plan.agents.get(agent_id)
+            if agent_config is None:
+                return None
+            # OpenAI Agents SDKのAgentオブジェクトを取得（内容が同じなら作成済みのものを再利用）
+            agent = get_agent_registry().get_for_config(agent_config)
+            self.agents_map[agent_id] = agent
+        return agent
     
     def get_next_agent_id(self, current_agent_id: str, response: str) -> Optional[str]:
         """
@@ -61,203 +96,631 @@ class FlowRuntime:
             Optional[str]: 次のエージェントID、またはNone（終了時）
         """
         # 現在のエージェントから出る接続を取得
-        outgoing_connections = [
-            conn for conn in self.flow.connections if conn.source_id == current_agent_id
-        ]
+        outgoing_connections = self.plan.outgoing_edges(current_agent_id)
         
-        self.log(f"出力接続数: {len(outgoing_connections)}")
+        self.log.debug("出力接続数: %d", len(outgoing_connections))
         
         if not outgoing_connections:
-            self.log("次の接続が見つかりませんでした")
+            self.log.info("次の接続が見つかりませんでした")
             return None  # 接続がない場合は終了
         
+        matched = None  # 条件式の contains のキーワードの一致結果（必要になった時点で一度だけ走査）
         for conn in outgoing_connections:
-            target_name = next((a.name for a in self.flow.agents if a.id == conn.target_id), "不明")
-            self.log(f"接続を評価中: {conn.source_id} -> {conn.target_id} ({target_name}), タイプ: {conn.connection_type}")
+            self.log.debug("接続を評価中: %s -> %s (%s), タイプ: %s",
+                           conn.source_id, conn.target_id, conn.target_name, conn.connection_type)
             
             if conn.connection_type == ConnectionType.HANDOFF:
                 # ハンドオフの場合は常に次のエージェントに移動
-                self.log(f"ハンドオフ接続: 次のエージェント = {conn.target_id}")
+                self.log.info("ハンドオフ接続: 次のエージェント = %s", conn.target_id)
                 return conn.target_id
             elif conn.connection_type == ConnectionType.SEQUENTIAL:
                 # 順次実行の場合も常に次のエージェントに移動
-                self.log(f"順次実行接続: 次のエージェント = {conn.target_id}")
+                self.log.info("順次実行接続: 次のエージェント = %s", conn.target_id)
+                return conn.target_id
+            elif conn.connection_type == ConnectionType.JOIN:
+                # 並列実行の枝の外で合流接続に到達した場合は順次実行と同様に扱う
+                self.log.info("合流接続: 次のエージェント = %s", conn.target_id)
                 return conn.target_id
             elif conn.connection_type == ConnectionType.CONDITIONAL:
                 # 条件分岐の場合は条件を評価
-                if conn.condition:
-                    try:
-                        self.log(f"条件分岐を評価中: {conn.condition}")
-                        # 単純化のため、ここでは応答のテキストに特定の単語が含まれるかで判断
-                        # より複雑な条件判断が必要な場合は、プロパーなeval環境を構築する必要がある
-                        context = {
-                            "response": response,
-                            "contains": lambda x: x.lower() in response.lower()
-                        }
-                        result = eval(conn.condition, {"__builtins__": {}}, context)
-                        self.log(f"条件評価結果: {result}")
-                        if result:
-                            self.log(f"条件が真: 次のエージェント = {conn.target_id}")
-                            return conn.target_id
-                        else:
-                            self.log("条件が偽: スキップします")
-                    except Exception as e:
-                        self.log(f"条件評価エラー: {str(e)}", "ERROR")
+                if conn.condition_error:
+                    self.log.error("条件式の構文エラー: %s", conn.condition_error)
+                elif conn.condition_predicate:
+                    self.log.debug("条件分岐を評価中: %s", conn.condition)
+                    if matched is None:
+                        # 接続元のすべての条件式の contains を応答ごとに一度だけまとめて判定
+                        matched = self.plan.keyword_matcher(current_agent_id).search(response.lower())
+                    result = conn.condition_predicate(response, matched)
+                    self.log.debug("条件評価結果: %s", result)
+                    if result:
+                        self.log.info("条件が真: 次のエージェント = %s", conn.target_id)
+                        return conn.target_id
+                    else:
+                        self.log.debug("条件が偽: スキップします")
                 else:
-                    self.log("条件が指定されていません", "WARNING")
+                    self.log.warning("条件が指定されていません")
         
-        self.log("適切な次のエージェントが見つかりませんでした")
+        self.log.info("適切な次のエージェントが見つかりませんでした")
         return None  # 適切な次のエージェントがない場合は終了
     
-    async def execute_agent(self, agent_id: str, user_input: str) -> str:
+    async def execute_agent(self, agent_id: str, user_input: str, on_delta=None) -> str:
         """
         エージェントを実行して応答を取得
         
         Args:
             agent_id: 実行するエージェントのID
             user_input: ユーザー入力
+            on_delta: ストリーミングモードで応答テキストの差分を受け取る関数
             
         Returns:
             str: エージェントの応答
+            
+        Raises:
+            AgentError: エージェントが見つからない場合、または実行に失敗した場合
         """
-        agent = self.agents_map.get(agent_id)
-        if not agent:
-            self.log(f"エージェントID '{agent_id}' が見つかりません", "ERROR")
-            return "エラー: エージェントが見つかりません"
-        
-        try:
-            # エージェント名を取得
-            agent_name = next((a.name for a in self.flow.agents if a.id == agent_id), "不明")
-            self.log(f"エージェント '{agent_name}' を実行中...")
-            self.log(f"入力: {user_input[:50]}...")
+        response, _ = await self._execute_hop(agent_id, user_input, on_delta)
+        return response
+    
+    async def _execute_hop(self, agent_id: str, user_input: str, on_delta=None,
+                           reservation: Optional[Reservation] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        エージェントを実行し、応答とホップの記録を返す
+        
+        再開した実行でチェックポイントに同じエージェント・同じ入力の応答がある場合は、
+        エージェントを呼び出さずにその応答を返す
+        
+        Args:
+            agent_id: 実行するエージェントのID
+            user_input: ユーザー入力
+            on_delta: ストリーミングモードで応答テキストの差分を受け取る関数
+            reservation: 投機的実行で前もって確保したリクエストの順番
             
-            # エージェントの実行
-            self.log("Runner.run を呼び出し中...")
-            result = await Runner.run(agent, user_input)
-            self.log("Runner.run の実行が完了")
+        Returns:
+            Tuple[str, Dict[str, Any]]: (エージェントの応答, ホップの記録)
             
-            if hasattr(result, 'final_output'):
-                response = result.final_output
-                self.log(f"エージェント '{agent_name}' からの応答: {response[:50]}...")
-                return response
-            else:
-                self.log(f"エージェント結果に final_output がありません: {str(result)}", "WARNING")
-                return f"応答を取得できませんでした: {str(result)}"
-        except Exception as e:
-            import traceback
-            self.log(f"エージェント実行エラー: {str(e)}", "ERROR")
-            self.log(f"詳細なエラー: {traceback.format_exc()}", "ERROR")
-            return f"エラー: {str(e)}"
-    
-    async def run_flow(self, user_input: str, chat_placeholder=None, log_placeholder=None):
+        Raises:
+            AgentError: エージェントが見つからない場合、または実行に失敗した場合
+        """
+        agent = self.get_agent(agent_id)
+        if not agent:
+            self.log.error("エージェントID '%s' が見つかりません", agent_id)
+            self.errors.append({"agent_id": agent_id, "agent_name": "不明", "error": "エージェントが見つかりません"})
+            raise AgentError("エージェントが見つかりません")
+        
+        started_at = time.perf_counter()
+        agent_name = self.plan.agent_name(agent_id)
+        hop = {"agent_id": agent_id, "agent_name": agent_name, "latency": None, "error": None, "replayed": False}
+        self.hops.append(hop)
+        with self.tracer.span("flow.hop", {"agent.id": agent_id, "agent.name": agent_name}) as hop_span:
+            # 待ち時間・モデルの所要時間・トークン数などは子のスパンから集計される
+            hop["metrics"] = hop_span.metrics
+            try:
+                replayed = self._take_replay(agent_id, user_input)
+                if replayed is not None:
+                    hop["replayed"] = True
+                    hop_span.set_attribute("checkpoint.replayed", True)
+                    self.log.info("エージェント '%s' の応答をチェックポイントから復元しました", agent_name)
+                    if on_delta:
+                        on_delta(replayed)
+                    return replayed, hop
+                
+                self.log.info("エージェント '%s' を実行中...", agent_name)
+                self.log.debug("入力: %.50s...", user_input)
+                
+                # エージェントの実行
+                self.log.debug("Runner.run を呼び出し中..." if on_delta is None else "Runner.run_streamed を呼び出し中...")
+                agent_config = self.plan.agents[agent_id]
+                
+                def on_similar_hit(hit):
+                    # 実行結果から誤りを報告できるよう、再利用した質問のIDをホップに残す
+                    hop["similar"] = hit.to_dict()
+                    self.log.info("類似した質問（ID %d、類似度 %.2f）の応答を再利用しました: %.50s",
+                                  hit.entry_id, hit.similarity, hit.question)
+                
+                if cascade_enabled(agent_config):
+                    # 高速なモデルで先に回答し、採用条件を満たさない場合のみ設定したモデルで回答し直す
+                    response = await run_with_cascade(
+                        agent_config, agent, user_input, on_delta=on_delta, use_cache=agent_config.cache_enabled,
+                        reservation=reservation, on_similar_hit=on_similar_hit
+                    )
+                else:
+                    response = await AgentManager.run_agent(
+                        agent, user_input, on_delta=on_delta, use_cache=agent_config.cache_enabled,
+                        reservation=reservation, similarity=agent_config.similarity_cache,
+                        on_similar_hit=on_similar_hit
+                    )
+                self.log.debug("エージェントの実行が完了")
+                
+                self.log.debug("エージェント '%s' からの応答: %.50s...", agent_name, response)
+                return response, hop
+            except Exception as e:
+                hop["error"] = str(e)
+                self.errors.append({"agent_id": agent_id, "agent_name": agent_name, "error": str(e)})
+                # トレースバックはDEBUGレベルが有効な場合のみ保持される
+                self.log.error("エージェント実行エラー: %s", e, exc=e)
+                if isinstance(e, AgentError):
+                    raise
+                raise AgentError(str(e)) from e
+            finally:
+                hop["latency"] = time.perf_counter() - started_at
+                if reservation is not None:
+                    self._settle_reservation(reservation)
+    
+    async def run_flow(self, user_input: str, view: Optional[FlowRunView] = None, stream: bool = True):
         """
         フロー全体を実行
         
         Args:
             user_input: ユーザー入力
-            chat_placeholder: チャット表示用のPlaceholderオブジェクト
-            log_placeholder: ログ表示用のPlaceholderオブジェクト
+            view: チャット履歴とログを描画するビュー
+            stream: 生成途中の応答をチャット表示に逐次反映するかどうか
         
         Returns:
             Dict: 実行結果
         """
-        self.initialize_agents()
+        self.stream = stream
         
-        # デバッグ: 初期化されたエージェントの確認
-        self.log(f"初期化されたエージェント数: {len(self.agents_map)}")
-        for agent_id, agent in self.agents_map.items():
-            agent_name = next((a.name for a in self.flow.agents if a.id == agent_id), "不明")
-            self.log(f"初期化済みエージェント: ID={agent_id}, 名前={agent_name}, モデル={agent.model}")
+        # エージェントは実行時に必要になった時点で初期化する（最初の応答までの待ち時間を増やさないため）
+        self.log.debug("フロー内のエージェント数: %d", len(self.plan.agents))
         
         # デバッグ: 接続情報の確認
-        self.log(f"接続数: {len(self.flow.connections)}")
-        for conn in self.flow.connections:
-            source_name = next((a.name for a in self.flow.agents if a.id == conn.source_id), "不明")
-            target_name = next((a.name for a in self.flow.agents if a.id == conn.target_id), "不明")
-            self.log(f"接続: {source_name} -> {target_name} (タイプ: {conn.connection_type})")
+        if self.log.enabled(DEBUG):
+            self.log.debug("接続数: %d", len(self.plan.edges))
+            for conn in self.plan.edges:
+                self.log.debug("接続: %s -> %s (タイプ: %s)",
+                               self.plan.agent_name(conn.source_id), conn.target_name, conn.connection_type)
+        
+        if self.checkpoints:
+            self.checkpoints.start(self.run_id, self.flow, self.plan.fingerprint, user_input)
         
         # ユーザーメッセージをチャット履歴に追加
         self.chat_history.append({"role": "user", "content": user_input})
         
         # チャット表示を更新
-        if chat_placeholder:
-            chat_placeholder.markdown(self._format_chat_history())
+        if view:
+            view.add_message(self.chat_history[-1])
+        
+        for issue in self.plan.analysis.issues:
+            self.log.warning("フローの解析: %s", issue.message)
         
-        # 現在の入力
-        current_input = user_input
-        current_agent_id = self.flow.entry_point_id
-        self.log(f"フローの開始: エントリーポイント '{current_agent_id}'")
+        self.log.info("フローの開始: エントリーポイント '%s'", self.plan.entry_point_id)
         
         # 実行カウンター (無限ループ防止)
-        execution_count = 0
-        max_executions = 10  # 安全のため最大実行回数を制限
+        self.execution_count = 0
+        self._bound_reached = False
+        
+        with self.tracer, self.tracer.span("flow.run", {"flow.id": self.flow.id, "flow.name": self.flow.name}) as run_span:
+            try:
+                final_response, _ = await self._run_path(
+                    self.plan.entry_point_id, user_input, view
+                )
+            finally:
+                # エラーなどで使われなかった投機的実行の順番を返却する
+                for reservation in list(self._reservations):
+                    self._settle_reservation(reservation)
+        
+        if self.speculation["reserved"]:
+            self.log.info("投機的実行: 的中 %d 件 / 外れ %d 件、短縮した待ち時間 %.2f 秒 / 無駄にした枠 %.2f 秒",
+                          self.speculation["hits"], self.speculation["misses"],
+                          self.speculation["saved"], self.speculation["wasted"])
+        
+        if self.checkpoints and not self.errors:
+            # 正常に完了した実行は再開する必要がないためチェックポイントを削除する
+            self.checkpoints.complete(self.run_id)
+        
+        if view:
+            view.sync_logs(self.log)
+        self.log.close()
+        if self.trace_export_path:
+            self.tracer.export(self.trace_export_path)
+        
+        return {
+            "run_id": self.run_id,
+            "chat_history": self.chat_history,
+            "logs": self.log,
+            "hops": self.hops,
+            "errors": self.errors,
+            "final_response": final_response,
+            "speculation": dict(self.speculation),
+            "trace": {
+                "trace_id": self.tracer.trace_id,
+                "duration_ms": run_span.elapsed_ms(),
+                "totals": dict(run_span.metrics),
+                "spans": self.tracer.to_dicts(),
+                "tracer": self.tracer
+            }
+        }
+    
+    async def resume(self, run_id: str, view: Optional[FlowRunView] = None, stream: bool = True):
+        """
+        チェックポイントから中断した実行を再開する
+        
+        同じユーザー入力でフローを最初からたどり直すが、チェックポイントに記録された
+        ホップ（同じエージェント・同じ入力）はエージェントを呼び出さずに記録した応答を使うため、
+        実際に呼び出されるのは失敗したホップ以降のみとなる。
+        
+        Args:
+            run_id: 再開する実行のID
+            view: チャット履歴とログを描画するビュー
+            stream: 生成途中の応答をチャット表示に逐次反映するかどうか
+        
+        Returns:
+            Dict: 実行結果（run_flow と同じ形式）
+            
+        Raises:
+            KeyError: チェックポイントが見つからない場合
+        """
+        checkpoint = self.checkpoints.load(run_id) if self.checkpoints else None
+        if checkpoint is None:
+            raise KeyError(f"チェックポイントが見つかりません: {run_id}")
+        
+        # 同じ実行IDを引き継ぎ、以降のホップは同じチェックポイントに追記する
+        self.run_id = run_id
+        self.log.run_id = run_id
+        self._replay = {}
+        for hop in checkpoint["hops"]:
+            self._replay.setdefault((hop["agent_id"], hop["input"]), []).append(hop["output"])
+        if checkpoint["fingerprint"] != self.plan.fingerprint:
+            self.log.warning("チェックポイントの保存後にフローが変更されています。変更されていないホップのみ復元します")
+        self.log.info("実行 %s を再開します: 完了済みのホップ %d 件", run_id, len(checkpoint["hops"]))
+        
+        return await self.run_flow(checkpoint["user_input"], view, stream=stream)
+    
+    async def _run_path(self, agent_id: Optional[str], current_input: str,
+                        view: Optional[FlowRunView] = None,
+                        in_branch: bool = False) -> Tuple[str, Optional[str]]:
+        """
+        指定したエージェントから接続をたどって順に実行する
         
-        while current_agent_id and execution_count < max_executions:
-            execution_count += 1
-            self.log(f"実行回数: {execution_count}/{max_executions}")
+        Args:
+            agent_id: 最初に実行するエージェントのID
+            current_input: 最初のエージェントへの入力
+            view: チャット履歴とログを描画するビュー
+            in_branch: 並列実行の枝として実行しているかどうか（Trueの場合は合流接続で停止する）
+            
+        Returns:
+            Tuple[str, Optional[str]]: (最後の応答, 合流先エージェントID)
+        """
+        response = ""
+        reservation = None  # 前のエージェントの実行中に確保した、このエージェントのリクエストの順番
+        while agent_id:
+            if self.execution_count >= self.max_executions:
+                self._stop_at_execution_bound(agent_id, view)
+                break
+            self.execution_count += 1
+            self.log.debug("実行回数: %d/%d", self.execution_count, self.max_executions)
             
             # エージェントの実行
-            self.log(f"エージェント '{current_agent_id}' を実行します")
-            response = await self.execute_agent(current_agent_id, current_input)
+            self.log.debug("エージェント '%s' を実行します", agent_id)
+            stream_key = object()
+            on_delta = self._stream_writer(stream_key, agent_id, view)
+            agent_name = self.plan.agent_name(agent_id, "Agent")
+            # 条件分岐を持つエージェントでは、実行中に分岐先になる可能性が高いエージェントの順番を確保しておく
+            speculative = self._speculate(agent_id)
+            hop_reservation, reservation = reservation, None
+            try:
+                response, hop = await self._execute_hop(
+                    agent_id, current_input, on_delta=on_delta, reservation=hop_reservation
+                )
+            except AgentError as e:
+                if self.checkpoints:
+                    self.checkpoints.record_failure(self.run_id, agent_id, str(e))
+                # エラーの内容を次のエージェントへの入力にせず、この経路の実行を中断する
+                response = f"エラー: {e}"
+                self.chat_history.append({"role": "assistant", "content": response, "name": agent_name})
+                self.log.error("エージェント '%s' でエラーが発生したため、フローを中断します", agent_name)
+                if view:
+                    view.add_message(self.chat_history[-1], stream_key)
+                    view.sync_logs(self.log)
+                return response, None
+            except BaseException:
+                if view:
+                    view.discard_streaming(stream_key)
+                raise
             
             # 応答をチャット履歴に追加
-            agent_name = next((a.name for a in self.flow.agents if a.id == current_agent_id), "Agent")
             self.chat_history.append({"role": "assistant", "content": response, "name": agent_name})
             
-            # チャット表示を更新
-            if chat_placeholder:
-                chat_placeholder.markdown(self._format_chat_history())
-            
-            # ログ表示を更新
-            if log_placeholder:
-                log_placeholder.markdown(self._format_logs())
+            # チャット表示・ログ表示を更新（新しく追加された分のみ描画）
+            if view:
+                view.add_message(self.chat_history[-1], stream_key)
+                view.sync_logs(self.log)
             
             # 次のエージェントの決定
-            self.log("次のエージェントを決定中...")
-            next_agent_id = self.get_next_agent_id(current_agent_id, response)
+            self.log.debug("次のエージェントを決定中...")
+            parallel_edges = self.plan.parallel_edges(agent_id)
+            join_edge = None if parallel_edges or not in_branch else self.plan.join_edge(agent_id)
+            if parallel_edges:
+                # 枝の実行中に失敗しても接続元を再実行しないよう、枝を始める前に記録する
+                self._checkpoint_hop(hop, current_input, response, [edge.target_id for edge in parallel_edges])
+                # 並列実行: すべての接続先を同時に実行し、合流先に結果をまとめて渡す
+                response, next_agent_id = await self._fan_out(
+                    parallel_edges, response, view
+                )
+            elif join_edge:
+                # 並列実行の枝は合流接続に到達した時点で終了し、合流先を呼び出し元に返す
+                self.log.info("合流接続に到達: 合流先 = %s", join_edge.target_name)
+                self._checkpoint_hop(hop, current_input, response, join_edge.target_id)
+                return response, join_edge.target_id
+            else:
+                with self.tracer.span("flow.route", {"agent.id": agent_id}) as route_span:
+                    next_agent_id = self.get_next_agent_id(agent_id, response)
+                    route_span.set_attribute("route.next_agent_id", next_agent_id or "")
+                    route_span.record("routing_ms", route_span.elapsed_ms())
+                reservation = self._resolve_speculation(agent_id, speculative, next_agent_id)
+                self._checkpoint_hop(hop, current_input, response, next_agent_id)
             
             if next_agent_id:
                 # 次のエージェントがある場合
-                agent_name = next((a.name for a in self.flow.agents if a.id == next_agent_id), "不明")
-                self.log(f"次のエージェント: '{agent_name}' (ID: {next_agent_id}) に移行します")
+                agent_name = self.plan.agent_name(next_agent_id)
+                self.log.info("次のエージェント: '%s' (ID: %s) に移行します", agent_name, next_agent_id)
                 
                 # 次のエージェントへの入力は現在のエージェントの応答
                 current_input = response
-                current_agent_id = next_agent_id
+                agent_id = next_agent_id
             else:
-                # 次のエージェントがない場合はフロー終了
-                self.log(f"フローを完了しました (次のエージェントはありません)")
-                current_agent_id = None
+                # 次のエージェントがない場合は終了
+                self.log.info("フローを完了しました (次のエージェントはありません)")
+                agent_id = None
         
-        if execution_count >= max_executions:
-            self.log(f"最大実行回数 ({max_executions}) に達したため、フローを終了します", "WARNING")
+        return response, None
+    
+    def _stop_at_execution_bound(self, agent_id: str, view: Optional[FlowRunView] = None):
+        """
+        実行回数の上限に達したことを実行のエラーとして記録する（並列実行の枝ごとには記録しない）
         
-        return {
-            "chat_history": self.chat_history,
-            "logs": self.logs,
-            "final_response": self.chat_history[-1]["content"] if self.chat_history else ""
+        Args:
+            agent_id: 上限に達したため実行しなかったエージェントのID
+            view: チャット履歴とログを描画するビュー
+        """
+        if self._bound_reached:
+            return
+        self._bound_reached = True
+        agent_name = self.plan.agent_name(agent_id)
+        message = f"実行回数の上限 ({self.max_executions} 回) に達したため、フローを中断しました"
+        self.errors.append({"agent_id": agent_id, "agent_name": agent_name, "error": message})
+        self.log.error("%s（次のエージェント: '%s'）", message, agent_name)
+        if view:
+            view.sync_logs(self.log)
+    
+    async def _fan_out(self, edges: Tuple[CompiledEdge, ...], response: str,
+                       view: Optional[FlowRunView] = None) -> Tuple[str, Optional[str]]:
+        """
+        並列実行接続の接続先をすべて同時に実行する
+        
+        Args:
+            edges: 並列実行接続のリスト
+            response: 接続元エージェントの応答（各枝への入力）
+            view: チャット履歴とログを描画するビュー
+            
+        Returns:
+            Tuple[str, Optional[str]]: (まとめた応答, 合流先エージェントID)
+        """
+        self.log.info("並列実行を開始: %s", ", ".join(edge.target_name for edge in edges))
+        results = await asyncio.gather(*(
+            self._run_path(edge.target_id, response, view, in_branch=True)
+            for edge in edges
+        ))
+        
+        merged = self._merge_outputs(edges, [output for output, _ in results])
+        if self.errors:
+            # 一部の枝が失敗した場合は不完全な結果で合流先を実行しない
+            self.log.error("並列実行の枝でエラーが発生したため、合流先は実行しません")
+            return merged, None
+        
+        join_ids = []
+        for _, join_id in results:
+            if join_id and join_id not in join_ids:
+                join_ids.append(join_id)
+        
+        if not join_ids:
+            self.log.info("並列実行が完了しました (合流先はありません)")
+            return merged, None
+        if len(join_ids) > 1:
+            self.log.warning("並列実行の枝が複数の合流先に到達しました。最初の合流先のみ実行します: %s", join_ids)
+        self.log.info("並列実行が完了しました: 合流先 = %s", self.plan.agent_name(join_ids[0]))
+        return merged, join_ids[0]
+    
+    def _speculate(self, agent_id: str) -> Dict[str, Reservation]:
+        """
+        条件分岐を持つエージェントの実行前に、分岐先になる可能性が高いエージェントの順番を確保する
+        
+        分岐先への入力はこのエージェントの応答のため、分岐先のモデル呼び出し自体は応答を待つ必要がある。
+        代わりにレート制限の待ち行列の順番とAgentオブジェクトを前もって用意し、
+        このエージェントの実行と分岐先の順番待ちを重ねる
+        
+        Args:
+            agent_id: これから実行するエージェントのID
+            
+        Returns:
+            Dict[str, Reservation]: 分岐先のエージェントID -> 確保した順番
+        """
+        if not self.speculative or self.plan.parallel_edges(agent_id) or not any(
+            edge.connection_type == ConnectionType.CONDITIONAL for edge in self.plan.outgoing_edges(agent_id)
+        ):
+            return {}
+        reservations = {}
+        for target_id in get_branch_stats().predict(self.plan.fingerprint, agent_id):
+            agent = self.get_agent(target_id)
+            if agent is None:
+                continue
+            target_config = self.plan.agents[target_id]
+            model = target_config.cascade_model if cascade_enabled(target_config) else target_config.model
+            # 入力（このエージェントの応答）はまだないため、指示と出力の見込みのみで予約し、使用時に補正する
+            reservation = get_scheduler().reserve(model, AgentManager.estimate_tokens(agent, ""))
+            reservations[target_id] = reservation
+            self._reservations.add(reservation)
+            self.speculation["reserved"] += 1
+        if reservations:
+            self.log.debug("投機的実行: %s の順番を確保しました",
+                           ", ".join(self.plan.agent_name(target_id) for target_id in reservations))
+        return reservations
+    
+    def _resolve_speculation(self, agent_id: str, reservations: Dict[str, Reservation],
+                             next_agent_id: Optional[str]) -> Optional[Reservation]:
+        """
+        分岐先が決まった時点で分岐先の履歴を記録し、外れた分岐先の順番を返却する
+        
+        Args:
+            agent_id: 接続元のエージェントID
+            reservations: _speculate で確保した順番
+            next_agent_id: 決まった分岐先のエージェントID（終了の場合はNone）
+            
+        Returns:
+            Optional[Reservation]: 分岐先のために確保していた順番（予測が外れた場合はNone）
+        """
+        if any(edge.connection_type == ConnectionType.CONDITIONAL for edge in self.plan.outgoing_edges(agent_id)):
+            get_branch_stats().record(self.plan.fingerprint, agent_id, next_agent_id)
+        winner = reservations.pop(next_agent_id, None) if next_agent_id else None
+        for reservation in reservations.values():
+            self.speculation["misses"] += 1
+            self._settle_reservation(reservation)
+        if winner is not None:
+            self.speculation["hits"] += 1
+            self.log.debug("投機的実行: 分岐先 '%s' の予測が的中しました", self.plan.agent_name(next_agent_id))
+        return winner
+    
+    def _settle_reservation(self, reservation: Reservation):
+        """投機的実行の順番の使用結果を集計し、使われなかった場合は返却する"""
+        if reservation not in self._reservations:
+            return
+        self._reservations.discard(reservation)
+        if reservation.used:
+            self.speculation["saved"] += reservation.saved
+        else:
+            self.speculation["wasted"] += get_scheduler().release(reservation)
+    
+    def _take_replay(self, agent_id: str, agent_input: str) -> Optional[str]:
+        """再開時にチェックポイントから復元する応答を取り出す（ない場合はNone）"""
+        outputs = self._replay.get((agent_id, agent_input))
+        if not outputs:
+            return None
+        return outputs.pop(0)
+    
+    def _checkpoint_hop(self, hop: Dict[str, Any], agent_input: str, output: str, next_id: Any):
+        """完了したホップをチェックポイントに記録する（チェックポイントから復元したホップは除く）"""
+        if self.checkpoints and not hop["replayed"]:
+            self.checkpoints.record_hop(self.run_id, hop["agent_id"], agent_input, output, next_id)
+    
+    def _merge_outputs(self, edges: Tuple[CompiledEdge, ...], outputs: List[str]) -> str:
+        """並列実行した枝の出力を合流先への入力としてまとめる"""
+        return "\n\n".join(
+            f"### {edge.target_name}\n{output}" for edge, output in zip(edges, outputs)
+        )
+    
+    def _stream_writer(self, stream_key: object, agent_id: str, view: Optional[FlowRunView] = None) -> Optional[ThrottledStreamWriter]:
+        """
+        生成途中の応答をチャット表示に反映するストリーミング用の書き込み関数を作成
+        
+        Args:
+            stream_key: 生成途中の応答を識別するキー
+            agent_id: 実行するエージェントのID
+            view: チャット履歴とログを描画するビュー
+            
+        Returns:
+            Optional[ThrottledStreamWriter]: 書き込み関数（ストリーミングしない場合はNone）
+        """
+        if not (self.stream and view):
+            return None
+        
+        agent_name = self.plan.agent_name(agent_id, "Agent")
+        return ThrottledStreamWriter(lambda text: view.update_streaming(stream_key, agent_name, text))
+
+def result_to_json(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    run_flow の実行結果を、JSONとして保存できる形式に変換する
+    
+    ログはエントリのリスト、トレースはOTLP/JSON形式に変換する
+    （バックグラウンド実行の結果はこの形式でジョブキューに保存され、画面の表示もこの形式で行う）
+    
+    Args:
+        result: run_flow の実行結果
+        
+    Returns:
+        Dict[str, Any]: 変換した実行結果
+    """
+    trace = result["trace"]
+    return {
+        "run_id": result["run_id"],
+        "chat_history": result["chat_history"],
+        "logs": result["logs"].entries(),
+        "hops": [dict(hop, metrics=dict(hop.get("metrics", {}))) for hop in result["hops"]],
+        "errors": result["errors"],
+        "final_response": result["final_response"],
+        "speculation": result["speculation"],
+        "trace": {
+            "trace_id": trace["trace_id"],
+            "duration_ms": trace["duration_ms"],
+            "totals": dict(trace["totals"]),
+            "otlp": trace["tracer"].to_otlp()
         }
+    }
+
+def show_run_result(result: Dict[str, Any]):
+    """
+    フロー実行の結果（成否・投機的実行の集計・ログ・トレース）を表示
     
-    def _format_chat_history(self) -> str:
-        """チャット履歴を整形して表示用の文字列を返す"""
-        formatted = ""
-        for msg in self.chat_history:
-            if msg["role"] == "user":
-                formatted += f"**ユーザー:**\n{msg['content']}\n\n"
-            else:
-                name = msg.get("name", "Assistant")
-                formatted += f"**{name}:**\n{msg['content']}\n\n"
-        return formatted
-    
-    def _format_logs(self) -> str:
-        """ログを整形して表示用の文字列を返す"""
-        formatted = "### 実行ログ\n\n"
-        for log in self.logs:
-            timestamp = log["timestamp"]
-            level = log["level"]
-            message = log["message"]
-            formatted += f"**{timestamp}** [{level}] {message}\n\n"
-        return formatted
+    Args:
+        result: result_to_json で変換した実行結果
+    """
+    if result["errors"]:
+        failed = ", ".join(error["agent_name"] for error in result["errors"])
+        st.error(f"エージェント ({failed}) の実行に失敗したため、フローを中断しました。"
+                 "「中断された実行」から再開できます")
+    else:
+        st.success("フローの実行が完了しました")
+    
+    speculation = result["speculation"]
+    if speculation["reserved"]:
+        st.caption("投機的実行: 的中 {} 件 / 外れ {} 件、短縮した待ち時間 {:.2f} 秒 / 無駄にした枠 {:.2f} 秒".format(
+            speculation["hits"], speculation["misses"], speculation["saved"], speculation["wasted"]
+        ))
+    
+    # 表示から省略されたログも含め、全件をダウンロードできるようにする
+    st.download_button(
+        "実行ログをダウンロード",
+        data=json.dumps(result["logs"], ensure_ascii=False, indent=2),
+        file_name="flow_logs.json",
+        mime="application/json"
+    )
+    
+    show_trace_summary(result)
+
+def show_trace_summary(result: Dict[str, Any]):
+    """
+    フロー実行のトレースから、ホップごとの所要時間の内訳を表示
+    
+    Args:
+        result: result_to_json で変換した実行結果
+    """
+    trace = result["trace"]
+    with st.expander("トレース（所要時間の内訳）"):
+        totals = trace["totals"]
+        col1, col2, col3 = st.columns(3)
+        col1.metric("全体", f"{trace['duration_ms']:.0f} ms")
+        col2.metric("モデル呼び出し", f"{totals.get('model_latency_ms', 0):.0f} ms")
+        col3.metric("待ち時間", f"{totals.get('queue_wait_ms', 0):.0f} ms")
+        st.dataframe([
+            {
+                "エージェント": hop["agent_name"],
+                "所要時間 (ms)": round(hop["latency"] * 1000, 1),
+                "待ち時間 (ms)": round(hop["metrics"].get("queue_wait_ms", 0), 1),
+                "モデル (ms)": round(hop["metrics"].get("model_latency_ms", 0), 1),
+                "最初のトークン (ms)": round(hop["metrics"]["time_to_first_token_ms"], 1)
+                if "time_to_first_token_ms" in hop["metrics"] else None,
+                "入力トークン": hop["metrics"].get("input_tokens"),
+                "出力トークン": hop["metrics"].get("output_tokens"),
+                "エラー": hop["error"] or ""
+            }
+            for hop in result["hops"]
+        ])
+        st.caption(f"トレースID: {trace['trace_id']}")
+        st.download_button(
+            "トレースをダウンロード (OTLP/JSON)",
+            data=json.dumps(trace["otlp"], ensure_ascii=False),
+            file_name=f"trace_{trace['trace_id']}.json",
+            mime="application/json"
+        )
 
 def run_flow_ui(flow: AgentFlow):
     """
@@ -274,47 +737,186 @@ def run_flow_ui(flow: AgentFlow):
     st.write(f"**エージェント数:** {len(flow.agents)}")
     st.write(f"**接続数:** {len(flow.connections)}")
     
+    plan = compile_flow(flow)
+    st.write(f"**実行回数の上限:** {plan.analysis.execution_bound}")
+    
+    # 静的解析で見つかった問題の表示
+    from src.agent_flow.flow_builder_ui import flow_visualization, show_flow_analysis
+    show_flow_analysis(plan.analysis)
+    
     # 接続情報の表示
     if flow.connections:
         st.write("**接続詳細:**")
-        for i, conn in enumerate(flow.connections):
-            source_name = next((a.name for a in flow.agents if a.id == conn.source_id), "不明")
-            target_name = next((a.name for a in flow.agents if a.id == conn.target_id), "不明")
-            conn_type = "ハンドオフ" if conn.connection_type == ConnectionType.HANDOFF else "順次実行" if conn.connection_type == ConnectionType.SEQUENTIAL else "条件分岐"
+        for i, conn in enumerate(plan.edges):
+            source_name = plan.agent_name(conn.source_id)
+            target_name = conn.target_name
+            conn_type = CONNECTION_TYPE_LABELS.get(conn.connection_type, conn.connection_type)
             st.write(f"{i+1}. {source_name} → {target_name} (タイプ: {conn_type})")
     else:
         st.warning("⚠️ 接続が設定されていません。フロービルダーで接続を追加してください。")
     
     # フロー可視化
-    from src.agent_flow.flow_builder_ui import flow_visualization
     flow_visualization(flow.agents, flow.connections, show_code=True)
     
     # 実行セクション
     st.subheader("フロー実行")
     
     user_input = st.text_area("メッセージを入力してください", height=100)
+    stream = st.checkbox("ストリーミング表示", value=True, help="生成中の応答を逐次表示します")
+    speculative = st.checkbox(
+        "投機的実行", value=FLOW_SPECULATION_ENABLED,
+        help="条件分岐の実行中に、過去の実行で選ばれることが多い分岐先のリクエストの順番を前もって確保します"
+    )
+    # ワーカーが起動している場合は、スクリプトの再実行や画面の移動で中断されないワーカープロセスで実行する
+    live_workers = get_job_queue().live_workers()
+    background = st.checkbox(
+        "バックグラウンドで実行", value=live_workers > 0, disabled=live_workers == 0,
+        help="ワーカープロセスで実行します。画面を移動したり再読み込みしても実行は続き、進捗はこの画面に表示されます"
+    )
+    if live_workers == 0:
+        st.caption("ワーカーが起動していないため、この画面で実行します（`python -m src.agent_flow.worker` で起動できます）")
     run_button = st.button("フローを実行", type="primary", disabled=not user_input)
     
-    # チャット表示用のプレースホルダー
-    chat_placeholder = st.empty()
+    # エラーで中断した実行は、完了済みのホップを再実行せずに再開できる
+    resume_run_id = None
+    resumable = get_checkpoint_store().list_resumable(flow.id) if FLOW_CHECKPOINT_ENABLED else []
+    if resumable:
+        with st.expander(f"中断された実行 ({len(resumable)})"):
+            checkpoints = {checkpoint["run_id"]: checkpoint for checkpoint in resumable}
+            selected_run_id = st.selectbox(
+                "再開する実行",
+                list(checkpoints),
+                format_func=lambda run_id: "{} | {:.30} | 完了 {} ホップ | {}".format(
+                    time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(checkpoints[run_id]["created_at"])),
+                    checkpoints[run_id]["user_input"],
+                    len(checkpoints[run_id]["hops"]),
+                    checkpoints[run_id]["error"]["error"]
+                )
+            )
+            col1, col2 = st.columns(2)
+            if col1.button("最後に成功したホップから再開"):
+                resume_run_id = selected_run_id
+            if col2.button("チェックポイントを削除"):
+                get_checkpoint_store().delete(selected_run_id)
+                st.rerun()
+    
+    # チャット表示用のコンテナ
+    chat_container = st.container()
     
-    # ログ表示用のプレースホルダー
+    # ログ表示用のコンテナ
     log_container = st.expander("実行ログ", expanded=True)
-    log_placeholder = log_container.empty()
     
-    if run_button and user_input:
-        with st.spinner("フローを実行中..."):
-            # フローランタイムの初期化と実行
-            runtime = FlowRuntime(flow)
-            
-            # ログ表示の初期化
-            log_placeholder.markdown("### 実行ログ\n\n実行を開始しています...")
-            
-            # 非同期処理を実行
-            result = run_async(runtime.run_flow(user_input, chat_placeholder, log_placeholder))
-            
-            st.success("フローの実行が完了しました")
-            
-            # 結果表示
-            if "final_response" in result:
-                pass  # 既にチャット履歴に表示されているため何もしない 
\ No newline at end of file
+    if (run_button and user_input) or resume_run_id:
+        if background:
+            # ワーカープロセスで実行し、進捗はジョブキューから読み込んで表示する
+            job_id = get_job_queue().submit(flow, user_input, stream=stream, speculative=speculative,
+                                            resume_run_id=resume_run_id)
+            st.session_state.setdefault("flow_jobs", {})[flow.id] = job_id
+        else:
+            st.session_state.get("flow_jobs", {}).pop(flow.id, None)
+            with st.spinner("フローを実行中..."):
+                # フローランタイムの初期化と実行
+                runtime = FlowRuntime(flow)
+                runtime.speculative = speculative
+                
+                # チャット履歴とログを追記型で描画するビュー
+                # 描画はバックグラウンドループではなくスクリプトのスレッドで行う
+                view = CallerThreadProxy(FlowRunView(chat_container, log_container))
+                
+                # 非同期処理を実行
+                if resume_run_id:
+                    result = run_async(runtime.resume(resume_run_id, view, stream=stream))
+                else:
+                    result = run_async(runtime.run_flow(user_input, view, stream=stream))
+                
+                show_run_result(result_to_json(result))
+    
+    job_id = st.session_state.get("flow_jobs", {}).get(flow.id)
+    if job_id:
+        show_background_run(flow.id, job_id, chat_container, log_container)
+
+def show_background_run(flow_id: str, job_id: str, chat_container, log_container):
+    """
+    バックグラウンド実行の進捗と結果を表示
+    
+    実行中は FLOW_RUN_POLL_INTERVAL 秒ごとに進捗の部分だけを再実行してジョブキューのイベントを読み込み、
+    終了したら画面全体を再実行して結果を表示する
+    
+    Args:
+        flow_id: フローID
+        job_id: ジョブID
+        chat_container: チャット表示用のStreamlitコンテナ
+        log_container: ログ表示用のStreamlitコンテナ
+    """
+    job = get_job_queue().get(job_id, include_result=True)
+    if job is None:
+        # 保持期間を過ぎて削除されたジョブ
+        st.session_state["flow_jobs"].pop(flow_id, None)
+        return
+    
+    if job["status"] not in FINISHED_STATUSES:
+        with chat_container:
+            _poll_background_run(job_id)
+        return
+    
+    state = _job_event_state(job_id)
+    with chat_container:
+        _show_job_events(state, log_container)
+    if job["result"] is not None:
+        show_run_result(job["result"])
+    elif job["status"] == CANCELLED:
+        st.warning("フローの実行を取り消しました")
+    else:
+        st.error(f"フローの実行に失敗しました: {job['error']}")
+    if st.button("結果を閉じる"):
+        st.session_state["flow_jobs"].pop(flow_id, None)
+        st.session_state.pop("flow_job_events", None)
+        st.rerun()
+
+@st.fragment(run_every=FLOW_RUN_POLL_INTERVAL)
+def _poll_background_run(job_id: str):
+    """
+    実行中のバックグラウンド実行の進捗を定期的に読み込んで表示
+    
+    フラグメントの外側のコンテナに書き込んだ要素は再実行のたびに追記されるため、ログもフラグメントの中に表示する
+    """
+    job = get_job_queue().get(job_id)
+    if job is None or job["status"] in FINISHED_STATUSES:
+        st.rerun()
+    
+    if job["status"] == QUEUED:
+        st.info("ワーカーの空きを待っています...")
+    else:
+        st.info(f"ワーカーで実行中です（{time.time() - job['started_at']:.0f} 秒経過）。"
+                "画面を移動しても実行は続きます")
+    _show_job_events(_job_event_state(job_id), st.expander("実行ログ（実行中）", expanded=False))
+    if st.button("実行を取り消す", disabled=job["cancel_requested"]):
+        get_job_queue().cancel(job_id)
+
+def _job_event_state(job_id: str) -> FlowEventState:
+    """前回の表示以降のイベントを読み込み、ジョブの表示状態を更新する（セッションごとに1件のジョブのみ保持）"""
+    cached = st.session_state.get("flow_job_events")
+    if cached is None or cached[0] != job_id:
+        cached = (job_id, FlowEventState())
+        st.session_state["flow_job_events"] = cached
+    state = cached[1]
+    state.apply(get_job_queue().events(job_id, after_seq=state.last_seq))
+    return state
+
+def _show_job_events(state: FlowEventState, log_container):
+    """組み立てたチャット履歴・生成途中の応答・直近のログを表示"""
+    older = state.messages[:-FLOW_VIEW_MAX_MESSAGES]
+    if older:
+        with st.expander(f"以前のメッセージ ({len(older)})", expanded=False):
+            for msg in older:
+                st.markdown(format_message(msg))
+    for msg in state.messages[-FLOW_VIEW_MAX_MESSAGES:]:
+        st.markdown(format_message(msg))
+    for name, text in state.streaming.values():
+        st.markdown(f"**{name}:**\n{text}{STREAM_CURSOR}")
+    
+    with log_container:
+        hidden = len(state.logs) - FLOW_VIEW_LOG_CHUNK_SIZE
+        if hidden > 0:
+            st.caption(f"古いログ {hidden} 件は省略されています（実行完了後にダウンロードできます）")
+        st.markdown("\n\n".join(format_log_entry(entry) for entry in state.logs[-FLOW_VIEW_LOG_CHUNK_SIZE:]))
@@ -0,0 +1,257 @@
+from typing import Any, Callable, Dict, List, Optional
+
+from src.config.settings import FLOW_VIEW_LOG_CHUNK_SIZE, FLOW_VIEW_MAX_LOG_CHUNKS, FLOW_VIEW_MAX_MESSAGES
+from src.utils.run_log import RunLog
+from src.utils.streaming import STREAM_CURSOR
+
+
+def format_message(msg: Dict[str, Any]) -> str:
+    """チャットメッセージを表示用の文字列に整形"""
+    if msg["role"] == "user":
+        return f"**ユーザー:**\n{msg['content']}"
+    name = msg.get("name", "Assistant")
+    return f"**{name}:**\n{msg['content']}"
+
+
+def format_log_entry(entry: Dict[str, Any]) -> str:
+    """ログエントリを表示用の文字列に整形"""
+    return f"**{entry['timestamp']}** [{entry['level']}] {entry['message']}"
+
+
+class FlowRunView:
+    """
+    フロー実行中のチャット履歴とログを追記型で描画するビュー
+
+    メッセージごと・ログのチャンクごとに個別のプレースホルダーを持ち、
+    新しく追加された要素だけを描画する。表示件数の上限を超えた古いメッセージは
+    折りたたみ領域に一度だけ移動し、古いログは件数のみの表示に置き換えるため、
+    1回の更新にかかる描画コストは実行の長さによらず一定になる。
+    """
+
+    def __init__(self, chat_container, log_container,
+                 max_visible_messages: int = FLOW_VIEW_MAX_MESSAGES,
+                 log_chunk_size: int = FLOW_VIEW_LOG_CHUNK_SIZE,
+                 max_visible_log_chunks: int = FLOW_VIEW_MAX_LOG_CHUNKS):
+        """
+        FlowRunViewの初期化
+
+        Args:
+            chat_container: チャット表示用のStreamlitコンテナ
+            log_container: ログ表示用のStreamlitコンテナ
+            max_visible_messages: 展開表示するメッセージの最大数
+            log_chunk_size: ログをまとめて描画する単位（件数）
+            max_visible_log_chunks: 展開表示するログチャンクの最大数
+        """
+        self.max_visible_messages = max_visible_messages
+        self.log_chunk_size = log_chunk_size
+        self.max_visible_log_chunks = max_visible_log_chunks
+
+        self._chat_container = chat_container
+        # 折りたたみ領域は先頭に表示したいので、位置だけ先に確保しておく
+        self._older_messages_slot = chat_container.container()
+        self._older_messages = None
+        self._visible_messages: List[Any] = []  # 表示中のメッセージ (プレースホルダー, テキスト)
+        self._streaming_slots: Dict[object, Any] = {}
+
+        self._log_container = log_container
+        log_container.markdown("### 実行ログ")
+        self._older_logs_slot = log_container.empty()
+        self._hidden_log_count = 0  # 表示から省略したログ件数
+        self._visible_log_chunks: List[Any] = []  # 確定済みのログチャンク (プレースホルダー, 件数)
+        self._current_chunk_slot = None
+        self._current_chunk: List[str] = []
+        self._log_cursor = 0  # 描画済みの最後のログの連番
+
+    def add_message(self, msg: Dict[str, Any], stream_key: Optional[object] = None):
+        """
+        メッセージを追加して描画する
+
+        Args:
+            msg: チャットメッセージ
+            stream_key: ストリーミング中に使用していたキー（指定時は同じ位置に確定版を描画）
+        """
+        text = format_message(msg)
+        slot = self._streaming_slots.pop(stream_key, None) if stream_key is not None else None
+        if slot is None:
+            slot = self._chat_container.empty()
+            self._visible_messages.append([slot, text])
+        else:
+            for item in self._visible_messages:
+                if item[0] is slot:
+                    item[1] = text
+                    break
+        slot.markdown(text)
+        self._collapse_messages()
+
+    def update_streaming(self, stream_key: object, name: str, text: str):
+        """
+        生成途中の応答を描画する
+
+        Args:
+            stream_key: 生成途中の応答を識別するキー
+            name: エージェント名
+            text: 生成途中のテキスト
+        """
+        slot = self._streaming_slots.get(stream_key)
+        if slot is None:
+            slot = self._chat_container.empty()
+            self._streaming_slots[stream_key] = slot
+            self._visible_messages.append([slot, ""])
+        slot.markdown(f"**{name}:**\n{text}")
+
+    def discard_streaming(self, stream_key: object):
+        """確定しなかった生成途中の応答の表示を取り消す"""
+        slot = self._streaming_slots.pop(stream_key, None)
+        if slot is not None:
+            slot.empty()
+            self._visible_messages = [item for item in self._visible_messages if item[0] is not slot]
+
+    def sync_logs(self, logs: RunLog):
+        """
+        まだ描画していないログエントリを追記する
+
+        Args:
+            logs: フロー実行のログ
+        """
+        entries = logs.entries(after_seq=self._log_cursor)
+        if not entries:
+            return
+        # 描画する前にリングバッファからあふれたイベントは件数のみ表示する
+        skipped = entries[0]["seq"] - self._log_cursor - 1
+        if skipped > 0:
+            self._hide_logs(skipped)
+        for entry in entries:
+            if len(self._current_chunk) >= self.log_chunk_size:
+                self._freeze_log_chunk()
+            self._current_chunk.append(format_log_entry(entry))
+        self._log_cursor = entries[-1]["seq"]
+
+        if self._current_chunk_slot is None:
+            self._current_chunk_slot = self._log_container.empty()
+        self._current_chunk_slot.markdown("\n\n".join(self._current_chunk))
+
+    def _freeze_log_chunk(self):
+        """書き込み中のログチャンクを確定し、表示上限を超えた古いチャンクを折りたたむ"""
+        text = "\n\n".join(self._current_chunk)
+        if self._current_chunk_slot is None:
+            self._current_chunk_slot = self._log_container.empty()
+        self._current_chunk_slot.markdown(text)
+        self._visible_log_chunks.append((self._current_chunk_slot, len(self._current_chunk)))
+        self._current_chunk_slot = None
+        self._current_chunk = []
+
+        # ログ表示は展開領域の中にあり入れ子の折りたたみは使えないため、古いチャンクは件数表示に置き換える
+        while len(self._visible_log_chunks) > self.max_visible_log_chunks:
+            slot, count = self._visible_log_chunks.pop(0)
+            slot.empty()
+            self._hide_logs(count)
+
+    def _hide_logs(self, count: int):
+        """表示から省略したログの件数を更新"""
+        self._hidden_log_count += count
+        self._older_logs_slot.caption(f"古いログ {self._hidden_log_count} 件は省略されています（実行完了後にダウンロードできます）")
+
+    def _collapse_messages(self):
+        """表示上限を超えた古いメッセージを折りたたみ領域に移動"""
+        while len(self._visible_messages) > self.max_visible_messages:
+            slot, text = self._visible_messages[0]
+            if any(slot is streaming_slot for streaming_slot in self._streaming_slots.values()):
+                # 生成途中のメッセージは確定するまで移動しない
+                break
+            self._visible_messages.pop(0)
+            slot.empty()
+            if self._older_messages is None:
+                self._older_messages = self._older_messages_slot.expander("以前のメッセージ", expanded=False)
+            self._older_messages.markdown(text)
+
+
+class FlowEventView:
+    """
+    フロー実行中の描画の呼び出しをイベントに変換するビュー
+
+    FlowRunView と同じメソッドを持ち、Streamlitの画面の代わりにイベントを受け取る関数へ渡す
+    （ジョブAPIやワーカープロセスから実行する場合に使う）。生成途中の応答は前回からの差分だけを渡す
+    """
+
+    def __init__(self, publish: Callable[[str, Dict[str, Any]], None]):
+        """
+        FlowEventViewの初期化
+
+        Args:
+            publish: イベントの種類（"message" / "delta" / "discard" / "log"）と内容を受け取る関数
+        """
+        self.publish = publish
+        # 生成途中の応答のキー -> [応答の番号, 渡した文字数]（並列実行の枝の応答を区別するため番号を付ける）
+        self._streamed: Dict[object, List[int]] = {}
+        self._stream_count = 0
+        self._log_cursor = 0
+
+    def add_message(self, msg: Dict[str, Any], stream_key: Optional[object] = None):
+        """確定したメッセージを渡す（生成途中の応答を確定した場合はその番号を付ける）"""
+        streamed = self._streamed.pop(stream_key, None) if stream_key is not None else None
+        self.publish("message", {"role": msg["role"], "name": msg.get("name"), "content": msg["content"],
+                                 "stream": streamed[0] if streamed else None})
+
+    def update_streaming(self, stream_key: object, name: str, text: str):
+        """生成途中の応答のうち、まだ渡していない部分を差分として渡す"""
+        if text.endswith(STREAM_CURSOR):
+            text = text[:-len(STREAM_CURSOR)]
+        streamed = self._streamed.get(stream_key)
+        if streamed is None:
+            self._stream_count += 1
+            streamed = self._streamed[stream_key] = [self._stream_count, 0]
+        if len(text) > streamed[1]:
+            self.publish("delta", {"stream": streamed[0], "name": name, "delta": text[streamed[1]:]})
+            streamed[1] = len(text)
+
+    def discard_streaming(self, stream_key: object):
+        """確定しなかった生成途中の応答の取り消しを渡す"""
+        streamed = self._streamed.pop(stream_key, None)
+        if streamed is not None:
+            self.publish("discard", {"stream": streamed[0]})
+
+    def sync_logs(self, logs: RunLog):
+        """まだ渡していないログエントリを渡す"""
+        for entry in logs.entries(after_seq=self._log_cursor):
+            self.publish("log", {"level": entry["level"], "message": entry["message"],
+                                 "timestamp": entry["timestamp"]})
+            self._log_cursor = entry["seq"]
+
+
+class FlowEventState:
+    """
+    FlowEventView のイベントから、チャット履歴・生成途中の応答・ログを組み立てる
+
+    バックグラウンド実行の進捗を表示するために使い、前回以降のイベントだけを適用すればよいように状態を保持する
+    """
+
+    def __init__(self):
+        """FlowEventStateの初期化"""
+        self.messages: List[Dict[str, Any]] = []
+        self.streaming: Dict[int, List[str]] = {}  # 応答の番号 -> [エージェント名, 生成途中のテキスト]
+        self.logs: List[Dict[str, Any]] = []
+        self.last_seq = 0
+
+    def apply(self, events: List[Dict[str, Any]]):
+        """
+        イベントを順に適用する
+
+        Args:
+            events: {"seq", "type", "data"} のリスト（連番順）
+        """
+        for event in events:
+            data = event["data"]
+            if event["type"] == "status" and data.get("status") == "running":
+                # 別のワーカーが引き継いだ場合は最初のホップから表示し直される
+                self.messages.clear()
+                self.streaming.clear()
+            elif event["type"] == "message":
+                self.streaming.pop(data.get("stream"), None)
+                self.messages.append(data)
+            elif event["type"] == "delta":
+                self.streaming.setdefault(data["stream"], [data["name"], ""])[1] += data["delta"]
+            elif event["type"] == "discard":
+                self.streaming.pop(data["stream"], None)
+            elif event["type"] == "log":
+                self.logs.append(data)
+            self.last_seq = event["seq"]
@@ -0,0 +1,426 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.agent_builder.agent_types import AgentFlow
+from src.config.settings import (
+    FLOW_SPECULATION_ENABLED,
+    JOB_MAX_ATTEMPTS,
+    JOB_QUEUE_PATH,
+    JOB_QUEUE_TTL,
+    JOB_WORKER_STALE_SECONDS,
+)
+
+# ジョブの状態
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+# 一覧・状態の取得で返す列（フローの定義・結果は含めない）
+_JOB_COLUMNS = ("id", "flow_id", "flow_name", "input", "stream", "speculative", "run_id", "resume", "status",
+                "worker", "attempts", "cancel_requested", "error", "created_at", "started_at", "finished_at",
+                "heartbeat_at")
+
+
+class JobQueue:
+    """
+    フロー実行のジョブを、Streamlitのプロセス・ジョブAPIとワーカープロセスの間で共有するSQLiteのキュー
+
+    画面やジョブAPIから投入したジョブをワーカーが取得して実行し、実行中のメッセージ・応答の差分・ログを
+    イベントとして書き込む。画面はイベントを読み込んで進捗を表示するため、スクリプトの再実行や
+    画面の移動で実行が中断されることはない。ワーカーのハートビートが途絶えたジョブは
+    別のワーカーがチェックポイントから再開する
+    """
+
+    def __init__(self, db_path: str = JOB_QUEUE_PATH, ttl: float = JOB_QUEUE_TTL):
+        """
+        JobQueueの初期化
+
+        Args:
+            db_path: SQLiteファイルのパス
+            ttl: 終了したジョブを保持する期間（秒）
+        """
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, flow_id TEXT NOT NULL, flow_name TEXT NOT NULL, flow TEXT NOT NULL, "
+            "input TEXT NOT NULL, stream INTEGER NOT NULL, speculative INTEGER NOT NULL, "
+            "run_id TEXT NOT NULL, resume INTEGER NOT NULL, "
+            "status TEXT NOT NULL, worker TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+            "cancel_requested INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL, heartbeat_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            "job_id TEXT NOT NULL, seq INTEGER NOT NULL, type TEXT NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (job_id, seq)) WITHOUT ROWID"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS workers ("
+            "id TEXT PRIMARY KEY, pid INTEGER NOT NULL, started_at REAL NOT NULL, heartbeat_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def submit(self, flow: AgentFlow, user_input: str, stream: bool = True,
+               speculative: bool = FLOW_SPECULATION_ENABLED, resume_run_id: Optional[str] = None) -> str:
+        """
+        ジョブを投入する
+
+        フローの定義はジョブに保存するため、投入後にフローを編集しても実行には影響しない
+
+        Args:
+            flow: 実行するエージェントフロー
+            user_input: ユーザー入力（再開の場合はチェックポイントの入力が使われる）
+            stream: 生成途中の応答の差分をイベントとして書き込むかどうか
+            speculative: 条件分岐の投機的実行を行うかどうか
+            resume_run_id: 指定した場合は、この実行のチェックポイントから再開する
+
+        Returns:
+            str: ジョブID
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, flow_id, flow_name, flow, input, stream, speculative, run_id, resume, "
+                "status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, flow.id, flow.name, json.dumps(flow.to_dict(), ensure_ascii=False), user_input,
+                 int(stream), int(speculative), resume_run_id or uuid.uuid4().hex, int(bool(resume_run_id)),
+                 QUEUED, time.time())
+            )
+        return job_id
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        最も古い実行待ちのジョブを取得し、実行中にする
+
+        Args:
+            worker_id: ワーカーID
+
+        Returns:
+            Optional[Dict[str, Any]]: ジョブ（フローの定義 "flow" を含む）。実行待ちのジョブがない場合はNone
+        """
+        with self._lock:
+            # 書き込みロックを取る前に、実行待ちのジョブがあるかだけを確認する
+            if self._db.execute("SELECT 1 FROM jobs WHERE status = ? LIMIT 1", (QUEUED,)).fetchone() is None:
+                return None
+            now = time.time()
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    f"SELECT {', '.join(_JOB_COLUMNS)}, flow FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                    (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, "
+                        "started_at = COALESCE(started_at, ?), heartbeat_at = ? WHERE id = ?",
+                        (RUNNING, worker_id, now, now, row[0])
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = self._to_dict(row[:-1])
+        job.update(status=RUNNING, worker=worker_id, attempts=job["attempts"] + 1, flow=json.loads(row[-1]))
+        return job
+
+    def heartbeat(self, worker_id: str,
+                  events: Dict[str, Sequence[Tuple[str, Dict[str, Any]]]]) -> Tuple[List[str], List[str]]:
+        """
+        実行中のジョブのイベントをまとめて書き込み、ワーカーと実行中のジョブの生存を記録する
+
+        ハートビートが途絶えた間に別のワーカーへ引き継がれたジョブのイベントは書き込まない
+
+        Args:
+            worker_id: ワーカーID
+            events: 実行中のジョブID -> 前回から発生したイベント (種類, 内容) のリスト
+
+        Returns:
+            Tuple[List[str], List[str]]: 取り消しが要求されたジョブIDと、このワーカーの担当ではなくなったジョブID
+        """
+        now = time.time()
+        job_ids = list(events)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT INTO workers (id, pid, started_at, heartbeat_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at",
+                    (worker_id, os.getpid(), now, now)
+                )
+                owned = {
+                    job_id: bool(cancel_requested) for job_id, cancel_requested in self._db.execute(
+                        f"SELECT id, cancel_requested FROM jobs WHERE status = ? AND worker = ? "
+                        f"AND id IN ({', '.join('?' * len(job_ids))})", (RUNNING, worker_id, *job_ids)
+                    )
+                } if job_ids else {}
+                for job_id in owned:
+                    self._append_events(job_id, events[job_id])
+                self._db.executemany(
+                    "UPDATE jobs SET heartbeat_at = ? WHERE id = ?", [(now, job_id) for job_id in owned]
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        cancelled = [job_id for job_id, cancel_requested in owned.items() if cancel_requested]
+        lost = [job_id for job_id in job_ids if job_id not in owned]
+        return cancelled, lost
+
+    def finish(self, job_id: str, worker_id: str, status: str, events: Sequence[Tuple[str, Dict[str, Any]]] = (),
+               result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        """
+        ジョブの終了を記録する（残りのイベントも同じトランザクションで書き込む）
+
+        別のワーカーに引き継がれたジョブの場合は何もしない
+
+        Args:
+            job_id: ジョブID
+            worker_id: ワーカーID
+            status: 終了時の状態（COMPLETED / FAILED / CANCELLED）
+            events: まだ書き込んでいないイベント
+            result: 実行結果（FlowRuntime.run_flow の結果を result_to_json で変換したもの）
+            error: ジョブ自体が失敗した場合のエラーメッセージ
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                owner = self._db.execute("SELECT worker FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                if owner is not None and owner[0] == worker_id:
+                    self._append_events(job_id, [*events, ("status", {"status": status})])
+                    self._db.execute(
+                        "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                        (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                         error, time.time(), job_id)
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        ジョブの取り消しを要求する（実行待ちの場合はその場で取り消し、実行中の場合はワーカーが中断する）
+
+        Args:
+            job_id: ジョブID
+
+        Returns:
+            bool: 取り消しを要求した場合はTrue（終了済み・見つからない場合はFalse）
+        """
+        now = time.time()
+        with self._lock:
+            queued = self._db.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, now, job_id, QUEUED)
+            ).rowcount
+            running = self._db.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING)
+            ).rowcount
+        return bool(queued or running)
+
+    def requeue_stale(self, stale_seconds: float = JOB_WORKER_STALE_SECONDS,
+                      max_attempts: int = JOB_MAX_ATTEMPTS) -> int:
+        """
+        ハートビートが途絶えたワーカーの実行中のジョブを実行待ちに戻す（試行回数の上限に達した場合は失敗にする）
+
+        戻したジョブは別のワーカーがチェックポイントから再開する
+
+        Args:
+            stale_seconds: ハートビートが途絶えたとみなすまでの時間（秒）
+            max_attempts: 試行回数の上限
+
+        Returns:
+            int: 実行待ちに戻した、または失敗にしたジョブの数
+        """
+        now = time.time()
+        threshold = now - stale_seconds
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                failed = self._db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                    "WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                    (FAILED, "ワーカーが応答しなくなったため、ジョブを中断しました", now, RUNNING, threshold, max_attempts)
+                ).rowcount
+                requeued = self._db.execute(
+                    "UPDATE jobs SET status = CASE WHEN cancel_requested = 1 THEN ? ELSE ? END, worker = NULL, "
+                    "resume = 1, finished_at = CASE WHEN cancel_requested = 1 THEN ? END "
+                    "WHERE status = ? AND heartbeat_at < ?",
+                    (CANCELLED, QUEUED, now, RUNNING, threshold)
+                ).rowcount
+                self._db.execute("DELETE FROM workers WHERE heartbeat_at < ?", (threshold,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return failed + requeued
+
+    def purge(self) -> int:
+        """
+        保持期間を過ぎた終了済みのジョブとそのイベントを削除する
+
+        Returns:
+            int: 削除したジョブの数
+        """
+        threshold = time.time() - self.ttl
+        placeholders = ", ".join("?" * len(FINISHED_STATUSES))
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    f"DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs "
+                    f"WHERE status IN ({placeholders}) AND finished_at < ?)", (*FINISHED_STATUSES, threshold)
+                )
+                deleted = self._db.execute(
+                    f"DELETE FROM jobs WHERE status IN ({placeholders}) AND finished_at < ?",
+                    (*FINISHED_STATUSES, threshold)
+                ).rowcount
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return deleted
+
+    def get(self, job_id: str, include_result: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        ジョブの状態を取得する
+
+        Args:
+            job_id: ジョブID
+            include_result: 実行結果 "result" を含めるかどうか
+
+        Returns:
+            Optional[Dict[str, Any]]: ジョブの状態（見つからない場合はNone）
+        """
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(_JOB_COLUMNS)}, result FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = self._to_dict(row[:-1])
+        if include_result:
+            job["result"] = json.loads(row[-1]) if row[-1] else None
+        return job
+
+    def events(self, job_id: str, after_seq: int = 0) -> List[Dict[str, Any]]:
+        """
+        ジョブのイベントを取得する
+
+        Args:
+            job_id: ジョブID
+            after_seq: この連番より後のイベントのみを取得する
+
+        Returns:
+            List[Dict[str, Any]]: {"seq", "type", "data"} のリスト（連番順）
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, type, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after_seq)
+            ).fetchall()
+        return [{"seq": seq, "type": event_type, "data": json.loads(data)} for seq, event_type, data in rows]
+
+    def list_jobs(self, flow_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        新しい順にジョブの一覧を取得する
+
+        Args:
+            flow_id: 指定した場合はこのフローのジョブのみを返す
+            limit: 最大件数
+
+        Returns:
+            List[Dict[str, Any]]: ジョブの状態のリスト
+        """
+        query = f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs"
+        params: Tuple[Any, ...] = ()
+        if flow_id is not None:
+            query += " WHERE flow_id = ?"
+            params = (flow_id,)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY created_at DESC LIMIT ?", (*params, limit)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def count_by_status(self) -> Dict[str, int]:
+        """
+        状態ごとのジョブ数を取得する
+
+        Returns:
+            Dict[str, int]: 状態 -> ジョブ数（保持期間内の終了済みのジョブを含む）
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {**{status: 0 for status in (QUEUED, RUNNING, *FINISHED_STATUSES)}, **dict(rows)}
+
+    def live_workers(self, stale_seconds: float = JOB_WORKER_STALE_SECONDS) -> int:
+        """
+        ハートビートが途絶えていないワーカーの数を取得する
+
+        Args:
+            stale_seconds: ハートビートが途絶えたとみなすまでの時間（秒）
+
+        Returns:
+            int: ワーカーの数
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM workers WHERE heartbeat_at >= ?", (time.time() - stale_seconds,)
+            ).fetchone()[0]
+
+    def _append_events(self, job_id: str, events: Iterable[Tuple[str, Dict[str, Any]]]):
+        """イベントに続きの連番を付けて書き込む（トランザクションの中で呼び出す）"""
+        events = list(events)
+        if not events:
+            return
+        last_seq = self._db.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM job_events WHERE job_id = ?", (job_id,)
+        ).fetchone()[0]
+        self._db.executemany(
+            "INSERT INTO job_events (job_id, seq, type, data) VALUES (?, ?, ?, ?)",
+            [(job_id, last_seq + offset, event_type, json.dumps(data, ensure_ascii=False))
+             for offset, (event_type, data) in enumerate(events, start=1)]
+        )
+
+    @staticmethod
+    def _to_dict(row: Sequence[Any]) -> Dict[str, Any]:
+        """jobs テーブルの行を辞書に変換する"""
+        job = dict(zip(_JOB_COLUMNS, row))
+        job["stream"] = bool(job["stream"])
+        job["speculative"] = bool(job["speculative"])
+        job["resume"] = bool(job["resume"])
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """
+    プロセス全体で共有するジョブキューを取得する（初回の使用時にデータベースを開く）
+
+    Returns:
+        JobQueue: ジョブキュー
+    """
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue()
+    return _job_queue
@@ -0,0 +1,359 @@
+import argparse
+import asyncio
+import hmac
+import json
+import sys
+import time
+from http import HTTPStatus
+from typing import Any, Dict, List, NamedTuple, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from src.agent_flow.batch_runner import find_flow
+from src.agent_flow.job_queue import FINISHED_STATUSES, QUEUED, JobQueue, get_job_queue
+from src.models.similarity_cache import get_similarity_cache
+from src.config.settings import (
+    JOB_SERVER_EVENT_PING_INTERVAL,
+    JOB_SERVER_HOST,
+    JOB_SERVER_KEEPALIVE_TIMEOUT,
+    JOB_SERVER_MAX_BODY_BYTES,
+    JOB_SERVER_MAX_QUEUED,
+    JOB_SERVER_MAX_WAIT,
+    JOB_SERVER_POLL_INTERVAL,
+    JOB_SERVER_PORT,
+    JOB_SERVER_TOKEN,
+)
+from src.utils.persistence import load_flows
+
+
+def _job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    ジョブキューのジョブをAPIの応答形式に変換する
+
+    Args:
+        job: JobQueue.get で取得したジョブ
+
+    Returns:
+        Dict[str, Any]: ジョブの状態（include_result で取得した場合は実行結果 "result" を含む）
+    """
+    data = {
+        "job_id": job["id"],
+        "flow_id": job["flow_id"],
+        "flow_name": job["flow_name"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "queue_time": round((job["started_at"] or time.time()) - job["created_at"], 4)
+    }
+    if "result" in job:
+        data["result"] = job["result"]
+    return data
+
+
+class HttpRequest(NamedTuple):
+    """ジョブAPIへのHTTPリクエスト"""
+    method: str
+    path: str
+    query: Dict[str, List[str]]
+    headers: Dict[str, str]
+    body: bytes
+    keep_alive: bool
+
+
+class HttpError(Exception):
+    """エラーの応答を返すための例外"""
+
+    def __init__(self, status: int, message: str):
+        """
+        HttpErrorの初期化
+
+        Args:
+            status: HTTPステータスコード
+            message: エラーメッセージ
+        """
+        super().__init__(message)
+        self.status = status
+
+
+class JobServer:
+    """
+    ジョブAPIのHTTPサーバー（標準ライブラリの asyncio のみで実装）
+
+    フローは実行せず、ジョブキューへの投入と、ワーカーが書き込んだ状態・結果・イベントの読み込みだけを行う。
+    そのため、ジョブはワーカープロセスで実行され、サーバーやワーカーを再起動しても失われない
+
+    エンドポイント:
+        GET    /health                 状態ごとのジョブ数と、起動しているワーカーの数
+        GET    /flows                  保存済みのフローの一覧
+        POST   /jobs                   ジョブの投入 {"flow": フローIDまたは名前, "input": "...", "stream": false}
+        GET    /jobs/{id}              ジョブの状態
+        GET    /jobs/{id}/result       ジョブの実行結果（?wait=秒 で完了まで待機できる）
+        GET    /jobs/{id}/events       ジョブのイベント（Server-Sent Events、?after=連番 で続きから）
+        DELETE /jobs/{id}              ジョブの取り消し
+
+    トークンを指定した場合は、すべてのエンドポイントで Authorization: Bearer <トークン> を要求する
+    """
+
+    def __init__(self, queue: JobQueue, max_queued: int = JOB_SERVER_MAX_QUEUED,
+                 max_body_bytes: int = JOB_SERVER_MAX_BODY_BYTES,
+                 keepalive_timeout: float = JOB_SERVER_KEEPALIVE_TIMEOUT, token: Optional[str] = JOB_SERVER_TOKEN,
+                 poll_interval: float = JOB_SERVER_POLL_INTERVAL):
+        """
+        JobServerの初期化
+
+        Args:
+            queue: ジョブを投入し、状態とイベントを読み込むジョブキュー
+            max_queued: 実行待ちのジョブの最大数
+            max_body_bytes: リクエストボディの最大サイズ
+            keepalive_timeout: 同じ接続で次のリクエストを待つ時間（秒）
+            token: リクエストに要求するBearerトークン（Noneの場合は認証しない）
+            poll_interval: 結果の待機・イベントストリームでジョブキューを読み込む間隔（秒）
+        """
+        self.queue = queue
+        self.max_queued = max_queued
+        self.max_body_bytes = max_body_bytes
+        self.keepalive_timeout = keepalive_timeout
+        self.token = token
+        self.poll_interval = poll_interval
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        1つの接続のリクエストを順に処理する（keep-alive の場合は同じ接続で続けて受け付ける）
+
+        Args:
+            reader: 接続の読み込み側
+            writer: 接続の書き込み側
+        """
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.keepalive_timeout)
+                except asyncio.TimeoutError:
+                    break
+                except HttpError as e:
+                    self._write_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                keep_alive = await self._dispatch(request, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request: HttpRequest, writer: asyncio.StreamWriter) -> bool:
+        """リクエストを処理して応答を書き込み、接続を続けるかどうかを返す"""
+        parts = [part for part in request.path.split("/") if part]
+        try:
+            if not self._authorized(request):
+                raise HttpError(401, "Authorization ヘッダーに正しいBearerトークンを指定してください")
+            if parts == ["health"] and request.method == "GET":
+                stats = {"workers": await asyncio.to_thread(self.queue.live_workers), "max_queued": self.max_queued,
+                         "jobs": await asyncio.to_thread(self.queue.count_by_status)}
+                return self._write_json(writer, 200, stats, request.keep_alive)
+            if parts == ["flows"] and request.method == "GET":
+                flows = [{"id": flow.id, "name": flow.name, "description": flow.description}
+                         for flow in (await asyncio.to_thread(load_flows)).values()]
+                return self._write_json(writer, 200, {"flows": flows}, request.keep_alive)
+            if parts == ["jobs"] and request.method == "POST":
+                return self._write_json(writer, 202, _job_response(await self._submit(request)), request.keep_alive)
+            if parts == ["similar", "false-hits"] and request.method == "POST":
+                return self._write_json(writer, 200, self._report_false_hit(request), request.keep_alive)
+            if len(parts) in (2, 3) and parts[0] == "jobs":
+                job = await asyncio.to_thread(self.queue.get, parts[1])
+                if job is None:
+                    raise HttpError(404, f"ジョブが見つかりません: {parts[1]}")
+                action = parts[2] if len(parts) == 3 else None
+                if action is None and request.method == "GET":
+                    return self._write_json(writer, 200, _job_response(job), request.keep_alive)
+                if action is None and request.method == "DELETE":
+                    if not await asyncio.to_thread(self.queue.cancel, job["id"]):
+                        raise HttpError(409, f"ジョブは既に終了しています: {job['status']}")
+                    job = await asyncio.to_thread(self.queue.get, job["id"])
+                    return self._write_json(writer, 202, _job_response(job), request.keep_alive)
+                if action == "result" and request.method == "GET":
+                    wait = min(float(self._query(request, "wait", 0)), JOB_SERVER_MAX_WAIT)
+                    deadline = time.monotonic() + wait
+                    while job["status"] not in FINISHED_STATUSES and time.monotonic() < deadline:
+                        await asyncio.sleep(min(self.poll_interval, deadline - time.monotonic()))
+                        job = await asyncio.to_thread(self.queue.get, job["id"])
+                    job = await asyncio.to_thread(self.queue.get, job["id"], True)
+                    return self._write_json(writer, 200 if job["status"] in FINISHED_STATUSES else 202,
+                                            _job_response(job), request.keep_alive)
+                if action == "events" and request.method == "GET":
+                    after = int(request.headers.get("last-event-id") or self._query(request, "after", 0))
+                    if after < 0:
+                        raise HttpError(400, f"イベントの連番は0以上で指定してください: {after}")
+                    await self._stream_events(job["id"], after, writer)
+                    return False
+            raise HttpError(404, f"{request.method} {request.path} は存在しません")
+        except HttpError as e:
+            return self._write_json(writer, e.status, {"error": str(e)}, request.keep_alive)
+        except ValueError as e:
+            return self._write_json(writer, 400, {"error": f"パラメータが不正です: {e}"}, request.keep_alive)
+
+    def _authorized(self, request: HttpRequest) -> bool:
+        """リクエストのBearerトークンを検証する（トークンを指定していない場合は常にTrue）"""
+        if not self.token:
+            return True
+        scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(credentials.strip().encode(), self.token.encode())
+
+    async def _submit(self, request: HttpRequest) -> Dict[str, Any]:
+        """POST /jobs のボディを検証してジョブキューに投入する"""
+        try:
+            payload = json.loads(request.body or b"{}")
+        except json.JSONDecodeError as e:
+            raise HttpError(400, f"ボディがJSONではありません: {e}")
+        if not isinstance(payload, dict) or not isinstance(payload.get("flow"), str) \
+                or not isinstance(payload.get("input"), str):
+            raise HttpError(400, "ボディには \"flow\"（フローIDまたは名前）と \"input\"（文字列）が必要です")
+        try:
+            flow = find_flow(await asyncio.to_thread(load_flows), payload["flow"])
+        except KeyError as e:
+            raise HttpError(404, e.args[0])
+        if (await asyncio.to_thread(self.queue.count_by_status))[QUEUED] >= self.max_queued:
+            raise HttpError(503, f"実行待ちのジョブが上限 ({self.max_queued} 件) に達しています")
+        job_id = await asyncio.to_thread(self.queue.submit, flow, payload["input"],
+                                         stream=bool(payload.get("stream", False)))
+        return await asyncio.to_thread(self.queue.get, job_id)
+
+    def _report_false_hit(self, request: HttpRequest) -> Dict[str, Any]:
+        """POST /similar/false-hits のボディを検証し、類似質問キャッシュの誤りを記録する"""
+        try:
+            payload = json.loads(request.body or b"{}")
+        except json.JSONDecodeError as e:
+            raise HttpError(400, f"ボディがJSONではありません: {e}")
+        if not isinstance(payload, dict) or not isinstance(payload.get("entry_id"), int) \
+                or not isinstance(payload.get("input"), str):
+            raise HttpError(400, "ボディには \"entry_id\"（ホップの similar.entry_id）と \"input\"（質問）が必要です")
+        recorded = get_similarity_cache().report_false_hit(payload["entry_id"], payload["input"])
+        return {"recorded": recorded, "stats": get_similarity_cache().get_stats()}
+
+    async def _stream_events(self, job_id: str, after: int, writer: asyncio.StreamWriter):
+        """ワーカーが書き込んだジョブのイベントを Server-Sent Events として、ジョブが終了するまで送る"""
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream; charset=utf-8\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        last_write = time.monotonic()
+        while True:
+            # 終了を記録するトランザクションで残りのイベントも書き込まれるため、状態を先に読み込めば取りこぼさない
+            job = await asyncio.to_thread(self.queue.get, job_id)
+            events = await asyncio.to_thread(self.queue.events, job_id, after)
+            for event in events:
+                data = json.dumps(event["data"], ensure_ascii=False)
+                writer.write(f"id: {event['seq']}\nevent: {event['type']}\ndata: {data}\n\n".encode("utf-8"))
+                after = event["seq"]
+            if job is None or job["status"] in FINISHED_STATUSES:
+                end = _job_response(job) if job is not None else {"job_id": job_id}
+                writer.write(f"event: end\ndata: {json.dumps(end, ensure_ascii=False)}\n\n".encode("utf-8"))
+                await writer.drain()
+                return
+            if events:
+                last_write = time.monotonic()
+            elif time.monotonic() - last_write >= JOB_SERVER_EVENT_PING_INTERVAL:
+                # 中継サーバーに接続を切られないよう、コメント行を送る
+                writer.write(b": ping\n\n")
+                last_write = time.monotonic()
+            await writer.drain()
+            await asyncio.sleep(self.poll_interval)
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[HttpRequest]:
+        """HTTPリクエストを1件読み込む（接続が閉じられた場合はNone）"""
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "リクエスト行が不正です")
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HttpError(400, "Content-Length が不正です")
+        if length > self.max_body_bytes:
+            raise HttpError(413, f"リクエストボディが上限 ({self.max_body_bytes} バイト) を超えています")
+        body = await reader.readexactly(length) if length else b""
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        url = urlsplit(target)
+        return HttpRequest(method.upper(), url.path, parse_qs(url.query), headers, body, keep_alive)
+
+    @staticmethod
+    def _query(request: HttpRequest, name: str, default: Any) -> Any:
+        """クエリパラメータの最初の値を取得する"""
+        values = request.query.get(name)
+        return values[0] if values else default
+
+    @staticmethod
+    def _write_json(writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool) -> bool:
+        """JSONの応答を書き込み、接続を続けるかどうかを返す"""
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+        )
+        return keep_alive
+
+
+async def serve(host: str = JOB_SERVER_HOST, port: int = JOB_SERVER_PORT, max_queued: int = JOB_SERVER_MAX_QUEUED):
+    """
+    ジョブAPIサーバーを起動し、停止されるまで待機する
+
+    Args:
+        host: 待ち受けるアドレス
+        port: 待ち受けるポート
+        max_queued: 実行待ちのジョブの最大数
+    """
+    server = JobServer(get_job_queue(), max_queued)
+    listener = await asyncio.start_server(server.handle_connection, host, port, backlog=100)
+    print(f"ジョブAPIサーバーを起動しました: http://{host}:{port}", file=sys.stderr)
+    if not server.token and host not in ("127.0.0.1", "localhost", "::1"):
+        print("警告: JOB_SERVER_TOKEN が設定されていないため、認証なしで外部からのリクエストを受け付けます",
+              file=sys.stderr)
+    if server.queue.live_workers() == 0:
+        print("ワーカーが起動していません。python -m src.agent_flow.worker を起動するまで、投入したジョブは実行されません",
+              file=sys.stderr)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv: Optional[list] = None):
+    """
+    コマンドラインからジョブAPIサーバーを起動する
+
+    例: python -m src.agent_flow.job_server --port 8600
+    """
+    parser = argparse.ArgumentParser(description="保存済みのエージェントフローをHTTPのジョブAPIとして提供します")
+    parser.add_argument("--host", default=JOB_SERVER_HOST, help="待ち受けるアドレス")
+    parser.add_argument("--port", type=int, default=JOB_SERVER_PORT, help="待ち受けるポート")
+    parser.add_argument("--max-queued", type=int, default=JOB_SERVER_MAX_QUEUED, help="実行待ちのジョブの最大数")
+    args = parser.parse_args(argv)
+
+    # フローはワーカーが実行するため、このプロセスではAPIキーを使わない
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_queued))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
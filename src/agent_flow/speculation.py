@@ -0,0 +1,91 @@
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from src.config.settings import (
+    FLOW_SPECULATION_MAX_BRANCHES,
+    FLOW_SPECULATION_MIN_PROBABILITY,
+    FLOW_SPECULATION_MIN_SAMPLES,
+)
+
+
+class BranchStats:
+    """
+    条件分岐の分岐先の履歴
+
+    フローの内容（ハッシュ値）と接続元のエージェントごとに、実際に選ばれた分岐先の回数を記録し、
+    次に選ばれる可能性が高い分岐先を予測する。フローが編集されるとハッシュ値が変わるため履歴は引き継がない
+    """
+
+    def __init__(self, min_samples: int = FLOW_SPECULATION_MIN_SAMPLES,
+                 min_probability: float = FLOW_SPECULATION_MIN_PROBABILITY,
+                 max_branches: int = FLOW_SPECULATION_MAX_BRANCHES):
+        """
+        BranchStatsの初期化
+
+        Args:
+            min_samples: 予測に必要な履歴の件数
+            min_probability: 予測する分岐先の最小の割合
+            max_branches: 予測する分岐先の最大数
+        """
+        self.min_samples = min_samples
+        self.min_probability = min_probability
+        self.max_branches = max_branches
+        # (フローのハッシュ値, 接続元ID) -> 分岐先ID（終了の場合はNone）ごとの回数
+        self._counts: Dict[Tuple[str, str], Counter] = {}
+        self._lock = threading.Lock()
+
+    def record(self, fingerprint: str, source_id: str, target_id: Optional[str]):
+        """
+        選ばれた分岐先を記録する
+
+        Args:
+            fingerprint: フロー内容のハッシュ値
+            source_id: 接続元のエージェントID
+            target_id: 選ばれた分岐先のエージェントID（どの条件にも一致せず終了した場合はNone）
+        """
+        with self._lock:
+            self._counts.setdefault((fingerprint, source_id), Counter())[target_id] += 1
+
+    def predict(self, fingerprint: str, source_id: str) -> List[str]:
+        """
+        選ばれる可能性が高い分岐先を予測する
+
+        Args:
+            fingerprint: フロー内容のハッシュ値
+            source_id: 接続元のエージェントID
+
+        Returns:
+            List[str]: 分岐先のエージェントID（可能性が高い順、履歴が足りない場合は空）
+        """
+        with self._lock:
+            counts = self._counts.get((fingerprint, source_id))
+            if counts is None:
+                return []
+            total = sum(counts.values())
+            ranked = counts.most_common()
+        if total < self.min_samples:
+            return []
+        return [
+            target_id for target_id, count in ranked
+            if target_id is not None and count / total >= self.min_probability
+        ][:self.max_branches]
+
+
+_branch_stats: Optional[BranchStats] = None
+_branch_stats_lock = threading.Lock()
+
+
+def get_branch_stats() -> BranchStats:
+    """
+    プロセス全体で共有する分岐先の履歴を取得する
+
+    Returns:
+        BranchStats: 分岐先の履歴
+    """
+    global _branch_stats
+    if _branch_stats is None:
+        with _branch_stats_lock:
+            if _branch_stats is None:
+                _branch_stats = BranchStats()
+    return _branch_stats
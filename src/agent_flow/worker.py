@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.agent_builder.agent_types import AgentFlow
+from src.agent_flow.flow_runtime import FlowRuntime, result_to_json
+from src.agent_flow.flow_view import FlowEventView
+from src.agent_flow.job_queue import CANCELLED, COMPLETED, FAILED, JobQueue, get_job_queue
+from src.models.scheduler import RequestScheduler, install_scheduler
+from src.config.settings import (
+    JOB_WORKER_CONCURRENCY,
+    JOB_WORKER_POLL_INTERVAL,
+    JOB_WORKER_PROCESSES,
+    JOB_WORKER_RATE_SHARE,
+    JOB_WORKER_STALE_SECONDS,
+    load_config,
+)
+
+
+class JobError(Exception):
+    """ジョブを実行できない（実行結果のない失敗として記録する）"""
+    pass
+
+
+class FlowWorker:
+    """
+    ジョブキューからジョブを取得してフローを実行するワーカー（1プロセスに1つ）
+
+    1つのイベントループ上で最大 concurrency 件のフローを同時に実行する。実行中のイベントはメモリにためて、
+    一定間隔ごとにハートビートと一緒に1つのトランザクションで書き込む
+    """
+
+    def __init__(self, queue: JobQueue, concurrency: int = JOB_WORKER_CONCURRENCY,
+                 poll_interval: float = JOB_WORKER_POLL_INTERVAL):
+        """
+        FlowWorkerの初期化
+
+        Args:
+            queue: ジョブキュー
+            concurrency: 同時に実行するフローの最大数
+            poll_interval: ジョブの取得・イベントの書き込み・ハートビートの間隔（秒）
+        """
+        self.queue = queue
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stopping = False
+        self._handed_over: Set[str] = set()  # 別のワーカーに引き継がれたため中断したジョブID
+        self._events: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}  # ジョブID -> 書き込んでいないイベント
+
+    async def run(self):
+        """停止されるまでジョブの取得と実行を繰り返す"""
+        from src.models.openai_client import install_shared_client
+
+        # このプロセスのすべてのジョブで接続を再利用するため、イベントループ上で共有クライアントを作成
+        install_shared_client()
+        last_maintenance = 0.0
+        try:
+            while True:
+                now = time.monotonic()
+                if now - last_maintenance >= JOB_WORKER_STALE_SECONDS / 2:
+                    last_maintenance = now
+                    self.queue.requeue_stale()
+                    self.queue.purge()
+                while len(self._tasks) < self.concurrency:
+                    job = self.queue.claim(self.worker_id)
+                    if job is None:
+                        break
+                    self._events[job["id"]] = []
+                    self._tasks[job["id"]] = asyncio.get_running_loop().create_task(self._execute(job))
+                self._flush()
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            self._stopping = True
+            for task in self._tasks.values():
+                task.cancel()
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def _flush(self):
+        """ためたイベントとハートビートを書き込み、取り消しが要求されたジョブや引き継がれたジョブを中断する"""
+        events = {job_id: self._events[job_id] for job_id in self._tasks}
+        for job_id in events:
+            self._events[job_id] = []
+        cancelled, lost = self.queue.heartbeat(self.worker_id, events)
+        for job_id in cancelled:
+            self._tasks[job_id].cancel()
+        for job_id in lost:
+            # 引き継いだワーカーが同じチェックポイントに書き込むため、このワーカーでの実行は終了を記録せずに中断する
+            self._handed_over.add(job_id)
+            self._tasks[job_id].cancel()
+
+    def _publish(self, job_id: str, event_type: str, data: Dict[str, Any]):
+        """
+        書き込むまでイベントをためる
+
+        トークンごとの差分をそのまま書き込むとジョブのイベントが応答の長さに比例して増えるため、
+        同じストリームの連続した差分は1件にまとめる（書き込みの間隔ごとに最大1件になる）
+        """
+        events = self._events[job_id]
+        if event_type == "delta" and events and events[-1][0] == "delta" \
+                and events[-1][1]["stream"] == data["stream"]:
+            previous = events[-1][1]
+            events[-1] = ("delta", dict(previous, delta=previous["delta"] + data["delta"]))
+        else:
+            events.append((event_type, data))
+
+    async def _execute(self, job: Dict[str, Any]):
+        """ジョブのフローを実行し、結果を書き込む"""
+        job_id = job["id"]
+        view = FlowEventView(lambda event_type, data: self._publish(job_id, event_type, data))
+        # 引き継いだジョブでは画面が表示をやり直せるよう、試行ごとに開始のイベントを書き込む
+        view.publish("status", {"status": "running", "attempt": job["attempts"], "worker": self.worker_id})
+        status, result, error = FAILED, None, None
+        handover = False
+        try:
+            runtime = FlowRuntime(AgentFlow.from_dict(job["flow"]))
+            runtime.speculative = job["speculative"]
+            if job["resume"] and runtime.checkpoints is not None:
+                # 停止したワーカーから引き継いだ場合や、中断された実行の再開では完了済みのホップを再実行しない
+                if runtime.checkpoints.load(job["run_id"]) is None:
+                    # 再開のジョブには入力がないため、最初から実行せずに失敗にする
+                    raise JobError(f"実行 {job['run_id']} のチェックポイントが見つからないため再開できません"
+                                   f"（保持期間を過ぎたか、削除されています）")
+                output = await runtime.resume(job["run_id"], view, stream=job["stream"])
+            else:
+                runtime.run_id = job["run_id"]
+                runtime.log.run_id = job["run_id"]
+                output = await runtime.run_flow(job["input"], view, stream=job["stream"])
+            result = result_to_json(output)
+            status = FAILED if output["errors"] else COMPLETED
+        except JobError as e:
+            error = str(e)
+        except asyncio.CancelledError:
+            # ワーカーの停止や別のワーカーへの引き継ぎによる中断ではジョブを終了させず、チェックポイントから続けさせる
+            handover = self._stopping or job_id in self._handed_over
+            status = CANCELLED
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            self._tasks.pop(job_id, None)
+            self._handed_over.discard(job_id)
+            events = self._events.pop(job_id, [])
+            if not handover:
+                self.queue.finish(job_id, self.worker_id, status, events, result, error)
+
+
+def _worker_process(concurrency: int, share: float):
+    """ワーカープロセスのエントリーポイント"""
+    # 同じAPIキーのレート制限のうち、このプロセスに割り当てられた割合だけを使う
+    install_scheduler(RequestScheduler(share=share))
+    try:
+        asyncio.run(FlowWorker(get_job_queue(), concurrency).run())
+    except KeyboardInterrupt:
+        pass
+
+
+def run_pool(processes: int = JOB_WORKER_PROCESSES, concurrency: int = JOB_WORKER_CONCURRENCY,
+             rate_share: float = JOB_WORKER_RATE_SHARE):
+    """
+    ワーカープロセスを起動し、停止したプロセスを起動し直しながら待機する
+
+    Args:
+        processes: ワーカープロセスの数
+        concurrency: ワーカープロセスごとに同時に実行するフローの最大数
+        rate_share: ワーカー全体で使う、同じAPIキーのレート制限の割合（プロセス数で等分する）
+    """
+    if not 0 < rate_share <= 1:
+        raise ValueError(f"レート制限の割合は0より大きく1以下で指定してください: {rate_share}")
+    context = multiprocessing.get_context("spawn")
+    processes = max(1, processes)
+    share = rate_share / processes
+
+    def start() -> multiprocessing.Process:
+        process = context.Process(target=_worker_process, args=(concurrency, share),
+                                  name="flow-worker", daemon=True)
+        process.start()
+        return process
+
+    pool = [start() for _ in range(processes)]
+    print(f"ワーカーを起動しました: {len(pool)} プロセス × 同時実行数 {concurrency}"
+          f"（レート制限の {rate_share:.0%} を使用）", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(1.0)
+            for index, process in enumerate(pool):
+                if not process.is_alive():
+                    # 実行中だったジョブはハートビートが途絶えた後に別のワーカーが引き継ぐ
+                    print(f"ワーカー (PID {process.pid}) が終了コード {process.exitcode} で停止したため、起動し直します",
+                          file=sys.stderr)
+                    pool[index] = start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in pool:
+            process.terminate()
+        for process in pool:
+            process.join()
+
+
+def main(argv: Optional[list] = None):
+    """
+    コマンドラインからワーカーを起動する
+
+    例: python -m src.agent_flow.worker --processes 2 --concurrency 8 --rate-share 0.5
+    """
+    parser = argparse.ArgumentParser(description="フロー実行画面やジョブAPIから投入されたジョブを実行するワーカーを起動します")
+    parser.add_argument("--processes", type=int, default=JOB_WORKER_PROCESSES, help="ワーカープロセスの数")
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY,
+                        help="ワーカープロセスごとに同時に実行するフローの最大数")
+    parser.add_argument("--rate-share", type=float, default=JOB_WORKER_RATE_SHARE,
+                        help="ワーカー全体で使う、同じAPIキーのレート制限の割合（0より大きく1以下）")
+    args = parser.parse_args(argv)
+    if not 0 < args.rate_share <= 1:
+        parser.error("--rate-share は0より大きく1以下で指定してください")
+
+    api_key = load_config()
+    if api_key is None:
+        print("APIキーが見つかりません。'.env'ファイルを確認してください。", file=sys.stderr)
+        sys.exit(1)
+    os.environ["OPENAI_API_KEY"] = api_key
+
+    run_pool(args.processes, args.concurrency, args.rate_share)
+
+
+if __name__ == "__main__":
+    main()
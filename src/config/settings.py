@@ -1,28 +1,178 @@
 import os
 from dotenv import load_dotenv
 
+# プロジェクトのルートディレクトリとデータ保存先
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+# 読み込み済みのAPIキー（Streamlitの再実行のたびに.envを読み直さないよう、プロセス内で保持する）
+_api_key = None
+
 def load_config():
     """
     .envファイルから設定を読み込み、APIキーを取得する
     
+    .envの読み込みはAPIキーを取得できるまでの間だけ行い、取得後はプロセス内で保持した値を返す
+    
     Returns:
         str: OpenAI APIキー
     """
-    # .envファイルのパスを指定して読み込む
-    dotenv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env')
-    load_dotenv(dotenv_path)
-    
-    # 環境変数からAPIキーを取得
-    api_key = os.getenv("OPENAI_API_KEY")
-    return api_key
+    global _api_key
+    if _api_key is None:
+        # .envファイルのパスを指定して読み込む
+        dotenv_path = os.path.join(BASE_DIR, '.env')
+        load_dotenv(dotenv_path)
+        
+        # 環境変数からAPIキーを取得
+        _api_key = os.getenv("OPENAI_API_KEY")
+    return _api_key
+
+# モデルごとの設定（rpm: 1分あたりのリクエスト数上限, tpm: 1分あたりのトークン数上限,
+# memory_tokens: チャットで1回の呼び出しに含める会話履歴（要約・直近の会話・今回の入力）のトークン数の上限）
+MODEL_SETTINGS = {
+    "gpt-3.5-turbo": {"rpm": 3500, "tpm": 160000, "memory_tokens": 6000},
+    "gpt-4": {"rpm": 500, "tpm": 10000, "memory_tokens": 3000},
+    "gpt-4-turbo": {"rpm": 500, "tpm": 30000, "memory_tokens": 8000},
+}
+
+# MODEL_SETTINGSに含まれないモデルに適用するレート制限
+DEFAULT_MODEL_RATE_LIMITS = {"rpm": 500, "tpm": 30000}
 
 # 利用可能なモデルのリスト
-AVAILABLE_MODELS = ["gpt-3.5-turbo", "gpt-4", "gpt-4-turbo"]
+AVAILABLE_MODELS = list(MODEL_SETTINGS)
 
 # デフォルト設定
 DEFAULT_INSTRUCTIONS = "You are a helpful assistant, always respond in Japanese"
 DEFAULT_AGENT_NAME = "Assistant"
 
+# OpenAIクライアントの接続プール設定
+OPENAI_MAX_CONNECTIONS = 20             # 最大同時接続数
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 10   # 維持する待機中接続の最大数
+OPENAI_KEEPALIVE_EXPIRY = 60.0          # 待機中接続を維持する時間（秒）
+
+# 再利用するAgentオブジェクトの最大数
+AGENT_REGISTRY_SIZE = 512
+
+# リクエストスケジューラ設定
+SCHEDULER_MAX_RETRIES = 5               # レート制限・一時的なエラー時の最大リトライ回数
+SCHEDULER_BACKOFF_BASE = 1.0            # バックオフの初期待ち時間（秒）
+SCHEDULER_BACKOFF_MAX = 60.0            # バックオフの最大待ち時間（秒）
+SCHEDULER_OUTPUT_TOKENS_ESTIMATE = 500  # 1回の呼び出しで見込む出力トークン数
+
+# チャットの会話履歴の設定
+DEFAULT_MEMORY_TOKENS = 4000              # MODEL_SETTINGSに含まれないモデルの会話履歴のトークン数の上限
+CHAT_MEMORY_SUMMARY_BATCH_TOKENS = 1500   # 直近の会話から外れた履歴がこのトークン数に達したら要約に取り込む
+CHAT_MEMORY_SUMMARY_INSTRUCTIONS = (
+    "You summarize conversations. Merge the previous summary and the new messages into one concise summary "
+    "that keeps facts, user preferences, decisions and open questions needed to continue the conversation. "
+    "Write it in the language of the conversation, in at most 300 words."
+)
+
+# モデルカスケードの設定（先に高速なモデルで回答し、採用条件を満たさない場合のみ設定したモデルで回答し直す）
+CASCADE_DEFAULT_RULE = "confidence >= 70 and length >= 20"  # 採用条件（フローの条件分岐と同じ構文）の既定値
+CASCADE_CONFIDENCE_INSTRUCTIONS = (
+    "\n\nAt the very end of your answer, add one line in the form [confidence: N], where N (0-100) "
+    "is how confident you are that the answer is complete and correct."
+)
+
+# バッチ実行で同時に実行するフローの最大数
+BATCH_CONCURRENCY = 8
+
+# ジョブAPIサーバーの設定（python -m src.agent_flow.job_server、フローはワーカーが実行する）
+JOB_SERVER_HOST = "127.0.0.1"
+JOB_SERVER_PORT = 8600
+JOB_SERVER_MAX_QUEUED = 1000         # 実行待ちのジョブの最大数（超えた場合は 503 を返す）
+JOB_SERVER_MAX_BODY_BYTES = 1024 * 1024  # リクエストボディの最大サイズ
+JOB_SERVER_KEEPALIVE_TIMEOUT = 15.0  # 次のリクエストを待つ時間（秒）
+JOB_SERVER_EVENT_PING_INTERVAL = 15.0  # イベントストリームで接続維持のコメントを送る間隔（秒）
+JOB_SERVER_POLL_INTERVAL = 0.25      # 結果の待機・イベントストリームでジョブキューを読み込む間隔（秒）
+JOB_SERVER_MAX_WAIT = 60.0           # 結果取得で完了を待てる最大時間（秒）
+JOB_SERVER_TOKEN = os.getenv("JOB_SERVER_TOKEN")  # 設定した場合は Authorization: Bearer <トークン> のないリクエストを拒否する
+
+# ストリーミング表示の再描画間隔（秒）
+STREAM_RENDER_INTERVAL = 0.1
+
+# フロー実行画面の表示設定
+FLOW_VIEW_MAX_MESSAGES = 20     # 展開表示するメッセージの最大数
+FLOW_VIEW_LOG_CHUNK_SIZE = 20   # ログをまとめて描画する単位（件数）
+FLOW_VIEW_MAX_LOG_CHUNKS = 5    # 展開表示するログチャンクの最大数
+
+# フローの静的解析の設定
+FLOW_MAX_EXECUTIONS = 100  # 循環を含むフローでの実行回数の上限（解析で求めた上限がこれを超える場合に打ち切る）
+FLOW_LOOP_ITERATIONS = 5   # 循環を含むフローで、到達可能なエージェント1つあたりに許す実行回数
+
+# 条件分岐の設定
+FLOW_KEYWORD_SCAN_THRESHOLD = 32  # 接続元の contains のキーワード数がこれを超える場合、応答を1回の走査でまとめて検索する
+
+# 条件分岐の投機的実行の設定（分岐先になる可能性が高いエージェントのリクエストの順番を前もって確保する）
+FLOW_SPECULATION_ENABLED = True        # 投機的実行を行うかどうか（フロー実行画面で実行ごとに無効にできる）
+FLOW_SPECULATION_MIN_SAMPLES = 3       # 分岐先を予測するのに必要な、その接続元の実行履歴の件数
+FLOW_SPECULATION_MIN_PROBABILITY = 0.3 # 投機的実行の対象にする分岐先の、履歴上の最小の割合
+FLOW_SPECULATION_MAX_BRANCHES = 2      # 1つの接続元で投機的実行の対象にする分岐先の最大数
+
+# フロー図の設定
+FLOW_DIAGRAM_CACHE_SIZE = 128   # 描画済みのフロー図を保持する最大数
+FLOW_DIAGRAM_MAX_HEIGHT = 600   # フロー図の表示領域の最大の高さ（超える場合はスクロール表示）
+
+# フロー実行ログの設定
+FLOW_LOG_LEVEL = os.getenv("FLOW_LOG_LEVEL", "INFO")  # 記録する最低レベル（DEBUG/INFO/WARNING/ERROR）
+FLOW_LOG_CAPACITY = 1000                              # 1回の実行で保持するログの最大件数
+FLOW_LOG_SINK = os.getenv("FLOW_LOG_SINK")            # ログを追記するJSONLファイル（未設定の場合は出力しない）
+
+# フロー実行のチェックポイント設定
+FLOW_CHECKPOINT_ENABLED = True                              # ホップごとにチェックポイントを保存するかどうか
+FLOW_CHECKPOINT_DIR = os.path.join(DATA_DIR, "checkpoints")  # 保存先ディレクトリ
+FLOW_CHECKPOINT_TTL = 7 * 24 * 60 * 60                       # 再開可能な実行を保持する期間（秒）
+
+# バックグラウンド実行の設定（ワーカープロセス: python -m src.agent_flow.worker）
+JOB_QUEUE_PATH = os.path.join(DATA_DIR, "jobs.sqlite3")  # 実行待ちのジョブと実行中のイベントを共有するSQLiteファイル
+JOB_QUEUE_TTL = 24 * 60 * 60             # 終了したジョブを保持する期間（秒）
+JOB_WORKER_PROCESSES = 2                 # 起動するワーカープロセスの数（フローの実行はAPIの待ち時間が大半のため、少数で足りる）
+# ワーカー全体で使う、同じAPIキーのレート制限の割合（残りは画面など同じキーを使う他のサービスの分。各プロセスはこれをプロセス数で等分する）
+JOB_WORKER_RATE_SHARE = float(os.getenv("JOB_WORKER_RATE_SHARE", "0.5"))
+JOB_WORKER_CONCURRENCY = 8               # ワーカープロセスごとに同時に実行するフローの最大数
+JOB_WORKER_POLL_INTERVAL = 0.25          # ジョブの取得・イベントの書き込み・ハートビートの間隔（秒）
+JOB_WORKER_STALE_SECONDS = 30.0          # ハートビートが途絶えた実行中のジョブを別のワーカーに引き継ぐまでの時間（秒）
+JOB_MAX_ATTEMPTS = 3                     # ワーカーの停止で引き継ぐ回数の上限
+FLOW_RUN_POLL_INTERVAL = 1.0             # フロー実行画面でバックグラウンド実行の進捗を更新する間隔（秒）
+
+# トレースの設定
+TRACE_SERVICE_NAME = "agent-flow"  # OTLPのリソース属性に記録するサービス名
+# フロー実行ごとのトレースをOTLP/JSON形式で追記するファイル（空文字の場合は出力しない）
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", os.path.join(DATA_DIR, "traces", "traces.jsonl"))
+
+# 起動時間の計測設定
+STARTUP_METRICS_RERUNS = 200  # 所要時間を保持するスクリプト再実行の件数
+
+# エージェント設定・フローの保存先（両方のサービスから共有されるSQLiteファイル）
+STORE_PATH = os.path.join(DATA_DIR, "store.sqlite3")
+
+# レスポンスキャッシュ設定
+RESPONSE_CACHE_PATH = os.path.join(DATA_DIR, "response_cache.sqlite3")
+RESPONSE_CACHE_TTL = 24 * 60 * 60        # 有効期限（秒）
+RESPONSE_CACHE_MEMORY_ENTRIES = 256      # メモリキャッシュの最大件数
+RESPONSE_CACHE_DISK_ENTRIES = 10000      # ディスクキャッシュの最大件数
+
+# 類似質問キャッシュ設定（句読点や丁寧表現だけが異なる質問に、過去の応答を再利用する）
+SIMILARITY_CACHE_PATH = os.path.join(DATA_DIR, "similarity_cache.sqlite3")
+SIMILARITY_CACHE_THRESHOLD = float(os.getenv("SIMILARITY_CACHE_THRESHOLD", "0.9"))  # 再利用する類似度（Jaccard係数）の下限
+# 異なる文字n-gramがこの数を超える質問は、類似度が閾値以上でも再利用しない
+# （長い質問ほど1語の違いでも類似度が下がりにくいため、「届かない」と「届いた」のような違いを区別する）
+SIMILARITY_CACHE_MAX_DIFF_SHINGLES = 3
+SIMILARITY_CACHE_SHINGLE_SIZE = 2        # 類似度の計算に使う文字n-gramの長さ
+SIMILARITY_CACHE_NUM_PERM = 64           # MinHashのハッシュ関数の数
+SIMILARITY_CACHE_BANDS = 16              # LSHのバンド数（バンドあたりの行数は NUM_PERM / BANDS）
+SIMILARITY_CACHE_MAX_ENTRIES = 5000      # 保持する質問の最大件数（古いものから削除）
+SIMILARITY_CACHE_MAX_INPUT_CHARS = 500   # これより長い入力は類似質問キャッシュの対象にしない
+SIMILARITY_CACHE_TTL = RESPONSE_CACHE_TTL
+SIMILARITY_CACHE_MAX_FALSE_HITS = 2      # 誤りの報告がこの回数に達した質問は再利用しない
+# 比較の前に取り除く丁寧表現（文中の「ますます」「済ます」などを削らないよう、文・節の始めと終わりにあるものだけを取り除く）
+SIMILARITY_CACHE_IGNORED_PREFIXES = ("恐れ入りますが", "すみませんが", "すみません")  # 文・節の始めの前置き
+SIMILARITY_CACHE_IGNORED_SUFFIXES = (                                                  # 文・節の終わりの丁寧な言い方
+    "お願いいたします", "お願いします", "教えてください", "教えて下さい", "ください", "下さい",
+    "でしょうか", "ですか", "ますか", "です", "ます"
+)
+
 # エージェントプリセット
 AGENT_PRESETS = {
     "日本語アシスタント": {
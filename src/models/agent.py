@@ -1,5 +1,12 @@
-from agents import Agent, Runner
-import openai
+# agents / openai はインポートに時間がかかるため、エージェントを実行する時点で読み込む
+from src.models.agent_registry import get_agent_registry
+from src.models.memory import count_tokens
+from src.models.response_cache import ResponseCache, get_response_cache
+from src.models.scheduler import get_scheduler
+from src.models.similarity_cache import get_similarity_cache
+from src.models.single_flight import get_single_flight
+from src.utils.tracing import current_span, start_span
+from src.config.settings import SCHEDULER_OUTPUT_TOKENS_ESTIMATE
 from src.utils.async_helpers import run_async
 
 class AgentManager:
@@ -8,11 +15,16 @@ class AgentManager:
     エージェントの作成と実行を管理する
     """
     
+    # Runnerに渡す実行設定（ベンチマークなどでモデルの呼び出し先を差し替える場合に設定する）
+    run_config = None
+    
     @staticmethod
     def create_agent(name, instructions, model):
         """
         エージェントを作成する
         
+        同じ設定のエージェントが作成済みの場合はそのオブジェクトを再利用する
+        
         Args:
             name (str): エージェント名
             instructions (str): エージェントへの指示
@@ -21,31 +33,229 @@ class AgentManager:
         Returns:
             Agent: 作成されたエージェントオブジェクト
         """
-        return Agent(
-            name=name,
-            instructions=instructions,
-            model=model
-        )
+        return get_agent_registry().get_or_create(name, instructions, model)
+    
+    @staticmethod
+    def cache_key(agent, user_input):
+        """
+        エージェントと入力からレスポンスキャッシュのキーを作成する
+        
+        Args:
+            agent (Agent): 実行するエージェント
+            user_input (str or list): ユーザーの入力メッセージ、または会話履歴を含むメッセージのリスト
+            
+        Returns:
+            str: キャッシュキー
+        """
+        tools = [getattr(tool, "name", str(tool)) for tool in agent.tools]
+        return ResponseCache.make_key(str(agent.model), str(agent.instructions), tools, user_input)
+    
+    @staticmethod
+    def similarity_question(user_input):
+        """
+        類似質問キャッシュで比較する質問を入力から取り出す
+        
+        Args:
+            user_input (str or list): ユーザーの入力メッセージ、または会話履歴を含むメッセージのリスト
+            
+        Returns:
+            str or None: 質問（会話履歴を含み、応答が前の会話に依存する入力の場合はNone）
+        """
+        if isinstance(user_input, str):
+            return user_input
+        if len(user_input) == 1 and user_input[0].get("role") == "user" and isinstance(user_input[0].get("content"), str):
+            return user_input[0]["content"]
+        return None
     
     @staticmethod
-    async def run_agent(agent, user_input):
+    def estimate_tokens(agent, user_input):
+        """
+        エージェント呼び出しで消費するトークン数を見積もる
+        
+        Args:
+            agent (Agent): 実行するエージェント
+            user_input (str or list): ユーザーの入力メッセージ、または会話履歴を含むメッセージのリスト
+            
+        Returns:
+            int: 見込みのトークン数（入力の文字数からの概算と出力の見込み量の合計）
+        """
+        return count_tokens(str(agent.instructions)) + count_tokens(user_input) + SCHEDULER_OUTPUT_TOKENS_ESTIMATE
+    
+    @staticmethod
+    async def run_agent(agent, user_input, on_delta=None, use_cache=True, reservation=None, similarity=False,
+                        on_similar_hit=None):
         """
         エージェントを実行してレスポンスを取得する
         
         Args:
             agent (Agent): 実行するエージェント
-            user_input (str): ユーザーの入力メッセージ
+            user_input (str or list): ユーザーの入力メッセージ、または会話履歴を含むメッセージのリスト
+            on_delta (callable, optional): ストリーミングモードで応答テキストの差分を受け取る関数
+            use_cache (bool): レスポンスキャッシュを使用するかどうか
+            reservation (Reservation, optional): 前もって確保したリクエストスケジューラの順番
+                （キャッシュヒットなどで使わなかった場合は返却される）
+            similarity (bool): 類似した質問の応答を再利用するかどうか（レスポンスキャッシュを使用する場合のみ）
+            on_similar_hit (callable, optional): 類似した質問の応答を再利用した場合に SimilarHit を受け取る関数
             
         Returns:
             str: エージェントの応答
         """
+        model = str(agent.model)
+        with start_span("agent.run", {"agent.name": agent.name, "gen_ai.request.model": model}) as span:
+            try:
+                return await AgentManager._run_agent(agent, model, user_input, on_delta, use_cache, span, reservation,
+                                                     similarity, on_similar_hit)
+            finally:
+                if reservation is not None:
+                    get_scheduler().release(reservation)
+    
+    @staticmethod
+    async def _run_agent(agent, model, user_input, on_delta, use_cache, span, reservation=None, similarity=False,
+                         on_similar_hit=None):
+        """
+        キャッシュとスケジューラを経由してエージェントを実行する
+        
+        キャッシュを使用する場合は、同じエージェント・同じ入力の呼び出しが実行中であれば
+        新たにモデルを呼び出さずにその応答を共有する
+        
+        Args:
+            agent (Agent): 実行するエージェント
+            model (str): モデル名
+            user_input (str or list): ユーザーの入力メッセージ、または会話履歴を含むメッセージのリスト
+            on_delta (callable): ストリーミングモードで応答テキストの差分を受け取る関数
+            use_cache (bool): レスポンスキャッシュを使用するかどうか
+            span (Span): 実行を記録するスパン
+            reservation (Reservation): 前もって確保したリクエストスケジューラの順番
+            similarity (bool): 類似した質問の応答を再利用するかどうか
+            on_similar_hit (callable): 類似した質問の応答を再利用した場合に SimilarHit を受け取る関数
+            
+        Returns:
+            str: エージェントの応答
+        """
+        cache = get_response_cache() if use_cache else None
+        if cache is not None:
+            cache_key = AgentManager.cache_key(agent, user_input)
+            cached = cache.get(cache_key)
+            span.set_attribute("cache.hit", cached is not None)
+            if cached is not None:
+                span.record("cache_hits", 1)
+                # キャッシュヒット時は応答全体を一度に渡す
+                if on_delta is not None:
+                    on_delta(cached)
+                return cached
+            
+            question = AgentManager.similarity_question(user_input) if similarity else None
+            if question is not None:
+                # 句読点や丁寧表現だけが異なる質問の応答を再利用する（キーの入力を None にしてエージェントごとに分ける）
+                namespace = AgentManager.cache_key(agent, None)
+                hit = get_similarity_cache().lookup(namespace, question)
+                span.set_attribute("similarity_cache.hit", hit is not None)
+                if hit is not None:
+                    span.record("similarity_hits", 1)
+                    span.set_attribute("similarity_cache.score", hit.similarity)
+                    if on_similar_hit is not None:
+                        on_similar_hit(hit)
+                    if on_delta is not None:
+                        on_delta(hit.response)
+                    return hit.response
+            
+            # 同じ呼び出しが他のセッションやフローで実行中の場合は、その応答を待って共有する
+            response, shared = await get_single_flight().run(
+                cache_key,
+                lambda: AgentManager._call_model(agent, model, user_input, on_delta, span, reservation, cache_key)
+            )
+            span.set_attribute("single_flight.shared", shared)
+            if question is not None and not shared and isinstance(response, str):
+                get_similarity_cache().add(namespace, question, response)
+            if shared:
+                span.record("coalesced_calls", 1)
+                # 共有した応答はキャッシュヒット時と同様に一度に渡す
+                if on_delta is not None:
+                    on_delta(response)
+            return response
+        
+        return await AgentManager._call_model(agent, model, user_input, on_delta, span, reservation)
+    
+    @staticmethod
+    async def _call_model(agent, model, user_input, on_delta, span, reservation=None, cache_key=None):
+        """
+        スケジューラを経由してモデルを呼び出し、応答をキャッシュに保存する
+        
+        Args:
+            agent (Agent): 実行するエージェント
+            model (str): モデル名
+            user_input (str or list): ユーザーの入力メッセージ、または会話履歴を含むメッセージのリスト
+            on_delta (callable): ストリーミングモードで応答テキストの差分を受け取る関数
+            span (Span): 実行を記録するスパン
+            reservation (Reservation): 前もって確保したリクエストスケジューラの順番
+            cache_key (str): 応答を保存するキャッシュキー（Noneの場合は保存しない）
+            
+        Returns:
+            str: エージェントの応答
+        """
+        estimated_tokens = AgentManager.estimate_tokens(agent, user_input)
+        emitted = []
+        
+        def track_delta(delta):
+            if not emitted:
+                # 差分はモデル呼び出しのスパンの中で届くため、その開始からの時間を最初のトークンまでの時間とする
+                request_span = current_span()
+                request_span.record("time_to_first_token_ms", request_span.elapsed_ms())
+            emitted.append(True)
+            on_delta(delta)
+        
+        import openai
+        
+        scheduler = get_scheduler()
         try:
-            result = await Runner.run(agent, user_input)
-            return result.final_output
+            result = await scheduler.run(
+                model,
+                estimated_tokens,
+                lambda: AgentManager._invoke(agent, user_input, track_delta if on_delta is not None else None),
+                # 応答の一部を表示済みの場合はリトライすると表示が重複するため諦める
+                can_retry=lambda: not emitted,
+                reservation=reservation
+            )
         except openai.RateLimitError as e:
             raise RateLimitError(f"OpenAI APIのクォータエラーが発生しました。\nエラー詳細: {e}")
         except Exception as e:
             raise AgentError(f"エラーが発生しました: {e}")
+        
+        usage = getattr(getattr(result, "context_wrapper", None), "usage", None)
+        scheduler.record_usage(model, estimated_tokens, getattr(usage, "total_tokens", None))
+        if usage is not None:
+            span.record("input_tokens", usage.input_tokens)
+            span.record("output_tokens", usage.output_tokens)
+        response = result.final_output
+        if cache_key is not None and isinstance(response, str):
+            get_response_cache().set(cache_key, response)
+        return response
+    
+    @staticmethod
+    async def _invoke(agent, user_input, on_delta=None):
+        """
+        Runnerを呼び出してエージェントを実行する
+        
+        Args:
+            agent (Agent): 実行するエージェント
+            user_input (str or list): ユーザーの入力メッセージ、または会話履歴を含むメッセージのリスト
+            on_delta (callable, optional): ストリーミングモードで応答テキストの差分を受け取る関数
+            
+        Returns:
+            RunResult: 実行結果（応答と使用トークン数を含む）
+        """
+        from agents import Runner
+        from openai.types.responses import ResponseTextDeltaEvent
+        
+        if on_delta is None:
+            return await Runner.run(agent, user_input, run_config=AgentManager.run_config)
+        
+        # ストリーミングモード: テキスト差分が届くたびにコールバックに渡す
+        result = Runner.run_streamed(agent, user_input, run_config=AgentManager.run_config)
+        async for event in result.stream_events():
+            if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                on_delta(event.data.delta)
+        return result
 
 
 class AgentError(Exception):
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional, Sequence
+
+from src.config.settings import AGENT_REGISTRY_SIZE
+
+if TYPE_CHECKING:
+    from agents import Agent
+
+
+class AgentRegistry:
+    """
+    エージェント設定の内容ハッシュをキーに Agent オブジェクトを再利用するレジストリ
+
+    設定が変わっていないエージェントは以前に作成したオブジェクトをそのまま返し、
+    編集されたエージェントだけを作り直す。編集前・削除されたエージェントのオブジェクトは使われなくなり、
+    最大数を超えた時点で最後に使われたのが古いものから破棄される
+    """
+
+    def __init__(self, max_entries: int = AGENT_REGISTRY_SIZE):
+        """
+        AgentRegistryの初期化
+
+        Args:
+            max_entries: 保持する Agent オブジェクトの最大数
+        """
+        self.max_entries = max_entries
+        self._agents: "OrderedDict[str, Agent]" = OrderedDict()  # 内容ハッシュ -> Agent
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def content_hash(name: str, instructions: str, model: str, tools: Sequence[str] = ()) -> str:
+        """
+        エージェント設定の内容からハッシュ値を計算する
+
+        Args:
+            name: エージェント名
+            instructions: エージェントへの指示
+            model: 使用するモデル名
+            tools: ツール名のリスト
+
+        Returns:
+            str: 内容のSHA-256ハッシュ
+        """
+        payload = json.dumps([name, instructions, model, list(tools)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_or_create(self, name: str, instructions: str, model: str,
+                      tools: Sequence[str] = ()) -> "Agent":
+        """
+        設定に対応する Agent オブジェクトを取得する（なければ作成する）
+
+        Args:
+            name: エージェント名
+            instructions: エージェントへの指示
+            model: 使用するモデル名
+            tools: ツール名のリスト
+
+        Returns:
+            Agent: エージェントオブジェクト
+        """
+        key = self.content_hash(name, instructions, model, tools)
+        with self._lock:
+            agent = self._agents.get(key)
+            if agent is not None:
+                self._agents.move_to_end(key)
+                self.stats["hits"] += 1
+                return agent
+
+            # agents はインポートに時間がかかるため、最初にエージェントを作成する時点で読み込む
+            from agents import Agent
+
+            agent = Agent(
+                name=name,
+                instructions=instructions,
+                model=model,
+                # ツールの実装は未対応のため、空のツールリストを渡す
+                tools=[]
+            )
+            self._agents[key] = agent
+            self.stats["misses"] += 1
+            while len(self._agents) > self.max_entries:
+                self._agents.popitem(last=False)
+            return agent
+
+    def get_for_config(self, config) -> "Agent":
+        """
+        AgentConfig に対応する Agent オブジェクトを取得する
+
+        Args:
+            config (AgentConfig): エージェント設定
+
+        Returns:
+            Agent: エージェントオブジェクト
+        """
+        return self.get_or_create(config.name, config.instructions, config.model, config.tools)
+
+
+_agent_registry: Optional[AgentRegistry] = None
+_agent_registry_lock = threading.Lock()
+
+
+def get_agent_registry() -> AgentRegistry:
+    """
+    プロセス全体で共有するエージェントレジストリを取得する
+
+    Returns:
+        AgentRegistry: エージェントレジストリ
+    """
+    global _agent_registry
+    if _agent_registry is None:
+        with _agent_registry_lock:
+            if _agent_registry is None:
+                _agent_registry = AgentRegistry()
+    return _agent_registry
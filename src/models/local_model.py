@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import random
+import time
+from typing import AsyncIterator, Optional
+
+from agents import Model, ModelProvider, ModelResponse, Usage
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseOutputMessage,
+    ResponseOutputText,
+    ResponseTextDeltaEvent,
+    ResponseUsage,
+)
+
+# ローカルモデルが出力する埋め草の単語
+FILLER_WORDS = ("lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit")
+
+
+class LatencyModel:
+    """
+    ローカルモデルの応答遅延の分布
+
+    distribution には次のいずれかを指定する
+    - "fixed": 常に mean 秒
+    - "uniform": mean ± jitter 秒の一様分布
+    - "lognormal": 中央値が mean 秒、ばらつきが jitter の対数正規分布（APIのロングテールを模擬）
+    """
+
+    DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+    def __init__(self, distribution: str = "fixed", mean: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        """
+        LatencyModelの初期化
+
+        Args:
+            distribution: 分布の種類
+            mean: 遅延の平均（lognormalの場合は中央値）（秒）
+            jitter: ばらつきの大きさ
+            seed: 乱数のシード（同じシードなら同じ遅延の系列になる）
+        """
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"不明な遅延分布です: {distribution}")
+        self.distribution = distribution
+        self.mean = mean
+        self.jitter = jitter
+        self._random = random.Random(seed)
+
+    def sample(self) -> float:
+        """遅延時間（秒）を1つ取り出す"""
+        if self.mean <= 0:
+            return 0.0
+        if self.distribution == "uniform":
+            return max(0.0, self._random.uniform(self.mean - self.jitter, self.mean + self.jitter))
+        if self.distribution == "lognormal":
+            return self.mean * self._random.lognormvariate(0.0, self.jitter)
+        return self.mean
+
+
+class LocalModel(Model):
+    """
+    APIを呼び出さずに決定的な応答を返すローカルのモデル
+
+    応答はシステム指示の1行目と、入力から決まる埋め草の単語で構成される。
+    システム指示の1行目を含めるため、条件分岐の条件はエージェントの指示で制御できる。
+    ベンチマークやAPIキーのない環境での動作確認に使用する。
+    """
+
+    def __init__(self, model_name: str, latency: LatencyModel, output_tokens: int = 50, stream_chunks: int = 8):
+        """
+        LocalModelの初期化
+
+        Args:
+            model_name: 応答に記録するモデル名
+            latency: 応答遅延の分布
+            output_tokens: 出力する単語数（1単語を1トークンとして数える）
+            stream_chunks: ストリーミング時に応答を分割する数
+        """
+        self.model_name = model_name
+        self.latency = latency
+        self.output_tokens = output_tokens
+        self.stream_chunks = max(1, stream_chunks)
+
+    def build_output(self, system_instructions: Optional[str], input) -> str:
+        """
+        入力に対する応答テキストを作成する
+
+        Args:
+            system_instructions: システム指示
+            input: モデルへの入力
+
+        Returns:
+            str: 応答テキスト
+        """
+        header = (system_instructions or "").split("\n", 1)[0]
+        digest = hashlib.sha256(str(input).encode("utf-8")).digest()
+        words = [FILLER_WORDS[digest[i % len(digest)] % len(FILLER_WORDS)] for i in range(self.output_tokens)]
+        return f"{header}\n{' '.join(words)}"
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema,
+                           handoffs, tracing, *, previous_response_id=None, conversation_id=None,
+                           prompt=None) -> ModelResponse:
+        text = self.build_output(system_instructions, input)
+        await asyncio.sleep(self.latency.sample())
+        input_tokens = self._count_tokens(system_instructions, input)
+        return ModelResponse(
+            output=[self._message(text)],
+            usage=Usage(requests=1, input_tokens=input_tokens, output_tokens=self.output_tokens,
+                        total_tokens=input_tokens + self.output_tokens),
+            response_id=None
+        )
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema,
+                              handoffs, tracing, *, previous_response_id=None, conversation_id=None,
+                              prompt=None) -> AsyncIterator:
+        text = self.build_output(system_instructions, input)
+        message = self._message(text)
+        delay = self.latency.sample() / self.stream_chunks
+        step = max(1, -(-len(text) // self.stream_chunks))
+        sequence_number = 0
+        for start in range(0, len(text), step):
+            await asyncio.sleep(delay)
+            yield ResponseTextDeltaEvent(
+                content_index=0, delta=text[start:start + step], item_id=message.id, logprobs=[],
+                output_index=0, sequence_number=sequence_number, type="response.output_text.delta"
+            )
+            sequence_number += 1
+
+        input_tokens = self._count_tokens(system_instructions, input)
+        response = Response(
+            id=f"local-{sequence_number}", created_at=time.time(), model=self.model_name, object="response",
+            output=[message], tool_choice="auto", tools=[], parallel_tool_calls=False,
+            usage=ResponseUsage(
+                input_tokens=input_tokens, output_tokens=self.output_tokens,
+                total_tokens=input_tokens + self.output_tokens,
+                input_tokens_details={"cached_tokens": 0, "cache_write_tokens": 0},
+                output_tokens_details={"reasoning_tokens": 0}
+            )
+        )
+        yield ResponseCompletedEvent(response=response, sequence_number=sequence_number, type="response.completed")
+
+    @staticmethod
+    def _message(text: str) -> ResponseOutputMessage:
+        """応答テキストを出力メッセージに変換"""
+        return ResponseOutputMessage(
+            id="local-message", role="assistant", status="completed", type="message",
+            content=[ResponseOutputText(annotations=[], text=text, type="output_text", logprobs=[])]
+        )
+
+    @staticmethod
+    def _count_tokens(system_instructions: Optional[str], input) -> int:
+        """入力トークン数を単語数で概算"""
+        return len((system_instructions or "").split()) + len(str(input).split())
+
+
+class LocalModelProvider(ModelProvider):
+    """モデル名によらずLocalModelを返すモデルプロバイダー"""
+
+    def __init__(self, latency: Optional[LatencyModel] = None, output_tokens: int = 50, stream_chunks: int = 8):
+        """
+        LocalModelProviderの初期化
+
+        Args:
+            latency: 応答遅延の分布（省略時は遅延なし）
+            output_tokens: 出力する単語数
+            stream_chunks: ストリーミング時に応答を分割する数
+        """
+        self.latency = latency or LatencyModel()
+        self.output_tokens = output_tokens
+        self.stream_chunks = stream_chunks
+        self._models = {}
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        model = self._models.get(model_name)
+        if model is None:
+            model = LocalModel(model_name or "local", self.latency, self.output_tokens, self.stream_chunks)
+            self._models[model_name] = model
+        return model
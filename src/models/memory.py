@@ -0,0 +1,174 @@
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from src.config.settings import (
+    CHAT_MEMORY_SUMMARY_BATCH_TOKENS,
+    DEFAULT_MEMORY_TOKENS,
+    MODEL_SETTINGS,
+)
+
+
+def count_tokens(content: Union[str, List[Dict[str, Any]]]) -> int:
+    """
+    テキストまたはメッセージのリストのトークン数を概算する
+
+    日本語を含むテキストを想定し、1トークンあたり2文字で概算する。
+    メッセージのリストの場合は各メッセージの本文の合計とする
+
+    Args:
+        content: テキスト、または role / content を持つメッセージのリスト
+
+    Returns:
+        int: 見込みのトークン数
+    """
+    if isinstance(content, list):
+        return sum(count_tokens(str(message.get("content", ""))) for message in content)
+    return len(str(content)) // 2
+
+
+def memory_budget(model: str) -> int:
+    """
+    モデルごとの会話履歴のトークン数の上限を取得する
+
+    Args:
+        model: モデル名
+
+    Returns:
+        int: 1回の呼び出しに含める会話履歴のトークン数の上限
+    """
+    return MODEL_SETTINGS.get(model, {}).get("memory_tokens", DEFAULT_MEMORY_TOKENS)
+
+
+class ConversationMemory:
+    """
+    チャットの会話履歴
+
+    モデルに渡す入力は「古い会話の要約 + トークン数の上限に収まる直近の会話 + 今回の入力」とし、
+    会話が長くなっても1回の呼び出しのトークン数が上限を超えないようにする。
+    直近の会話から外れた履歴は一定量たまるごとにまとめて要約に取り込む。
+    要約はバックグラウンドで実行し、完了した結果を次の入力の作成時に反映する
+    """
+
+    def __init__(self, summary_batch_tokens: int = CHAT_MEMORY_SUMMARY_BATCH_TOKENS):
+        """
+        ConversationMemoryの初期化
+
+        Args:
+            summary_batch_tokens: 要約に取り込む履歴のトークン数の下限
+        """
+        self.summary_batch_tokens = summary_batch_tokens
+        self.messages: List[Dict[str, Any]] = []  # role / content / tokens
+        self.summary = ""
+        self.summarized = 0     # 要約に取り込み済みのメッセージ数（先頭から）
+        self.window_start = 0   # 直近の入力に含めた最初のメッセージの位置
+        self.last_input_tokens = 0
+        self.last_window = 0    # 直近の入力に含めた会話のメッセージ数
+        self._pending: Optional[Tuple[Future, int]] = None  # 実行中の要約と、その要約に含めたメッセージ数
+
+    def add(self, role: str, content: str):
+        """
+        会話にメッセージを追加する
+
+        Args:
+            role: "user" または "assistant"
+            content: メッセージの本文
+        """
+        self.messages.append({"role": role, "content": content, "tokens": count_tokens(content)})
+
+    def build_input(self, user_input: str, budget_tokens: int) -> List[Dict[str, str]]:
+        """
+        モデルに渡す入力（メッセージのリスト）を作成する
+
+        Args:
+            user_input: 今回のユーザー入力
+            budget_tokens: 会話履歴のトークン数の上限
+
+        Returns:
+            List[Dict[str, str]]: 要約・直近の会話・今回の入力からなるメッセージのリスト
+        """
+        self._apply_summary()
+        summary_message = f"これまでの会話の要約:\n{self.summary}" if self.summary else None
+        remaining = budget_tokens - count_tokens(user_input) - (count_tokens(summary_message) if summary_message else 0)
+
+        # 新しいメッセージから順に、上限に収まる範囲を直近の会話とする
+        start = len(self.messages)
+        while start > self.summarized and self.messages[start - 1]["tokens"] <= remaining:
+            start -= 1
+            remaining -= self.messages[start]["tokens"]
+        # 応答だけが残らないよう、直近の会話はユーザーのメッセージから始める
+        while start < len(self.messages) and self.messages[start]["role"] != "user":
+            start += 1
+        self.window_start = start
+        self.last_window = len(self.messages) - start
+
+        items = []
+        if summary_message:
+            items.append({"role": "system", "content": summary_message})
+        items.extend({"role": message["role"], "content": message["content"]} for message in self.messages[start:])
+        items.append({"role": "user", "content": user_input})
+        self.last_input_tokens = count_tokens(items)
+        return items
+
+    def needs_summary(self) -> bool:
+        """
+        直近の会話から外れた履歴が一定量たまり、要約を実行すべきかを判定する
+
+        Returns:
+            bool: 要約を実行すべき場合はTrue
+        """
+        if self._pending is not None:
+            return False
+        evicted = self.messages[self.summarized:self.window_start]
+        return sum(message["tokens"] for message in evicted) >= self.summary_batch_tokens
+
+    def summary_prompt(self) -> str:
+        """
+        要約を作成するエージェントへの入力を作成する
+
+        Returns:
+            str: これまでの要約と、直近の会話から外れた履歴
+        """
+        lines = []
+        if self.summary:
+            lines.append(f"# これまでの要約\n{self.summary}\n")
+        lines.append("# 新しいメッセージ")
+        for message in self.messages[self.summarized:self.window_start]:
+            lines.append(f"{message['role']}: {message['content']}")
+        return "\n".join(lines)
+
+    def start_summary(self, future: Future):
+        """
+        実行を開始した要約を登録する（完了した結果は次の build_input で反映する）
+
+        Args:
+            future: 要約のテキストを返すFuture
+        """
+        self._pending = (future, self.window_start)
+
+    def _apply_summary(self):
+        """完了した要約があれば反映する（失敗した場合は次の機会に要約し直す）"""
+        if self._pending is None or not self._pending[0].done():
+            return
+        future, summarized = self._pending
+        self._pending = None
+        if future.cancelled() or future.exception() is not None:
+            return
+        summary = future.result()
+        if isinstance(summary, str) and summary.strip():
+            self.summary = summary.strip()
+            self.summarized = summarized
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        会話履歴の統計情報を取得する
+
+        Returns:
+            Dict[str, Any]: メッセージ数・要約済みのメッセージ数・直近の会話のメッセージ数・直近の入力のトークン数
+        """
+        return {
+            "messages": len(self.messages),
+            "summarized": self.summarized,
+            "window": self.last_window,
+            "last_input_tokens": self.last_input_tokens,
+            "summarizing": self._pending is not None
+        }
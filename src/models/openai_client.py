@@ -0,0 +1,42 @@
+from agents import set_default_openai_client
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+# 新しいバージョンのopenaiは httpx の代わりに httpx2 を使うため、クライアントと同じライブラリの Limits を使う
+try:
+    import httpx2 as httpx
+except ImportError:
+    import httpx
+
+from src.config.settings import OPENAI_KEEPALIVE_EXPIRY, OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE_CONNECTIONS
+
+
+def create_openai_client() -> AsyncOpenAI:
+    """
+    接続を維持したまま再利用するAsyncOpenAIクライアントを作成する
+    
+    クライアントが持つ接続プールは最初に使用したイベントループに結び付くため、
+    同じイベントループ上でのみ使用すること
+    
+    Returns:
+        AsyncOpenAI: OpenAIクライアント
+    """
+    http_client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+        )
+    )
+    return AsyncOpenAI(http_client=http_client)
+
+
+def install_shared_client() -> AsyncOpenAI:
+    """
+    共有クライアントを作成し、Agents SDKのデフォルトクライアントとして設定する
+    
+    Returns:
+        AsyncOpenAI: 設定したOpenAIクライアント
+    """
+    client = create_openai_client()
+    set_default_openai_client(client)
+    return client
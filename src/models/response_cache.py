@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from src.config.settings import (
+    RESPONSE_CACHE_DISK_ENTRIES,
+    RESPONSE_CACHE_MEMORY_ENTRIES,
+    RESPONSE_CACHE_PATH,
+    RESPONSE_CACHE_TTL,
+)
+
+
+class ResponseCache:
+    """
+    エージェント応答のキャッシュ
+
+    メモリ上のLRUキャッシュを前段に、SQLiteのディスクキャッシュを後段に持つ2層構成。
+    有効期限（TTL）を過ぎたエントリは参照時に破棄し、件数が上限を超えた場合は
+    最後に参照された時刻が古いものから削除する。
+    """
+
+    def __init__(self, db_path: Optional[str] = RESPONSE_CACHE_PATH,
+                 max_memory_entries: int = RESPONSE_CACHE_MEMORY_ENTRIES,
+                 max_disk_entries: int = RESPONSE_CACHE_DISK_ENTRIES,
+                 ttl: float = RESPONSE_CACHE_TTL):
+        """
+        ResponseCacheの初期化
+
+        Args:
+            db_path: ディスクキャッシュのSQLiteファイルパス（Noneの場合はメモリのみ）
+            max_memory_entries: メモリキャッシュの最大件数
+            max_disk_entries: ディスクキャッシュの最大件数
+            ttl: キャッシュの有効期限（秒）
+        """
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (応答, 作成時刻)
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+
+        self._db = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+
+    @staticmethod
+    def make_key(model: str, instructions: str, tools: List[str], user_input: Any) -> str:
+        """
+        キャッシュキーを作成する
+
+        Args:
+            model: モデル名
+            instructions: エージェントへの指示
+            tools: ツール名のリスト
+            user_input: エージェントへの入力
+
+        Returns:
+            str: キャッシュキー（SHA-256）
+        """
+        payload = json.dumps(
+            {"model": model, "instructions": instructions, "tools": list(tools), "input": user_input},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        キャッシュから応答を取得する
+
+        Args:
+            key: キャッシュキー
+
+        Returns:
+            Optional[str]: キャッシュされた応答（存在しないか期限切れの場合はNone）
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                response, created_at = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return response
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    response, created_at = row
+                    if now - created_at <= self.ttl:
+                        self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                        self._remember(key, response, created_at)
+                        self.stats["disk_hits"] += 1
+                        return response
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key: str, response: str):
+        """
+        応答をキャッシュに保存する
+
+        Args:
+            key: キャッシュキー
+            response: エージェントの応答
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            self.stats["writes"] += 1
+            if self._db is None:
+                return
+            # 件数が増えるのは新しいキーを追加した場合だけのため、追加と更新を分けて実行する
+            inserted = self._db.execute(
+                "INSERT OR IGNORE INTO responses (key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            ).rowcount
+            if not inserted:
+                self._db.execute(
+                    "UPDATE responses SET response = ?, created_at = ?, last_access = ? WHERE key = ?",
+                    (response, now, now, key)
+                )
+            # 同じファイルを他のプロセスも書き換えるため、件数はプロセス内で数えずに毎回データベースから数える
+            elif self._count_disk() > self.max_disk_entries:
+                self._evict_disk(now)
+
+    def clear(self):
+        """キャッシュをすべて削除する"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        キャッシュの統計情報を取得する
+
+        Returns:
+            Dict[str, Any]: ヒット数・ミス数・件数などの統計情報
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = self._count_disk() if self._db is not None else 0
+            return stats
+
+    def _remember(self, key: str, response: str, created_at: float):
+        """メモリキャッシュに追加し、上限を超えた分を古い順に削除"""
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _count_disk(self) -> int:
+        """ディスクキャッシュの件数を数える"""
+        return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _evict_disk(self, now: float):
+        """期限切れのエントリと、上限を超えた分の古いエントリをディスクから削除"""
+        self._db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        overflow = self._count_disk() - self.max_disk_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                (overflow,)
+            )
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    プロセス全体で共有する応答キャッシュを取得する
+
+    Returns:
+        ResponseCache: 応答キャッシュ
+    """
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache()
+    return _response_cache
@@ -0,0 +1,474 @@
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple, Type, TypeVar
+
+from src.config.settings import (
+    DEFAULT_MODEL_RATE_LIMITS,
+    MODEL_SETTINGS,
+    SCHEDULER_BACKOFF_BASE,
+    SCHEDULER_BACKOFF_MAX,
+    SCHEDULER_MAX_RETRIES,
+)
+from src.utils.tracing import start_span
+
+if TYPE_CHECKING:
+    import openai
+
+T = TypeVar("T")
+
+# リトライしても回復しないレート制限エラーのコード（クォータ切れ）
+NON_RETRYABLE_CODES = {"insufficient_quota"}
+
+
+def transient_errors() -> Tuple[Type[BaseException], ...]:
+    """
+    一時的なエラーとしてリトライする例外
+
+    openai はインポートに時間がかかるため、最初の呼び出しを実行する時点で読み込む
+    """
+    import openai
+
+    return (openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+
+class TokenBucket:
+    """
+    時間の経過とともに一定速度で補充されるトークンバケット
+
+    予約時に残量が足りない場合でも残量を負の値まで減らし、補充されるまでの待ち時間を返す。
+    先に予約した呼び出しから順に待ち時間が短くなるため、待機中の呼び出しは到着順に処理される。
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        """
+        TokenBucketの初期化
+
+        Args:
+            capacity: バケットの容量
+            refill_per_second: 1秒あたりの補充量
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        トークンを予約し、使用可能になるまでの待ち時間を返す
+
+        Args:
+            amount: 予約する量（容量を超える場合は容量に切り詰める）
+
+        Returns:
+            float: 待ち時間（秒）
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= min(amount, self.capacity)
+            wait = -self._tokens / self.refill_per_second if self._tokens < 0 else 0.0
+            return max(wait, self._blocked_until - now)
+
+    def wait_time(self, amount: float, held: float = 0.0) -> float:
+        """
+        予約せずに、指定した量を今予約した場合の待ち時間を求める
+
+        Args:
+            amount: 予約する量
+            held: 予約済みの量のうち、返却したものとして扱う量
+
+        Returns:
+            float: 待ち時間（秒）
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            tokens = min(self.capacity, self._tokens + held) - min(amount, self.capacity)
+            wait = -tokens / self.refill_per_second if tokens < 0 else 0.0
+            return max(wait, self._blocked_until - now)
+
+    def adjust(self, amount: float):
+        """
+        予約済みの量を実際の使用量に合わせて補正する
+
+        Args:
+            amount: 追加で消費した量（負の値の場合は返却）
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+    def block(self, seconds: float):
+        """
+        指定した時間、新しい予約をすべて待たせる
+
+        Args:
+            seconds: 待たせる時間（秒）
+        """
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def _refill(self, now: float):
+        """経過時間に応じてトークンを補充"""
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_per_second)
+
+
+class ModelLimiter:
+    """モデルごとのリクエスト数・トークン数のバケットと待ち行列の統計"""
+
+    def __init__(self, rpm: float, tpm: float):
+        """
+        ModelLimiterの初期化
+
+        Args:
+            rpm: 1分あたりのリクエスト数上限
+            tpm: 1分あたりのトークン数上限
+        """
+        self.requests = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self.stats = {
+            "queued": 0, "max_queued": 0, "in_flight": 0, "calls": 0,
+            "retries": 0, "rate_limited": 0, "failures": 0, "wait_time": 0.0
+        }
+
+    def reserve(self, estimated_tokens: int) -> float:
+        """リクエスト1回分と見込みトークン数を予約し、待ち時間を返す"""
+        return max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+
+    def unreserved_wait(self, estimated_tokens: int, held_tokens: int) -> float:
+        """予約済みの順番（リクエスト1回分と held_tokens）を返却して、今から予約した場合の待ち時間"""
+        return max(self.requests.wait_time(1, 1), self.tokens.wait_time(estimated_tokens, held_tokens))
+
+    def block(self, seconds: float):
+        """レート制限を受けた場合に、このモデルへのすべての呼び出しを待たせる"""
+        self.requests.block(seconds)
+        self.tokens.block(seconds)
+
+    def capacity_seconds(self, estimated_tokens: int) -> float:
+        """リクエスト1回分と見込みトークン数が補充されるまでの時間（予約が他の呼び出しを待たせうる時間）"""
+        return max(1 / self.requests.refill_per_second, estimated_tokens / self.tokens.refill_per_second)
+
+
+class Reservation:
+    """
+    呼び出しの前に確保したリクエストスケジューラの順番
+
+    投機的実行で、実行する可能性が高い呼び出しの順番を前もって確保するために使う。
+    RequestScheduler.run に渡すと予約済みの順番で実行され、使わなかった場合は release で返却する
+    """
+
+    __slots__ = ("model", "estimated_tokens", "reserved_at", "wait", "ready_at", "used", "released", "saved")
+
+    def __init__(self, model: str, estimated_tokens: int, wait: float):
+        """
+        Reservationの初期化
+
+        Args:
+            model: モデル名
+            estimated_tokens: 予約したトークン数
+            wait: 予約した時点での待ち時間（秒）
+        """
+        self.model = model
+        self.estimated_tokens = estimated_tokens
+        self.reserved_at = time.monotonic()
+        self.wait = wait
+        self.ready_at = self.reserved_at + wait
+        self.used = False
+        self.released = False
+        self.saved = 0.0  # 使用時に、前もって予約したことで短縮できた待ち時間（秒）
+
+
+class RequestScheduler:
+    """
+    すべてのエージェント呼び出しを通す中央のリクエストスケジューラ
+
+    モデルごとのトークンバケットでリクエスト数とトークン数を事前に制限し、
+    上限を超える呼び出しは失敗させずに待ち行列で待たせる。
+    それでもレート制限を受けた場合は retry-after ヘッダーに従って同じモデルへの呼び出しを
+    まとめて停止し、ジッター付きの指数バックオフでリトライする。
+    """
+
+    def __init__(self, model_settings: Mapping[str, Mapping[str, Any]] = MODEL_SETTINGS,
+                 max_retries: int = SCHEDULER_MAX_RETRIES,
+                 backoff_base: float = SCHEDULER_BACKOFF_BASE,
+                 backoff_max: float = SCHEDULER_BACKOFF_MAX,
+                 share: float = 1.0):
+        """
+        RequestSchedulerの初期化
+
+        Args:
+            model_settings: モデル名 -> {"rpm": ..., "tpm": ...}
+            max_retries: 最大リトライ回数
+            backoff_base: バックオフの初期待ち時間（秒）
+            backoff_max: バックオフの最大待ち時間（秒）
+            share: このスケジューラが使うレート制限の割合（複数のプロセスで同じAPIキーを使う場合に分ける）
+        """
+        self.model_settings = model_settings
+        self.share = share
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._limiters: Dict[str, ModelLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, model: str) -> ModelLimiter:
+        """
+        モデルのリミッターを取得する（初回のみ作成）
+
+        Args:
+            model: モデル名
+
+        Returns:
+            ModelLimiter: モデルのリミッター
+        """
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(model)
+                if limiter is None:
+                    limits = self.model_settings.get(model, DEFAULT_MODEL_RATE_LIMITS)
+                    limiter = ModelLimiter(limits["rpm"] * self.share, limits["tpm"] * self.share)
+                    self._limiters[model] = limiter
+        return limiter
+
+    def reserve(self, model: str, estimated_tokens: int) -> Reservation:
+        """
+        呼び出しの順番を待たずに確保する
+
+        Args:
+            model: モデル名
+            estimated_tokens: 呼び出しで消費する見込みのトークン数
+
+        Returns:
+            Reservation: 確保した順番（run に渡すか、使わない場合は release で返却する）
+        """
+        return Reservation(model, estimated_tokens, self.limiter(model).reserve(estimated_tokens))
+
+    def release(self, reservation: Reservation) -> float:
+        """
+        使わなかった予約を返却する（使用済み・返却済みの場合は何もしない）
+
+        Args:
+            reservation: 返却する予約
+
+        Returns:
+            float: 予約が他の呼び出しを待たせた可能性のある時間（秒）
+        """
+        if reservation.used or reservation.released:
+            return 0.0
+        reservation.released = True
+        limiter = self.limiter(reservation.model)
+        limiter.requests.adjust(-1)
+        limiter.tokens.adjust(-reservation.estimated_tokens)
+        held = time.monotonic() - reservation.reserved_at
+        return min(held, limiter.capacity_seconds(reservation.estimated_tokens))
+
+    async def run(self, model: str, estimated_tokens: int, call: Callable[[], Awaitable[T]],
+                  can_retry: Optional[Callable[[], bool]] = None,
+                  reservation: Optional[Reservation] = None) -> T:
+        """
+        レート制限に従って呼び出しを実行する
+
+        Args:
+            model: モデル名
+            estimated_tokens: 呼び出しで消費する見込みのトークン数
+            call: 実行する呼び出し（リトライのたびに再度呼び出される）
+            can_retry: リトライ可能かどうかを返す関数（応答の一部を出力済みの場合などにFalseを返す）
+            reservation: 前もって確保した順番（同じモデルの場合、最初の試行で使用する）
+
+        Returns:
+            T: 呼び出しの結果
+        """
+        import openai
+
+        limiter = self.limiter(model)
+        retryable_errors = transient_errors()
+        attempt = 0
+        if reservation is not None and (reservation.model != model or reservation.released):
+            self.release(reservation)
+            reservation = None
+        while True:
+            if reservation is not None:
+                await self._wait_reserved(limiter, model, estimated_tokens, reservation)
+                reservation = None
+            else:
+                await self._wait_turn(limiter, model, estimated_tokens)
+            limiter.stats["in_flight"] += 1
+            limiter.stats["calls"] += 1
+            span = start_span("model.request", {"gen_ai.request.model": model, "attempt": attempt})
+            try:
+                with span:
+                    started_at = time.perf_counter()
+                    try:
+                        return await call()
+                    finally:
+                        limiter.stats["in_flight"] -= 1
+                        span.record("model_latency_ms", (time.perf_counter() - started_at) * 1000)
+            except openai.RateLimitError as e:
+                limiter.stats["rate_limited"] += 1
+                if getattr(e, "code", None) in NON_RETRYABLE_CODES or not self._should_retry(attempt, can_retry):
+                    limiter.stats["failures"] += 1
+                    raise
+                delay = self.retry_after(e)
+                if delay is None:
+                    delay = self.backoff(attempt)
+                # 同じモデルへの後続の呼び出しもまとめて待たせる
+                limiter.block(delay)
+            except retryable_errors:
+                if not self._should_retry(attempt, can_retry):
+                    limiter.stats["failures"] += 1
+                    raise
+                delay = self.backoff(attempt)
+                with start_span("scheduler.backoff", {"gen_ai.request.model": model}) as backoff_span:
+                    await asyncio.sleep(delay)
+                    backoff_span.record("queue_wait_ms", delay * 1000)
+            attempt += 1
+            limiter.stats["retries"] += 1
+
+    def record_usage(self, model: str, estimated_tokens: int, actual_tokens: Optional[int]):
+        """
+        見込みのトークン数を実際の使用量で補正する
+
+        Args:
+            model: モデル名
+            estimated_tokens: 予約時に見込んだトークン数
+            actual_tokens: 実際に使用したトークン数（不明な場合はNone）
+        """
+        if actual_tokens:
+            self.limiter(model).tokens.adjust(actual_tokens - estimated_tokens)
+
+    def backoff(self, attempt: int) -> float:
+        """
+        ジッター付きの指数バックオフの待ち時間を計算する
+
+        Args:
+            attempt: これまでのリトライ回数
+
+        Returns:
+            float: 待ち時間（秒）
+        """
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        # フルジッター: 同時に失敗した呼び出しのリトライ時刻を分散させる
+        return random.uniform(ceiling / 2, ceiling)
+
+    @staticmethod
+    def retry_after(error: "openai.APIStatusError") -> Optional[float]:
+        """
+        エラーレスポンスのretry-afterヘッダーから待ち時間を取得する
+
+        Args:
+            error: APIのエラー
+
+        Returns:
+            Optional[float]: 待ち時間（秒）。ヘッダーがない場合はNone
+        """
+        response = getattr(error, "response", None)
+        if response is None:
+            return None
+        headers = response.headers
+        value = headers.get("retry-after-ms")
+        if value:
+            try:
+                return float(value) / 1000.0
+            except ValueError:
+                pass
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            parsed = email.utils.parsedate_tz(value)
+            if parsed is None:
+                return None
+            return max(0.0, email.utils.mktime_tz(parsed) - time.time())
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        モデルごとの待ち行列の統計情報を取得する
+
+        Returns:
+            Dict[str, Dict[str, Any]]: モデル名 -> 待ち行列の長さ・実行中の数・リトライ回数などの統計
+        """
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {model: dict(limiter.stats) for model, limiter in limiters.items()}
+
+    def _should_retry(self, attempt: int, can_retry: Optional[Callable[[], bool]]) -> bool:
+        """リトライ回数の上限と呼び出し側の状態からリトライするかどうかを判定"""
+        return attempt < self.max_retries and (can_retry is None or can_retry())
+
+    @staticmethod
+    async def _wait_turn(limiter: ModelLimiter, model: str, estimated_tokens: int):
+        """バケットの予約を行い、順番が来るまで待機"""
+        await RequestScheduler._wait(limiter, model, limiter.reserve(estimated_tokens))
+
+    @staticmethod
+    async def _wait_reserved(limiter: ModelLimiter, model: str, estimated_tokens: int, reservation: Reservation):
+        """前もって確保した順番を使い、残りの待ち時間だけ待機"""
+        reservation.used = True
+        # 短縮できた待ち時間は、予約せずに今から待ち行列に並んだ場合の待ち時間との差とする
+        unreserved = limiter.unreserved_wait(estimated_tokens, reservation.estimated_tokens)
+        # 予約時の見込みと実際の入力から求めた見込みの差を補正する
+        limiter.tokens.adjust(estimated_tokens - reservation.estimated_tokens)
+        remaining = max(0.0, reservation.ready_at - time.monotonic())
+        reservation.saved = max(0.0, unreserved - remaining)
+        await RequestScheduler._wait(limiter, model, remaining)
+
+    @staticmethod
+    async def _wait(limiter: ModelLimiter, model: str, wait: float):
+        """順番が来るまで待機"""
+        if wait <= 0:
+            return
+        stats = limiter.stats
+        stats["queued"] += 1
+        stats["max_queued"] = max(stats["max_queued"], stats["queued"])
+        stats["wait_time"] += wait
+        try:
+            with start_span("scheduler.queue_wait", {"gen_ai.request.model": model}) as span:
+                await asyncio.sleep(wait)
+                span.record("queue_wait_ms", wait * 1000)
+        finally:
+            stats["queued"] -= 1
+
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """
+    プロセス全体で共有するリクエストスケジューラを取得する
+
+    Returns:
+        RequestScheduler: リクエストスケジューラ
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RequestScheduler()
+    return _scheduler
+
+
+def install_scheduler(scheduler: RequestScheduler) -> RequestScheduler:
+    """
+    プロセス全体で共有するリクエストスケジューラを置き換える（最初の呼び出しの前に使う）
+
+    Args:
+        scheduler: 設定するリクエストスケジューラ
+
+    Returns:
+        RequestScheduler: 設定したリクエストスケジューラ
+    """
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
+    return scheduler
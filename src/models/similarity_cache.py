@@ -0,0 +1,382 @@
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Any, Dict, FrozenSet, NamedTuple, Optional, Set, Tuple
+
+from src.config.settings import (
+    SIMILARITY_CACHE_BANDS,
+    SIMILARITY_CACHE_IGNORED_PREFIXES,
+    SIMILARITY_CACHE_IGNORED_SUFFIXES,
+    SIMILARITY_CACHE_MAX_DIFF_SHINGLES,
+    SIMILARITY_CACHE_MAX_ENTRIES,
+    SIMILARITY_CACHE_MAX_FALSE_HITS,
+    SIMILARITY_CACHE_MAX_INPUT_CHARS,
+    SIMILARITY_CACHE_NUM_PERM,
+    SIMILARITY_CACHE_PATH,
+    SIMILARITY_CACHE_SHINGLE_SIZE,
+    SIMILARITY_CACHE_THRESHOLD,
+    SIMILARITY_CACHE_TTL,
+)
+
+# MinHashのハッシュ関数 (a * x + b) mod p に使うメルセンヌ素数
+_MERSENNE_PRIME = (1 << 61) - 1
+# 文・節の始めと終わりの丁寧表現（行を文・節の区切りとする。長い表現を先に試すよう、長い順に並べる）
+_IGNORED_PREFIX_PATTERN = re.compile(
+    "^(?:{})".format("|".join(map(re.escape, sorted(SIMILARITY_CACHE_IGNORED_PREFIXES, key=len, reverse=True)))),
+    re.MULTILINE
+)
+_IGNORED_SUFFIX_PATTERN = re.compile(
+    "(?:{})$".format("|".join(map(re.escape, sorted(SIMILARITY_CACHE_IGNORED_SUFFIXES, key=len, reverse=True)))),
+    re.MULTILINE
+)
+
+
+def normalize_text(text: str) -> str:
+    """
+    類似度を計算するために入力を正規化する
+
+    全角・半角と大文字・小文字を揃え、句読点・記号・空白を取り除く。丁寧表現は、句読点などで区切った
+    文・節の始めの前置きと終わりの言い方だけを取り除く（文中の「ますます」や「済ます」は残す）
+
+    Args:
+        text: 入力
+
+    Returns:
+        str: 正規化した入力
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    # 句読点・記号・空白を改行に置き換え、各行の先頭と末尾を文・節の始めと終わりとして扱う
+    text = "".join("\n" if unicodedata.category(ch)[0] in "PSZC" else ch for ch in text)
+    text = _IGNORED_SUFFIX_PATTERN.sub("", _IGNORED_PREFIX_PATTERN.sub("", text))
+    return text.replace("\n", "")
+
+
+def shingles(text: str, size: int = SIMILARITY_CACHE_SHINGLE_SIZE) -> FrozenSet[str]:
+    """
+    正規化した入力を文字n-gramの集合に分割する（分かち書きの不要な日本語でも比較できるよう文字単位とする）
+
+    Args:
+        text: 正規化した入力
+        size: n-gramの長さ
+
+    Returns:
+        FrozenSet[str]: 文字n-gramの集合（入力がn-gramより短い場合は入力そのもの）
+    """
+    if len(text) <= size:
+        return frozenset([text]) if text else frozenset()
+    return frozenset(text[i:i + size] for i in range(len(text) - size + 1))
+
+
+class SimilarHit(NamedTuple):
+    """類似質問キャッシュのヒット"""
+    entry_id: int      # 再利用した質問のID（誤りの報告に使う）
+    question: str      # 再利用した応答の元の質問
+    response: str      # 再利用した応答
+    similarity: float  # 質問の類似度（Jaccard係数）
+
+    def to_dict(self) -> Dict[str, Any]:
+        """応答を除いた内容を、実行結果に含められる辞書形式で返す"""
+        return {"entry_id": self.entry_id, "question": self.question, "similarity": round(self.similarity, 4)}
+
+
+class _Entry(NamedTuple):
+    """類似質問キャッシュに保持する質問"""
+    namespace: str
+    question: str
+    shingles: FrozenSet[str]
+    buckets: Tuple[int, ...]  # LSHのバンドごとのハッシュ値
+    response: str
+    created_at: float
+
+
+class SimilarityCache:
+    """
+    句読点や丁寧表現だけが異なる質問に、過去の応答を再利用するキャッシュ
+
+    エージェント（モデル・指示・ツール）ごとに過去の質問を文字n-gramのMinHashでLSHに登録し、
+    同じバケットに入った候補のうち、n-gramの集合のJaccard係数が閾値以上で最も近い質問の応答を返す。
+    長い質問では1語の違いでも係数が下がりにくいため、異なるn-gramの数にも上限を設け、
+    語を入れ替えただけの質問を区別するため、文字の並びの一致率も閾値以上であることを確認する。
+    計算はすべてローカルで行い、埋め込みのAPIなどの外部サービスは使わない。
+    誤って再利用した応答が報告された場合は、その質問の組み合わせでは再利用せず、
+    報告が SIMILARITY_CACHE_MAX_FALSE_HITS 回に達した質問は以降の再利用の対象から外す。
+    """
+
+    def __init__(self, db_path: Optional[str] = SIMILARITY_CACHE_PATH,
+                 threshold: float = SIMILARITY_CACHE_THRESHOLD,
+                 max_diff_shingles: int = SIMILARITY_CACHE_MAX_DIFF_SHINGLES,
+                 num_perm: int = SIMILARITY_CACHE_NUM_PERM,
+                 bands: int = SIMILARITY_CACHE_BANDS,
+                 max_entries: int = SIMILARITY_CACHE_MAX_ENTRIES,
+                 ttl: float = SIMILARITY_CACHE_TTL,
+                 max_false_hits: int = SIMILARITY_CACHE_MAX_FALSE_HITS):
+        """
+        SimilarityCacheの初期化
+
+        Args:
+            db_path: 質問と応答を保存するSQLiteファイルのパス（Noneの場合はメモリのみ）
+            threshold: 応答を再利用する類似度の下限
+            max_diff_shingles: 応答を再利用する質問の間で異なってよい文字n-gramの最大数
+            num_perm: MinHashのハッシュ関数の数
+            bands: LSHのバンド数（num_perm を割り切れる数）
+            max_entries: 保持する質問の最大件数
+            ttl: 応答の有効期限（秒）
+            max_false_hits: 再利用の対象から外す誤りの報告の回数
+        """
+        if num_perm % bands:
+            raise ValueError(f"MinHashのハッシュ関数の数 {num_perm} がバンド数 {bands} で割り切れません")
+        self.threshold = threshold
+        self.max_diff_shingles = max_diff_shingles
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_false_hits = max_false_hits
+        # 保存した質問から同じバケットを求め直せるよう、ハッシュ関数の係数は固定のシードで作成する
+        generator = random.Random(0)
+        self._perms = [(generator.randrange(1, _MERSENNE_PRIME), generator.randrange(0, _MERSENNE_PRIME))
+                       for _ in range(num_perm)]
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()  # ID -> 質問（登録順）
+        self._buckets: Dict[Tuple[str, int, int], Set[int]] = {}   # (エージェント, バンド, ハッシュ値) -> ID
+        self._false_hits: Dict[int, int] = {}                       # ID -> 誤りの報告の回数
+        self._blocked: Set[Tuple[int, str]] = set()                 # 誤りが報告された (ID, 正規化した質問)
+        self._next_id = 1  # メモリのみの場合のID
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "false_hits": 0, "writes": 0}
+
+        self._db = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS similar_responses ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, namespace TEXT NOT NULL, question TEXT NOT NULL, "
+                "response TEXT NOT NULL, created_at REAL NOT NULL, false_hits INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS similar_false_hits ("
+                "entry_id INTEGER NOT NULL, question TEXT NOT NULL, reported_at REAL NOT NULL, "
+                "PRIMARY KEY (entry_id, question))"
+            )
+            self._load()
+
+    def lookup(self, namespace: str, question: str) -> Optional[SimilarHit]:
+        """
+        類似した質問の応答を探す
+
+        Args:
+            namespace: エージェントを識別するキー
+            question: 質問
+
+        Returns:
+            Optional[SimilarHit]: 類似度が閾値以上で最も近い質問の応答（見つからない場合はNone）
+        """
+        if len(question) > SIMILARITY_CACHE_MAX_INPUT_CHARS:
+            return None
+        normalized = normalize_text(question)
+        grams = shingles(normalized)
+        if not grams:
+            return None
+        buckets = self._band_hashes(grams)
+        now = time.time()
+        with self._lock:
+            self.stats["lookups"] += 1
+            candidates = set()
+            for band, bucket in enumerate(buckets):
+                candidates |= self._buckets.get((namespace, band, bucket), set())
+
+            best_id, best_similarity = None, 0.0
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if now - entry.created_at > self.ttl:
+                    self._remove(entry_id)
+                    continue
+                if (entry_id, normalized) in self._blocked:
+                    continue
+                union = len(grams | entry.shingles)
+                common = len(grams & entry.shingles)
+                similarity = common / union
+                if (similarity < self.threshold or similarity <= best_similarity
+                        or union - common > self.max_diff_shingles):
+                    continue
+                # n-gramの集合は語の順番を区別しないため、語を入れ替えただけの質問は文字の並びで区別する
+                order = SequenceMatcher(None, normalized, normalize_text(entry.question), autojunk=False).ratio()
+                if order < self.threshold:
+                    continue
+                best_id, best_similarity = entry_id, similarity
+
+            if best_id is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            entry = self._entries[best_id]
+            return SimilarHit(best_id, entry.question, entry.response, best_similarity)
+
+    def add(self, namespace: str, question: str, response: str):
+        """
+        質問と応答を登録する
+
+        Args:
+            namespace: エージェントを識別するキー
+            question: 質問
+            response: エージェントの応答
+        """
+        if len(question) > SIMILARITY_CACHE_MAX_INPUT_CHARS:
+            return
+        grams = shingles(normalize_text(question))
+        if not grams:
+            return
+        buckets = self._band_hashes(grams)
+        now = time.time()
+        with self._lock:
+            if self._db is not None:
+                # 同じファイルを使う他のプロセスとIDが重ならないよう、IDはSQLiteに採番させる
+                entry_id = self._db.execute(
+                    "INSERT INTO similar_responses (namespace, question, response, created_at) VALUES (?, ?, ?, ?)",
+                    (namespace, question, response, now)
+                ).lastrowid
+            else:
+                entry_id = self._next_id
+                self._next_id += 1
+            self._index(entry_id, _Entry(namespace, question, grams, buckets, response, now))
+            self.stats["writes"] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def report_false_hit(self, entry_id: int, question: str) -> bool:
+        """
+        再利用した応答が質問に合っていなかったことを記録する
+
+        同じ質問では以降この応答を再利用せず、報告が max_false_hits 回に達した場合は
+        どの質問にも再利用しない
+
+        Args:
+            entry_id: 再利用した質問のID（SimilarHit.entry_id）
+            question: 応答を再利用した質問
+
+        Returns:
+            bool: 記録した場合はTrue（同じ組み合わせを報告済みの場合や、質問が削除済みの場合はFalse）
+        """
+        key = (entry_id, normalize_text(question))
+        with self._lock:
+            if key in self._blocked or entry_id not in self._entries:
+                return False
+            self._blocked.add(key)
+            self._false_hits[entry_id] = self._false_hits.get(entry_id, 0) + 1
+            self.stats["false_hits"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR IGNORE INTO similar_false_hits (entry_id, question, reported_at) VALUES (?, ?, ?)",
+                    (entry_id, key[1], time.time())
+                )
+                self._db.execute("UPDATE similar_responses SET false_hits = ? WHERE id = ?",
+                                 (self._false_hits[entry_id], entry_id))
+            if self._false_hits[entry_id] >= self.max_false_hits:
+                # 保存した行は報告の記録として残し、再利用の対象からのみ外す
+                self._unindex(entry_id)
+            return True
+
+    def clear(self):
+        """登録した質問と誤りの報告をすべて削除する"""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._false_hits.clear()
+            self._blocked.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM similar_responses")
+                self._db.execute("DELETE FROM similar_false_hits")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        統計情報を取得する
+
+        Returns:
+            Dict[str, Any]: 検索・ヒット・誤りの報告の回数、ヒット率、誤りの割合、登録件数などの統計情報
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        stats["false_hit_rate"] = stats["false_hits"] / stats["hits"] if stats["hits"] else 0.0
+        stats["threshold"] = self.threshold
+        return stats
+
+    def _band_hashes(self, grams: FrozenSet[str]) -> Tuple[int, ...]:
+        """n-gramの集合のMinHashをバンドに分け、バンドごとのハッシュ値を求める"""
+        values = [int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big")
+                  for gram in grams]
+        signature = [min((a * value + b) % _MERSENNE_PRIME for value in values) for a, b in self._perms]
+        return tuple(hash(tuple(signature[band * self.rows:(band + 1) * self.rows])) for band in range(self.bands))
+
+    def _index(self, entry_id: int, entry: _Entry):
+        """質問をLSHのバケットに登録する"""
+        self._entries[entry_id] = entry
+        for band, bucket in enumerate(entry.buckets):
+            self._buckets.setdefault((entry.namespace, band, bucket), set()).add(entry_id)
+
+    def _unindex(self, entry_id: int):
+        """質問をLSHのバケットから外す"""
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for band, bucket in enumerate(entry.buckets):
+            key = (entry.namespace, band, bucket)
+            ids = self._buckets.get(key)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._buckets[key]
+
+    def _remove(self, entry_id: int):
+        """期限切れや件数の上限を超えた質問を削除する"""
+        self._unindex(entry_id)
+        self._false_hits.pop(entry_id, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM similar_responses WHERE id = ?", (entry_id,))
+            self._db.execute("DELETE FROM similar_false_hits WHERE entry_id = ?", (entry_id,))
+
+    def _load(self):
+        """保存した質問のうち、有効期限内で再利用の対象から外れていないものを読み込む"""
+        now = time.time()
+        self._db.execute("DELETE FROM similar_responses WHERE created_at < ?", (now - self.ttl,))
+        self._db.execute("DELETE FROM similar_false_hits WHERE entry_id NOT IN (SELECT id FROM similar_responses)")
+        rows = self._db.execute(
+            "SELECT id, namespace, question, response, created_at, false_hits FROM similar_responses "
+            "WHERE false_hits < ? ORDER BY id DESC LIMIT ?",
+            (self.max_false_hits, self.max_entries)
+        ).fetchall()
+        for entry_id, namespace, question, response, created_at, false_hits in reversed(rows):
+            grams = shingles(normalize_text(question))
+            self._index(entry_id, _Entry(namespace, question, grams, self._band_hashes(grams), response, created_at))
+            if false_hits:
+                self._false_hits[entry_id] = false_hits
+        for entry_id, normalized in self._db.execute("SELECT entry_id, question FROM similar_false_hits"):
+            self._blocked.add((entry_id, normalized))
+
+
+_similarity_cache: Optional[SimilarityCache] = None
+_similarity_cache_lock = threading.Lock()
+
+
+def get_similarity_cache() -> SimilarityCache:
+    """
+    プロセス全体で共有する類似質問キャッシュを取得する（初回の使用時に保存した質問を読み込む）
+
+    Returns:
+        SimilarityCache: 類似質問キャッシュ
+    """
+    global _similarity_cache
+    if _similarity_cache is None:
+        with _similarity_cache_lock:
+            if _similarity_cache is None:
+                _similarity_cache = SimilarityCache()
+    return _similarity_cache
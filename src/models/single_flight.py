@@ -0,0 +1,120 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class _LeaderCancelled(Exception):
+    """先に実行していた呼び出しが取り消されたことを待機中の呼び出しに伝える例外"""
+    pass
+
+
+class SingleFlight:
+    """
+    同じキーの呼び出しが同時に実行中の場合に、1回の実行の結果を共有する仕組み
+
+    最初の呼び出し（リーダー）だけが実際に実行し、実行中に届いた同じキーの呼び出しはその完了を待って
+    同じ結果（または例外）を受け取る。リーダーが取り消された場合は、待っていた呼び出しの1つが改めて実行する。
+    結果は完了した時点で手放すため、完了後の呼び出しには共有しない（完了後の再利用はレスポンスキャッシュが担う）。
+    異なるイベントループの呼び出しの間でも共有できるよう、結果は concurrent.futures.Future で受け渡す
+    """
+
+    def __init__(self):
+        """SingleFlightの初期化"""
+        self._calls: Dict[str, Future] = {}  # キー -> 実行中の呼び出しの結果
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "coalesced": 0, "takeovers": 0}
+
+    async def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        同じキーの呼び出しが実行中であればその結果を待ち、なければ実行する
+
+        Args:
+            key: 同じ呼び出しとみなすためのキー
+            func: 実行するコルーチンを返す関数
+
+        Returns:
+            Tuple[Any, bool]: 結果と、他の呼び出しの結果を共有したかどうか
+
+        Raises:
+            Exception: 実行（または共有した実行）が失敗した場合はその例外
+        """
+        while True:
+            with self._lock:
+                future = self._calls.get(key)
+                leader = future is None
+                if leader:
+                    future = self._calls[key] = Future()
+                    self.stats["calls"] += 1
+
+            if leader:
+                return await self._lead(key, future, func), False
+            try:
+                # 待っている側が取り消されても、リーダーの実行は取り消さない
+                result = await asyncio.shield(asyncio.wrap_future(future))
+            except _LeaderCancelled:
+                with self._lock:
+                    self.stats["takeovers"] += 1
+                continue
+            finally:
+                if future.done() and not isinstance(future.exception(), _LeaderCancelled):
+                    with self._lock:
+                        self.stats["coalesced"] += 1
+            return result, True
+
+    async def _lead(self, key: str, future: Future, func: Callable[[], Awaitable[Any]]) -> Any:
+        """リーダーとして実行し、結果を待っている呼び出しに渡す"""
+        # 取り消しや KeyboardInterrupt などで抜けた場合も、待っている呼び出しの1つに実行を引き継がせる
+        exception: Optional[BaseException] = _LeaderCancelled()
+        result = None
+        try:
+            result = await func()
+            exception = None
+            return result
+        except Exception as e:
+            exception = e
+            raise
+        finally:
+            self._complete(key, future, result=result, exception=exception)
+
+    def _complete(self, key: str, future: Future, result: Any = None, exception: Optional[BaseException] = None):
+        """実行中の呼び出しから外し、結果を設定する"""
+        with self._lock:
+            del self._calls[key]
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        統計情報を取得する
+
+        Returns:
+            Dict[str, Any]: 実行した回数・結果を共有した回数・共有した割合・実行中の件数などの統計情報
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = len(self._calls)
+        requests = stats["calls"] + stats["coalesced"]
+        stats["coalesced_rate"] = stats["coalesced"] / requests if requests else 0.0
+        return stats
+
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """
+    プロセス全体で共有するSingleFlightを取得する
+
+    Returns:
+        SingleFlight: 同時に実行中の同じ呼び出しをまとめる仕組み
+    """
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
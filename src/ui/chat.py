@@ -1,6 +1,10 @@
 import streamlit as st
+from src.config.settings import CHAT_MEMORY_SUMMARY_INSTRUCTIONS
 from src.models.agent import AgentManager, RateLimitError, AgentError
-from src.utils.async_helpers import run_async
+from src.models.memory import ConversationMemory, memory_budget
+from src.models.similarity_cache import get_similarity_cache
+from src.utils.async_helpers import get_background_loop, in_caller_thread, run_async
+from src.utils.streaming import ThrottledStreamWriter
 
 def initialize_chat():
     """
@@ -14,25 +18,54 @@ def initialize_chat():
     # セッション状態の初期化
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "chat_memory" not in st.session_state:
+        st.session_state.chat_memory = ConversationMemory()
 
     # 過去のメッセージを表示
-    for message in st.session_state.messages:
+    for index, message in enumerate(st.session_state.messages):
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
+            if "similar" in message:
+                show_similar_hit(message, index)
 
     # ユーザー入力
     return st.chat_input("メッセージを入力してください...")
 
 
-def process_message(user_input, agent_name, instructions, selected_model):
+def show_similar_hit(message, index):
+    """
+    類似した質問の応答を再利用したことと、誤りを報告するボタンを表示
+    
+    Args:
+        message (dict): 再利用した応答のアシスタントメッセージ
+        index (int): チャット履歴でのメッセージの位置（ボタンのキーに使う）
+    """
+    similar = message["similar"]
+    st.caption(f"類似した質問「{similar['question']}」の応答を再利用しました（類似度 {similar['similarity']:.0%}）")
+    if similar.get("reported"):
+        st.caption("報告しました。同じ質問をもう一度送信すると、新たに回答します")
+    elif st.button("質問に合っていない回答を報告", key=f"false_hit_{index}"):
+        get_similarity_cache().report_false_hit(similar["entry_id"], similar["input"])
+        similar["reported"] = True
+        st.rerun()
+
+
+def process_message(user_input, agent_name, instructions, selected_model, stream=True, use_cache=True,
+                    similarity=False):
     """
     ユーザーメッセージを処理し、AIの応答を取得する
     
+    モデルには会話履歴（古い会話の要約と、モデルごとのトークン数の上限に収まる直近の会話）を
+    今回の入力と合わせて渡す
+    
     Args:
         user_input (str): ユーザーの入力メッセージ
         agent_name (str): エージェント名
         instructions (str): エージェントへの指示
         selected_model (str): 使用するモデル名
+        stream (bool): 応答をストリーミング表示するかどうか
+        use_cache (bool): レスポンスキャッシュを使用するかどうか
+        similarity (bool): 類似した質問の応答を再利用するかどうか
     """
     # ユーザーメッセージをチャット履歴に追加
     st.session_state.messages.append({"role": "user", "content": user_input})
@@ -41,8 +74,11 @@ def process_message(user_input, agent_name, instructions, selected_model):
     with st.chat_message("user"):
         st.markdown(user_input)
     
+    memory = st.session_state.chat_memory
+    
     # 処理中表示
-    with st.chat_message("assistant"):
+    assistant_container = st.chat_message("assistant")
+    with assistant_container:
         message_placeholder = st.empty()
         message_placeholder.markdown("考え中...")
     
@@ -54,16 +90,48 @@ def process_message(user_input, agent_name, instructions, selected_model):
             model=selected_model
         )
         
+        # ストリーミング時は生成途中の応答をプレースホルダーに随時表示
+        stream_writer = ThrottledStreamWriter(in_caller_thread(message_placeholder.markdown)) if stream else None
+        
         # 実行と結果の取得
+        similar_hits = []
         with st.spinner('レスポンスを生成中...'):
             # 非同期処理を実行
-            response = run_async(AgentManager.run_agent(agent, user_input))
+            response = run_async(AgentManager.run_agent(
+                agent, memory.build_input(user_input, memory_budget(selected_model)),
+                on_delta=stream_writer, use_cache=use_cache, similarity=similarity,
+                on_similar_hit=similar_hits.append
+            ))
         
         # アシスタントメッセージをチャット履歴に追加
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        assistant_message = {"role": "assistant", "content": response}
+        if similar_hits:
+            assistant_message["similar"] = dict(similar_hits[0].to_dict(), input=user_input)
+        st.session_state.messages.append(assistant_message)
+        memory.add("user", user_input)
+        memory.add("assistant", str(response))
         
         # 応答を表示（処理中を上書き）
         message_placeholder.markdown(response)
+        if similar_hits:
+            with assistant_container:
+                show_similar_hit(assistant_message, len(st.session_state.messages) - 1)
+        stats = memory.get_stats()
+        st.caption(
+            f"コンテキスト: 約 {stats['last_input_tokens']} トークン"
+            f"（直近の会話 {stats['window']} 件" + ("、要約あり" if memory.summary else "") + "）"
+        )
+        
+        # 直近の会話から外れた履歴がたまったら、次の入力までにバックグラウンドで要約する
+        if memory.needs_summary():
+            summarizer = AgentManager.create_agent(
+                name="Summarizer",
+                instructions=CHAT_MEMORY_SUMMARY_INSTRUCTIONS,
+                model=selected_model
+            )
+            memory.start_summary(get_background_loop().submit(
+                AgentManager.run_agent(summarizer, memory.summary_prompt(), use_cache=False)
+            ))
         
         return None  # エラーなし
         
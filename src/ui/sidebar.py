@@ -1,6 +1,11 @@
 import streamlit as st
 import os
 from src.config.settings import AVAILABLE_MODELS, DEFAULT_INSTRUCTIONS, DEFAULT_AGENT_NAME, AGENT_PRESETS
+from src.models.response_cache import get_response_cache
+from src.models.similarity_cache import get_similarity_cache
+from src.models.single_flight import get_single_flight
+from src.models.scheduler import get_scheduler
+from src.utils.startup_metrics import get_startup_metrics
 
 def setup_sidebar():
     """
@@ -28,7 +33,7 @@ def setup_sidebar():
     # 複数のエージェントプリセット
     st.sidebar.header("エージェントプリセット")
     
-    selected_preset = st.sidebar.selectbox("プリセットを選択", ["カスタム"] + list(AGENT_PRESETS.keys()))
+    selected_preset = st.sidebar.selectbox("プリセットを選択", ["カスタム"] + list(AGENT_PRESETS.keys()), key="agent_preset")
 
     if selected_preset != "カスタム":
         preset = AGENT_PRESETS[selected_preset]
@@ -40,6 +45,137 @@ def setup_sidebar():
     return agent_name, instructions, selected_model
 
 
+def setup_runtime_options():
+    """
+    実行オプションのUIセットアップと設定の取得
+    
+    Returns:
+        dict: 実行オプション
+    """
+    st.sidebar.header("実行オプション")
+    
+    # ストリーミング表示
+    stream = st.sidebar.checkbox("ストリーミング表示", value=True, help="生成中の応答を逐次表示します")
+    
+    # レスポンスキャッシュ
+    use_cache = st.sidebar.checkbox("レスポンスキャッシュを使用", value=True, help="同じ設定・同じ入力に対する応答を再利用します")
+    
+    # 類似質問キャッシュ（既定値はプリセットの設定に従う）
+    preset = AGENT_PRESETS.get(st.session_state.get("agent_preset"), {})
+    similarity = st.sidebar.checkbox(
+        "類似した質問の応答を再利用", value=preset.get("similarity_cache", False), disabled=not use_cache,
+        help="句読点や丁寧表現だけが異なる最初の質問に、過去の応答を再利用します（会話の途中の質問は対象外です）"
+    )
+    
+    return {"stream": stream, "use_cache": use_cache, "similarity_cache": use_cache and similarity}
+
+
+def show_cache_stats():
+    """
+    サイドバーにレスポンスキャッシュの統計情報を表示
+    """
+    cache = get_response_cache()
+    stats = cache.get_stats()
+    
+    with st.sidebar.expander("レスポンスキャッシュ"):
+        col1, col2 = st.columns(2)
+        col1.metric("ヒット", stats["hits"])
+        col2.metric("ミス", stats["misses"])
+        st.caption(
+            f"ヒット率: {stats['hit_rate']:.0%} "
+            f"(メモリ: {stats['memory_hits']} / ディスク: {stats['disk_hits']})"
+        )
+        st.caption(f"保存件数: メモリ {stats['memory_entries']} 件 / ディスク {stats['disk_entries']} 件")
+        similar = get_similarity_cache().get_stats()
+        if similar["lookups"]:
+            st.caption(
+                f"類似した質問の再利用: {similar['hits']} 件 (ヒット率: {similar['hit_rate']:.0%} / "
+                f"誤りの報告: {similar['false_hits']} 件 = {similar['false_hit_rate']:.0%})"
+            )
+        flights = get_single_flight().get_stats()
+        st.caption(
+            f"同時実行中の同じ呼び出しとの共有: {flights['coalesced']} 件 "
+            f"(共有率: {flights['coalesced_rate']:.0%} / 実行中: {flights['in_flight']} 件)"
+        )
+        if st.button("キャッシュをクリア"):
+            cache.clear()
+            get_similarity_cache().clear()
+            st.success("キャッシュをクリアしました")
+
+
+def show_scheduler_stats():
+    """
+    サイドバーにリクエストスケジューラの待ち行列の状況を表示
+    """
+    stats = get_scheduler().get_stats()
+    
+    with st.sidebar.expander("リクエストスケジューラ"):
+        if not stats:
+            st.caption("まだAPI呼び出しはありません")
+            return
+        for model, model_stats in stats.items():
+            st.markdown(f"**{model}**")
+            col1, col2 = st.columns(2)
+            col1.metric("待機中", model_stats["queued"])
+            col2.metric("実行中", model_stats["in_flight"])
+            st.caption(
+                f"呼び出し: {model_stats['calls']} 回 / リトライ: {model_stats['retries']} 回 / "
+                f"レート制限: {model_stats['rate_limited']} 回 / 失敗: {model_stats['failures']} 回"
+            )
+            st.caption(
+                f"最大待機数: {model_stats['max_queued']} / 累積待ち時間: {model_stats['wait_time']:.1f} 秒"
+            )
+
+
+def show_cascade_stats():
+    """
+    サイドバーにエージェントごとのモデルカスケードの昇格率と短縮できた時間を表示
+    """
+    # フロー機能はマルチエージェント版でのみ使用するため、表示する時点で読み込む
+    from src.agent_flow.cascade import get_cascade_stats
+    stats = get_cascade_stats().get_stats()
+    
+    with st.sidebar.expander("モデルカスケード"):
+        if not stats:
+            st.caption("まだモデルカスケードを使用したエージェントの実行はありません")
+            return
+        for agent_stats in stats.values():
+            st.markdown(f"**{agent_stats['name']}** ({agent_stats['cascade_model']} → {agent_stats['model']})")
+            col1, col2 = st.columns(2)
+            col1.metric("昇格率", f"{agent_stats['escalation_rate']:.0%}")
+            saved = agent_stats["latency_saved"]
+            col2.metric("短縮した時間", "-" if saved is None else f"{saved:.1f} 秒")
+            accepted_avg = agent_stats["accepted_latency_avg"]
+            escalated_avg = agent_stats["escalated_latency_avg"]
+            st.caption(
+                f"呼び出し: {agent_stats['calls']} 回 / 昇格: {agent_stats['escalations']} 回 / "
+                f"平均所要時間: 採用 {'-' if accepted_avg is None else f'{accepted_avg:.1f} 秒'}・"
+                f"昇格 {'-' if escalated_avg is None else f'{escalated_avg:.1f} 秒'}"
+            )
+
+
+def show_startup_stats():
+    """
+    サイドバーにアプリの起動時間と再実行ごとの所要時間を表示
+    """
+    stats = get_startup_metrics().get_stats()
+    
+    with st.sidebar.expander("起動時間"):
+        col1, col2 = st.columns(2)
+        if stats["cold_start_ms"] is not None:
+            col1.metric("コールドスタート", f"{stats['cold_start_ms']:.0f} ms")
+        if stats["last_rerun_ms"] is not None:
+            col2.metric("直前の再実行", f"{stats['last_rerun_ms']:.0f} ms")
+            st.caption(
+                f"再実行 {stats['reruns']} 回: 中央値 {stats['p50_rerun_ms']:.0f} ms / "
+                f"p95 {stats['p95_rerun_ms']:.0f} ms"
+            )
+        for name, elapsed_ms in stats["imports"].items():
+            st.caption(f"読み込み時間 ({name}): {elapsed_ms:.0f} ms")
+        if not stats["sdk_loaded"]:
+            st.caption("agents SDK は最初の実行時に読み込まれます")
+
+
 def show_error_sidebar(error_message):
     """
     サイドバーにエラーメッセージを表示
@@ -1,8 +1,123 @@
 import asyncio
+import contextvars
+import queue
+import threading
+from concurrent.futures import Future
+
+import streamlit as st
+
+from src.utils.startup_metrics import get_startup_metrics
+
+# run_async の呼び出し元スレッドで実行する処理を受け渡すキュー（コルーチン実行中のみ設定される）
+_caller_queue: contextvars.ContextVar = contextvars.ContextVar("caller_queue", default=None)
+
+
+class BackgroundEventLoop:
+    """
+    バックグラウンドスレッドで動き続けるイベントループ
+    
+    呼び出しごとにイベントループを作り直すと、HTTP接続プールやTLSセッションが
+    毎回破棄されてしまうため、プロセス全体で1つのループを使い続ける
+    """
+    
+    def __init__(self):
+        """
+        BackgroundEventLoopの初期化（ループ用スレッドを起動する）
+        """
+        self.loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="agent-event-loop", daemon=True)
+        self.thread.start()
+        self._started.wait()
+    
+    def _run(self):
+        """ループ用スレッドのエントリーポイント"""
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._started.set)
+        self.loop.run_forever()
+    
+    def submit(self, coroutine) -> Future:
+        """
+        コルーチンをループに投入する
+        
+        Args:
+            coroutine: 実行するコルーチン
+        
+        Returns:
+            Future: 実行結果を受け取るFuture
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+
+@st.cache_resource(show_spinner=False)
+def get_background_loop() -> BackgroundEventLoop:
+    """
+    プロセス全体で共有するバックグラウンドイベントループを取得する
+    
+    初回呼び出し時にループを起動し、共有のOpenAIクライアントをループ上で作成する。
+    agents / openai の読み込みには時間がかかるため、最初に run_async でエージェントを実行する時点まで遅らせる
+    
+    Returns:
+        BackgroundEventLoop: バックグラウンドイベントループ
+    """
+    with get_startup_metrics().measure("agents SDK"):
+        from src.models.openai_client import install_shared_client
+    
+    background = BackgroundEventLoop()
+    
+    async def _install():
+        install_shared_client()
+    
+    background.submit(_install()).result()
+    return background
+
+
+def in_caller_thread(func):
+    """
+    run_async の呼び出し元スレッドで実行されるように関数をラップする
+    
+    Streamlitの描画処理はスクリプトのスレッドから行う必要があるため、
+    バックグラウンドループ上のコルーチンから描画する場合はこの関数でラップする。
+    run_async の外で呼ばれた場合はその場で実行する。
+    
+    Args:
+        func: ラップする関数
+    
+    Returns:
+        ラップされた関数
+    """
+    def wrapper(*args, **kwargs):
+        caller_queue = _caller_queue.get()
+        if caller_queue is None:
+            func(*args, **kwargs)
+        else:
+            caller_queue.put((func, args, kwargs))
+    return wrapper
+
+
+class CallerThreadProxy:
+    """
+    オブジェクトのメソッド呼び出しを run_async の呼び出し元スレッドで実行するプロキシ
+    """
+    
+    def __init__(self, target):
+        """
+        CallerThreadProxyの初期化
+        
+        Args:
+            target: 呼び出しを転送する対象のオブジェクト
+        """
+        self._target = target
+    
+    def __getattr__(self, name):
+        return in_caller_thread(getattr(self._target, name))
+
 
 def run_async(coroutine):
     """
-    新しいイベントループを作成してコルーチンを実行するヘルパー関数
+    バックグラウンドイベントループでコルーチンを実行し、完了まで待機するヘルパー関数
+    
+    待機中は in_caller_thread でラップされた処理を呼び出し元スレッドで順に実行する
     
     Args:
         coroutine: 実行するコルーチン
@@ -10,9 +125,31 @@ def run_async(coroutine):
     Returns:
         コルーチンの実行結果
     """
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
     try:
-        return loop.run_until_complete(coroutine)
-    finally:
-        loop.close() 
\ No newline at end of file
+        background = get_background_loop()
+    except BaseException:
+        coroutine.close()
+        raise
+    caller_queue = queue.SimpleQueue()
+    
+    async def _run_with_caller_queue():
+        _caller_queue.set(caller_queue)
+        return await coroutine
+    
+    future = background.submit(_run_with_caller_queue())
+    # 完了時に番兵を入れて待機ループを抜ける
+    future.add_done_callback(lambda _: caller_queue.put(None))
+    
+    try:
+        while True:
+            item = caller_queue.get()
+            if item is None:
+                break
+            func, args, kwargs = item
+            func(*args, **kwargs)
+    except BaseException:
+        # スクリプトの再実行などで待機が中断された場合は実行中の処理も取り消す
+        future.cancel()
+        raise
+    
+    return future.result()
@@ -0,0 +1,267 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+from src.agent_builder.agent_types import AgentConfig, AgentFlow
+from src.config.settings import DATA_DIR, STORE_PATH
+
+# 以前のバージョンの保存データ（初回起動時にストアへ移行する）
+AGENTS_FILE = os.path.join(DATA_DIR, "agents.pickle")
+FLOWS_FILE = os.path.join(DATA_DIR, "flows.pickle")
+
+
+def upgrade_agent(agent) -> AgentConfig:
+    """
+    保存されていたエージェント設定を現在の AgentConfig として作り直す
+
+    古いバージョンで保存されたオブジェクトには後から追加したフィールドがないため、
+    作り直してデフォルト値を補う
+    """
+    return AgentConfig.from_dict(dict(agent.__dict__))
+
+
+def upgrade_flow(flow) -> AgentFlow:
+    """保存されていたフローを現在の AgentFlow として作り直す"""
+    data = dict(flow.__dict__)
+    data["agents"] = [dict(agent.__dict__) for agent in flow.agents]
+    data["connections"] = [dict(conn.__dict__) for conn in flow.connections]
+    return AgentFlow.from_dict(data)
+
+
+def record_digest(record: BaseModel) -> str:
+    """
+    レコードの保存形式（JSON）を作成する（変更の検出にも使用する）
+
+    Args:
+        record: エージェント設定またはフロー
+
+    Returns:
+        str: キーを整列したJSON文字列
+    """
+    return json.dumps(record.to_dict(), sort_keys=True, ensure_ascii=False)
+
+
+class ObjectStore:
+    """
+    エージェント設定とフローを保存するSQLiteのストア
+
+    レコードは1件ずつJSONとして保存し、変更されたレコードのみを1つのトランザクションで書き込む。
+    読み込んだレコードはプロセス内にキャッシュし、他のプロセス（別のサービス）が
+    データベースを更新した場合のみ読み込み直す。WALモードのため、読み込みは書き込み中でも待たされない。
+    """
+
+    TABLES = {"agents": AgentConfig, "flows": AgentFlow}
+
+    def __init__(self, db_path: str = STORE_PATH):
+        """
+        ObjectStoreの初期化
+
+        Args:
+            db_path: SQLiteファイルのパス
+        """
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        for table in self.TABLES:
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+        self._lock = threading.Lock()
+        # テーブル名 -> {ID: (保存形式のJSON, レコード)}
+        self._cache: Dict[str, Dict[str, Tuple[str, BaseModel]]] = {}
+        self._data_version: Optional[int] = None
+        self._migrate_pickles()
+
+    def load(self, table: str) -> Dict[str, BaseModel]:
+        """
+        テーブルのレコードをすべて取得する
+
+        返すレコードはキャッシュのコピーのため、呼び出し元で変更しても他のセッションには影響しない
+
+        Args:
+            table: テーブル名（"agents" または "flows"）
+
+        Returns:
+            Dict[str, BaseModel]: ID -> レコード
+        """
+        with self._lock:
+            self._refresh()
+            cached = self._cache.get(table)
+            if cached is None:
+                model = self.TABLES[table]
+                cached = {
+                    record_id: (data, model.from_dict(json.loads(data)))
+                    for record_id, data in self._db.execute(f"SELECT id, data FROM {table}")
+                }
+                self._cache[table] = cached
+            return {record_id: record.model_copy(deep=True) for record_id, (_, record) in cached.items()}
+
+    def save(self, table: str, records: Dict[str, BaseModel], saved: Dict[str, str]) -> Dict[str, str]:
+        """
+        前回の保存から変更されたレコードのみを書き込み、削除されたレコードを削除する
+
+        Args:
+            table: テーブル名（"agents" または "flows"）
+            records: 保存するレコード（ID -> レコード）
+            saved: 前回の保存（または読み込み）時点のレコードの保存形式（ID -> JSON）
+
+        Returns:
+            Dict[str, str]: 今回の保存後のレコードの保存形式（次回の saved に渡す）
+        """
+        digests = {record_id: record_digest(record) for record_id, record in records.items()}
+        changed = [(record_id, data) for record_id, data in digests.items() if saved.get(record_id) != data]
+        deleted = [record_id for record_id in saved if record_id not in digests]
+        if not changed and not deleted:
+            return digests
+
+        now = time.time()
+        with self._lock:
+            self._refresh()
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    f"INSERT OR REPLACE INTO {table} (id, data, updated_at) VALUES (?, ?, ?)",
+                    [(record_id, data, now) for record_id, data in changed]
+                )
+                self._db.executemany(f"DELETE FROM {table} WHERE id = ?", [(record_id,) for record_id in deleted])
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+            # 自分の書き込みはキャッシュに直接反映する（data_version は他の接続の更新でのみ変わる）
+            cached = self._cache.get(table)
+            if cached is not None:
+                model = self.TABLES[table]
+                for record_id, data in changed:
+                    cached[record_id] = (data, model.from_dict(json.loads(data)))
+                for record_id in deleted:
+                    cached.pop(record_id, None)
+        return digests
+
+    def _refresh(self):
+        """他のプロセスがデータベースを更新していればキャッシュを破棄する"""
+        data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            if self._data_version is not None:
+                self._cache.clear()
+            self._data_version = data_version
+
+    def _migrate_pickles(self):
+        """以前のバージョンのpickleファイルがあればストアに取り込み、取り込み済みとして名前を変更する"""
+        sources: Tuple[Tuple[str, str, Callable], ...] = (
+            ("agents", AGENTS_FILE, upgrade_agent),
+            ("flows", FLOWS_FILE, upgrade_flow)
+        )
+        for table, path, upgrade in sources:
+            try:
+                with open(path, "rb") as f:
+                    records = {record_id: upgrade(record) for record_id, record in pickle.load(f).items()}
+            except FileNotFoundError:
+                # 移行するデータがない（または別のプロセスが移行済み）
+                continue
+            # 既に同じIDのレコードがある場合はストアの内容を優先する
+            existing = {record_id for (record_id,) in self._db.execute(f"SELECT id FROM {table}")}
+            now = time.time()
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    f"INSERT OR IGNORE INTO {table} (id, data, updated_at) VALUES (?, ?, ?)",
+                    [(record_id, record_digest(record), now)
+                     for record_id, record in records.items() if record_id not in existing]
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            try:
+                os.replace(path, path + ".migrated")
+            except FileNotFoundError:
+                pass
+
+
+_object_store: Optional[ObjectStore] = None
+_object_store_lock = threading.Lock()
+
+
+def get_object_store() -> ObjectStore:
+    """
+    プロセス全体で共有するストアを取得する（初回の使用時にデータベースを開く）
+
+    Returns:
+        ObjectStore: ストア
+    """
+    global _object_store
+    if _object_store is None:
+        with _object_store_lock:
+            if _object_store is None:
+                _object_store = ObjectStore()
+    return _object_store
+
+
+def load_agents() -> Dict[str, AgentConfig]:
+    """
+    保存されたエージェント設定を読み込む
+
+    Returns:
+        Dict[str, AgentConfig]: エージェントID -> エージェント設定
+    """
+    return get_object_store().load("agents")
+
+
+def load_flows() -> Dict[str, AgentFlow]:
+    """
+    保存されたフローを読み込む
+
+    Returns:
+        Dict[str, AgentFlow]: フローID -> フロー
+    """
+    return get_object_store().load("flows")
+
+
+def record_digests(records: Dict[str, BaseModel]) -> Dict[str, str]:
+    """
+    読み込んだレコードの保存形式を作成する（save_agents / save_flows の saved に渡す）
+
+    Args:
+        records: ID -> レコード
+
+    Returns:
+        Dict[str, str]: ID -> 保存形式のJSON
+    """
+    return {record_id: record_digest(record) for record_id, record in records.items()}
+
+
+def save_agents(agents: Dict[str, AgentConfig], saved: Dict[str, str]) -> Dict[str, str]:
+    """
+    変更されたエージェント設定のみを保存する
+
+    Args:
+        agents: エージェントID -> エージェント設定
+        saved: 前回の保存時点の保存形式（record_digests または前回の戻り値）
+
+    Returns:
+        Dict[str, str]: 今回の保存後の保存形式
+    """
+    return get_object_store().save("agents", agents, saved)
+
+
+def save_flows(flows: Dict[str, AgentFlow], saved: Dict[str, str]) -> Dict[str, str]:
+    """
+    変更されたフローのみを保存する
+
+    Args:
+        flows: フローID -> フロー
+        saved: 前回の保存時点の保存形式（record_digests または前回の戻り値）
+
+    Returns:
+        Dict[str, str]: 今回の保存後の保存形式
+    """
+    return get_object_store().save("flows", flows, saved)
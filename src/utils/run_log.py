@@ -0,0 +1,213 @@
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from src.config.settings import FLOW_LOG_CAPACITY, FLOW_LOG_LEVEL, FLOW_LOG_SINK
+
+# ログレベル（標準のloggingモジュールと同じ値を使用）
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+
+
+def parse_level(level: Any) -> int:
+    """
+    ログレベルを数値に変換する
+
+    Args:
+        level: レベル名（"DEBUG" など）または数値
+
+    Returns:
+        int: ログレベルの数値
+    """
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).upper())
+    return value if isinstance(value, int) else INFO
+
+
+class JsonlLogSink:
+    """
+    ログイベントをJSONLファイルに追記する出力先
+
+    複数の実行から同時に書き込まれるため、書き込みはロックで直列化する
+    """
+
+    def __init__(self, path: str):
+        """
+        JsonlLogSinkの初期化
+
+        Args:
+            path: 出力先のJSONLファイルパス
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]):
+        """ログイベントを1行追記する"""
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def flush(self):
+        """バッファに溜まったログをファイルに書き出す"""
+        with self._lock:
+            self._file.flush()
+
+
+_log_sink: Optional[JsonlLogSink] = None
+_log_sink_lock = threading.Lock()
+
+
+def get_log_sink() -> Optional[JsonlLogSink]:
+    """
+    設定されたJSONLの出力先を取得する
+
+    Returns:
+        Optional[JsonlLogSink]: 出力先（FLOW_LOG_SINKが未設定の場合はNone）
+    """
+    global _log_sink
+    if not FLOW_LOG_SINK:
+        return None
+    if _log_sink is None:
+        with _log_sink_lock:
+            if _log_sink is None:
+                _log_sink = JsonlLogSink(FLOW_LOG_SINK)
+    return _log_sink
+
+
+class RunLog:
+    """
+    1回のフロー実行の構造化ログ
+
+    レベルが閾値未満の呼び出しは何もせずに戻り、メッセージの整形（%形式の引数の埋め込み、
+    時刻の書式化、トレースバックの文字列化）は読み出し時まで遅延する。
+    保持件数は固定長のリングバッファで制限し、古いイベントから破棄する。
+    """
+
+    def __init__(self, run_id: str = "", level: Any = FLOW_LOG_LEVEL,
+                 capacity: int = FLOW_LOG_CAPACITY, sink: Optional[JsonlLogSink] = None):
+        """
+        RunLogの初期化
+
+        Args:
+            run_id: 実行を識別するID（JSONLの出力に含める）
+            level: 記録する最低レベル
+            capacity: 保持するイベントの最大件数
+            sink: イベントを追記するJSONLの出力先
+        """
+        self.run_id = run_id
+        self.level = parse_level(level)
+        self.sink = sink
+        self._events: deque = deque(maxlen=capacity)  # (連番, 時刻, レベル, メッセージ, 引数, 例外)
+        self._seq = 0
+
+    def enabled(self, level: int) -> bool:
+        """指定したレベルのログが記録されるかどうか"""
+        return level >= self.level
+
+    def debug(self, message: str, *args):
+        """DEBUGレベルのログを記録"""
+        if DEBUG >= self.level:
+            self._record(DEBUG, message, args)
+
+    def info(self, message: str, *args):
+        """INFOレベルのログを記録"""
+        if INFO >= self.level:
+            self._record(INFO, message, args)
+
+    def warning(self, message: str, *args):
+        """WARNINGレベルのログを記録"""
+        if WARNING >= self.level:
+            self._record(WARNING, message, args)
+
+    def error(self, message: str, *args, exc: Optional[BaseException] = None):
+        """
+        ERRORレベルのログを記録
+
+        Args:
+            message: メッセージ（%形式の書式）
+            *args: メッセージに埋め込む値
+            exc: 発生した例外（DEBUGレベルが有効な場合のみトレースバックを保持する）
+        """
+        if ERROR >= self.level:
+            trace = None
+            if exc is not None and DEBUG >= self.level:
+                # フレームを保持し続けないよう、行の読み込みをせずに要約だけ取り出す
+                trace = traceback.TracebackException.from_exception(exc, lookup_lines=False)
+            self._record(ERROR, message, args, trace)
+
+    @property
+    def last_seq(self) -> int:
+        """最後に記録したイベントの連番"""
+        return self._seq
+
+    @property
+    def dropped(self) -> int:
+        """リングバッファからあふれて破棄されたイベントの件数"""
+        return self._seq - len(self._events)
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def entries(self, after_seq: int = 0) -> List[Dict[str, Any]]:
+        """
+        保持しているイベントを表示用に整形して取得する
+
+        Args:
+            after_seq: この連番より後のイベントのみを取得する
+
+        Returns:
+            List[Dict[str, Any]]: {"seq", "timestamp", "level", "message"} のリスト
+        """
+        # 新しいイベントは末尾にあるため、必要な件数だけ末尾から取り出す
+        count = min(self._seq - after_seq, len(self._events))
+        if count <= 0:
+            return []
+        events = list(itertools.islice(reversed(self._events), count))
+        return [self._format(event) for event in reversed(events)]
+
+    def close(self):
+        """JSONLの出力先に溜まったログを書き出す"""
+        if self.sink is not None:
+            self.sink.flush()
+
+    def _record(self, level: int, message: str, args: tuple, trace=None):
+        """イベントをリングバッファに追加する（整形はしない）"""
+        self._seq += 1
+        event = (self._seq, time.time(), level, message, args, trace)
+        self._events.append(event)
+        if self.sink is not None:
+            record = self._format(event)
+            record["run_id"] = self.run_id
+            record["created_at"] = event[1]
+            self.sink.write(record)
+
+    @staticmethod
+    def _format(event: tuple) -> Dict[str, Any]:
+        """イベントを表示用の辞書に整形"""
+        seq, created_at, level, message, args, trace = event
+        if args:
+            try:
+                message = message % args
+            except (TypeError, ValueError):
+                message = " ".join([message, *map(str, args)])
+        if trace is not None:
+            message = message + "\n" + "".join(trace.format())
+        return {
+            "seq": seq,
+            "timestamp": time.strftime("%H:%M:%S", time.localtime(created_at)),
+            "level": logging.getLevelName(level),
+            "message": message
+        }
@@ -0,0 +1,41 @@
+import time
+from typing import Callable
+
+from src.config.settings import STREAM_RENDER_INTERVAL
+
+# ストリーミング中に応答の末尾に表示するカーソル
+STREAM_CURSOR = "▌"
+
+
+class ThrottledStreamWriter:
+    """
+    ストリーミングで届くテキスト差分を蓄積し、一定間隔ごとにまとめて描画するクラス
+
+    差分が届くたびに描画するとStreamlitの再描画コストが支配的になるため、
+    最後の描画から interval 秒以上経過した場合にのみ描画する
+    """
+
+    def __init__(self, render: Callable[[str], None], interval: float = STREAM_RENDER_INTERVAL):
+        """
+        ThrottledStreamWriterの初期化
+
+        Args:
+            render: 蓄積したテキストを描画する関数
+            interval: 描画の最小間隔（秒）
+        """
+        self.render = render
+        self.interval = interval
+        self.text = ""
+        self._last_render = 0.0
+
+    def __call__(self, delta: str):
+        """テキスト差分を追加し、必要であれば描画する"""
+        self.text += delta
+        now = time.monotonic()
+        if now - self._last_render >= self.interval:
+            self._last_render = now
+            self.render(self.text + STREAM_CURSOR)
+
+    def flush(self):
+        """蓄積したテキストをカーソルなしで描画する"""
+        self.render(self.text)
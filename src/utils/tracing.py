@@ -0,0 +1,268 @@
+import json
+import os
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from src.config.settings import TRACE_SERVICE_NAME
+
+# 実行中のトレーサーと現在のスパン（asyncioのタスクごとに引き継がれる）
+_current_tracer: ContextVar[Optional["Tracer"]] = ContextVar("current_tracer", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+_export_lock = threading.Lock()
+
+
+class Span:
+    """
+    処理区間の記録
+
+    with文で囲んだ区間の開始・終了時刻と属性を記録する。
+    record() で記録した数値（待ち時間・トークン数など）は親のスパンにも加算されるため、
+    ホップやフロー全体のスパンから子の合計を参照できる。
+    """
+
+    __slots__ = ("tracer", "name", "span_id", "parent", "start_ns", "end_ns",
+                 "attributes", "metrics", "error", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attributes: Optional[Dict[str, Any]]):
+        """
+        Spanの初期化
+
+        Args:
+            tracer: スパンを記録するトレーサー
+            name: スパン名
+            parent: 親のスパン
+            attributes: 属性
+        """
+        self.tracer = tracer
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent = parent
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes) if attributes else {}
+        self.metrics: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self._token = None
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc is not None and self.error is None:
+            self.error = str(exc) or exc_type.__name__
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        """属性を設定する"""
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        """スパンをエラーとして記録する"""
+        self.error = message
+
+    def record(self, key: str, value: float):
+        """
+        数値を記録し、親のスパンにも加算する
+
+        Args:
+            key: 指標名
+            value: 値
+        """
+        span = self
+        while span is not None:
+            span.metrics[key] = span.metrics.get(key, 0) + value
+            span = span.parent
+
+    def elapsed_ms(self) -> float:
+        """開始からの経過時間（ミリ秒）"""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        """結果に添付するための辞書に変換"""
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent.span_id if self.parent else None,
+            "start_time": self.start_ns / 1e9,
+            "duration_ms": self.elapsed_ms(),
+            "attributes": dict(self.attributes),
+            "metrics": dict(self.metrics),
+            "error": self.error
+        }
+
+    def to_otlp(self, trace_id: str) -> Dict[str, Any]:
+        """OpenTelemetry (OTLP/JSON) 形式のスパンに変換"""
+        attributes = {**self.attributes, **self.metrics}
+        span = {
+            "traceId": trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [_otlp_attribute(key, value) for key, value in attributes.items()],
+            # STATUS_CODE_OK = 1, STATUS_CODE_ERROR = 2
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1}
+        }
+        if self.parent is not None:
+            span["parentSpanId"] = self.parent.span_id
+        return span
+
+
+class _NullSpan:
+    """トレース対象外の処理で使用する何もしないスパン"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_error(self, message: str):
+        pass
+
+    def record(self, key: str, value: float):
+        pass
+
+    def elapsed_ms(self) -> float:
+        return 0.0
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    1回の実行のスパンを集めるトレーサー
+
+    with文の中で実行された処理は start_span() で記録したスパンがこのトレーサーに集められる。
+    トレーサーが有効でない処理では start_span() は何もしないスパンを返す。
+    """
+
+    def __init__(self, service_name: str = TRACE_SERVICE_NAME):
+        """
+        Tracerの初期化
+
+        Args:
+            service_name: OTLPのリソース属性に記録するサービス名
+        """
+        self.service_name = service_name
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self._token = None
+
+    def __enter__(self) -> "Tracer":
+        self._token = _current_tracer.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        _current_tracer.reset(self._token)
+        return False
+
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> Span:
+        """
+        現在のスパンを親とする新しいスパンを作成する
+
+        Args:
+            name: スパン名
+            attributes: 属性
+
+        Returns:
+            Span: 作成したスパン（with文で使用する）
+        """
+        parent = _current_span.get()
+        if parent is not None and parent.tracer is not self:
+            parent = None
+        span = Span(self, name, parent, attributes)
+        self.spans.append(span)
+        return span
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """記録したスパンを辞書のリストに変換"""
+        return [span.to_dict() for span in self.spans]
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """
+        OpenTelemetryのエクスポート形式（ExportTraceServiceRequestのJSON表現）に変換する
+
+        Returns:
+            Dict[str, Any]: OTLP/JSON形式のトレース
+        """
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "agent_flow"},
+                    "spans": [span.to_otlp(self.trace_id) for span in self.spans]
+                }]
+            }]
+        }
+
+    def export(self, path: str):
+        """
+        トレースをOTLP/JSON形式でファイルに1行追記する
+
+        OpenTelemetry Collectorのファイルエクスポーターと同じ形式（1行に1リクエスト）のため、
+        otlpjsonfileレシーバーなどでそのまま読み込める
+
+        Args:
+            path: 出力先のファイルパス
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        line = json.dumps(self.to_otlp(), ensure_ascii=False, default=str) + "\n"
+        with _export_lock:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None):
+    """
+    実行中のトレーサーにスパンを作成する
+
+    Args:
+        name: スパン名
+        attributes: 属性
+
+    Returns:
+        Span: 作成したスパン（トレーサーが有効でない場合は何もしないスパン）
+    """
+    tracer = _current_tracer.get()
+    if tracer is None:
+        return NULL_SPAN
+    return tracer.span(name, attributes)
+
+
+def current_span():
+    """
+    現在のスパンを取得する
+
+    Returns:
+        Span: 現在のスパン（ない場合は何もしないスパン）
+    """
+    span = _current_span.get()
+    return span if span is not None else NULL_SPAN
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    """属性をOTLP/JSONのKeyValue形式に変換"""
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
@@ -0,0 +1,39 @@
+import asyncio
+import io
+import json
+
+from src.agent_builder.agent_types import AgentConfig, AgentFlow
+from src.agent_flow.batch_runner import read_inputs, run_batch
+
+
+def test_read_inputs_formats():
+    """オブジェクトとJSON文字列の行を読み込み、idがなければ行番号を使う"""
+    input_file = io.StringIO('{"id": "a", "input": "こんにちは"}\n\n"文字列だけの行"\n{"input": "idなし"}\n')
+    assert list(read_inputs(input_file)) == [
+        {"id": "a", "input": "こんにちは"},
+        {"id": 3, "input": "文字列だけの行"},
+        {"id": 4, "input": "idなし"},
+    ]
+
+
+def test_read_inputs_reports_invalid_lines():
+    """読み込めない行は中断せず、行番号をIDとしたエラーとして返す"""
+    input_file = io.StringIO('{broken\n{"id": "x"}\n[1, 2]\n{"input": 5}\n{"input": "ok"}\n')
+    items = list(read_inputs(input_file))
+    assert [item["id"] for item in items] == [1, 2, 3, 4, 5]
+    assert all("error" in item for item in items[:4])
+    assert items[4] == {"id": 5, "input": "ok"}
+
+
+def test_run_batch_continues_after_invalid_lines():
+    """読み込めない行はエラーの結果として書き出され、集計にも数えられる"""
+    agent = AgentConfig(name="agent", instructions="test", model="gpt-3.5-turbo")
+    flow = AgentFlow(name="test", description="test", agents=[agent], entry_point_id=agent.id)
+    output_file = io.StringIO()
+
+    summary = asyncio.run(run_batch(flow, read_inputs(io.StringIO('{broken\n{"id": 7}\n')), output_file))
+
+    records = [json.loads(line) for line in output_file.getvalue().splitlines()]
+    assert summary["total"] == 2 and summary["error"] == 2 and summary["ok"] == 0
+    assert sorted(record["id"] for record in records) == [1, 2]
+    assert all(record["status"] == "error" and record["errors"] for record in records)
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from agents import RunConfig
+
+from src.agent_builder.agent_types import AgentConfig, AgentConnection, AgentFlow, ConnectionType
+from src.agent_flow.checkpoint import CheckpointStore
+from src.agent_flow.flow_runtime import FlowRuntime
+from src.models.agent import AgentManager
+from src.models.local_model import LocalModelProvider
+
+
+@pytest.fixture
+def local_model():
+    """エージェントの呼び出し先を遅延なしのローカルモデルに切り替える"""
+    previous = AgentManager.run_config
+    AgentManager.run_config = RunConfig(model_provider=LocalModelProvider(output_tokens=5), tracing_disabled=True)
+    yield
+    AgentManager.run_config = previous
+
+
+def make_chain(count):
+    """レスポンスキャッシュを使わない直列のフローを作成する"""
+    agents = [AgentConfig(name=f"agent{index}", instructions=f"step {index}", model="gpt-3.5-turbo",
+                          cache_enabled=False) for index in range(count)]
+    connections = [AgentConnection(source_id=agents[index].id, target_id=agents[index + 1].id,
+                                   connection_type=ConnectionType.SEQUENTIAL) for index in range(count - 1)]
+    return AgentFlow(name="chain", description="test", agents=agents, connections=connections,
+                     entry_point_id=agents[0].id)
+
+
+def make_runtime(flow, store):
+    """チェックポイントの保存先を指定し、トレースを出力しないランタイムを作成する"""
+    runtime = FlowRuntime(flow)
+    runtime.checkpoints = store
+    runtime.trace_export_path = None
+    return runtime
+
+
+def test_checkpoint_records_and_loads(tmp_path):
+    """記録したホップと最後のエラーを読み込め、失敗した実行だけが再開対象になる"""
+    store = CheckpointStore(str(tmp_path))
+    flow = make_chain(2)
+    store.start("failed", flow, "fingerprint", "質問")
+    store.record_hop("failed", flow.agents[0].id, "質問", "応答", flow.agents[1].id)
+    store.record_failure("failed", flow.agents[1].id, "boom")
+    store.start("running", flow, "fingerprint", "質問")
+
+    checkpoint = store.load("failed")
+    assert checkpoint["user_input"] == "質問"
+    assert [hop["output"] for hop in checkpoint["hops"]] == ["応答"]
+    assert checkpoint["error"]["error"] == "boom"
+    assert [item["run_id"] for item in store.list_resumable(flow.id)] == ["failed"]
+
+    store.complete("failed")
+    assert store.load("failed") is None
+
+
+def test_resume_replays_completed_hops(tmp_path, local_model):
+    """再開時は記録済みのホップを呼び出さずに復元し、失敗したホップから実行する"""
+    store = CheckpointStore(str(tmp_path))
+    flow = make_chain(3)
+    first, second, third = flow.agents
+    run_id = "interrupted"
+    runtime = make_runtime(flow, store)
+    store.start(run_id, flow, runtime.plan.fingerprint, "質問")
+    store.record_hop(run_id, first.id, "質問", "一つ目の応答", second.id)
+    store.record_hop(run_id, second.id, "一つ目の応答", "二つ目の応答", third.id)
+    store.record_failure(run_id, third.id, "boom")
+
+    result = asyncio.run(runtime.resume(run_id))
+
+    assert result["run_id"] == run_id
+    assert result["errors"] == []
+    assert [hop["agent_id"] for hop in result["hops"]] == [first.id, second.id, third.id]
+    assert [hop["replayed"] for hop in result["hops"]] == [True, True, False]
+    assert result["chat_history"][1]["content"].endswith("一つ目の応答")
+    # 正常に完了した実行のチェックポイントは削除される
+    assert store.load(run_id) is None
+
+
+def test_resume_unknown_run(tmp_path):
+    """チェックポイントがない実行は再開できない"""
+    runtime = make_runtime(make_chain(1), CheckpointStore(str(tmp_path)))
+    with pytest.raises(KeyError):
+        asyncio.run(runtime.resume("missing"))
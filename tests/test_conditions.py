@@ -0,0 +1,127 @@
+import random
+
+import pytest
+
+from src.agent_flow.conditions import (
+    ConditionError,
+    ConditionSet,
+    KeywordMatcher,
+    compile_condition,
+    response_confidence,
+    strip_confidence,
+)
+
+
+@pytest.mark.parametrize("source, response, expected", [
+    ("contains('返品')", "返品したいです", True),
+    ("contains('返品')", "交換したいです", False),
+    ("contains('返品', '交換')", "交換したいです", True),
+    ("contains('REFUND')", "I want a refund", True),
+    ("regex('^[0-9]{3}-[0-9]{4}$')", "123-4567", True),
+    ("regex('ABC')", "abc", False),
+    ("regex('(?i)ABC')", "abc", True),
+    ("length > 5", "123456", True),
+    ("length <= 5", "123456", False),
+    ("confidence >= 70", "回答です [confidence: 80]", True),
+    ("confidence >= 70", "回答です [confidence: 60]", False),
+    ("confidence >= 70", "確信度なし", False),
+    ("contains('a') and not contains('b')", "a", True),
+    ("contains('a') and not contains('b')", "ab", False),
+    ("contains('x') or (length > 2 and contains('y'))", "yyy", True),
+    ("contains('x') or (length > 2 and contains('y'))", "yy", False),
+    ("not not true", "", True),
+    ("false or True", "", True),
+    ("contains('')", "何でも", True),
+])
+def test_condition_syntax(source, response, expected):
+    """新しい構文の条件式を評価できる"""
+    assert compile_condition(source)(response) is expected
+
+
+@pytest.mark.parametrize("source, response, expected", [
+    ("'返品' in response", "返品したい", True),
+    ("'返品' in response", "交換したい", False),
+    ("response.contains('返品')", "返品したい", True),
+    ("len(response) > 3", "1234", True),
+    ("len(response) > 3", "123", False),
+    ("'a' in response and len(response) < 3", "ab", True),
+])
+def test_legacy_condition_syntax(source, response, expected):
+    """以前の形式の条件式も評価できる"""
+    assert compile_condition(source)(response) is expected
+
+
+@pytest.mark.parametrize("source", [
+    "",
+    "contains(",
+    "contains('a'",
+    "contains(a)",
+    "length >",
+    "length ~ 3",
+    "regex('(')",
+    "unknown",
+    "contains('a') contains('b')",
+    "'a' in text",
+    "__import__('os')",
+    "1 + 1",
+])
+def test_condition_syntax_errors(source):
+    """構文エラーは ConditionError として報告される"""
+    with pytest.raises(ConditionError):
+        compile_condition(source)
+
+
+def test_condition_set_shares_keywords():
+    """接続元の条件式のキーワードは1つの KeywordMatcher にまとめられる"""
+    condition_set = ConditionSet()
+    refund = condition_set.compile("contains('返品', '返金')")
+    exchange = condition_set.compile("contains('交換') or contains('返品')")
+    matcher = condition_set.matcher()
+    assert matcher.keywords == ("返品", "返金", "交換")
+
+    response = "交換をお願いします"
+    matched = matcher.search(response.lower())
+    assert not refund(response, matched)
+    assert exchange(response, matched)
+
+
+def test_confidence_helpers():
+    """応答の末尾の確信度を取得・除去できる"""
+    assert response_confidence("回答 [Confidence： 150]") == 100
+    assert response_confidence("回答") is None
+    assert strip_confidence("回答 [confidence: 80] ") == "回答"
+
+
+def _scan(keywords, text):
+    """キーワードごとの部分文字列検索による期待値"""
+    return sum(1 << index for index, keyword in enumerate(keywords) if keyword in text)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_keyword_matcher_matches_plain_scan(seed):
+    """トライ木の正規表現による1回の走査が、キーワードごとの検索と同じ結果になる"""
+    generator = random.Random(seed)
+    alphabet = "abcあい"
+    keywords = list(dict.fromkeys(
+        "".join(generator.choice(alphabet) for _ in range(generator.randint(1, 4))) for _ in range(60)
+    ))
+    matcher = KeywordMatcher(keywords, scan_threshold=0)
+    for _ in range(50):
+        text = "".join(generator.choice(alphabet + "xyz") for _ in range(generator.randint(0, 30)))
+        assert matcher.search(text) == _scan(keywords, text)
+
+
+def test_keyword_matcher_prefix_and_overlap():
+    """同じ位置から始まる短いキーワードや重なり合うキーワードも見つかる"""
+    keywords = ["ab", "abc", "abcd", "bc", "c", "zz"]
+    matcher = KeywordMatcher(keywords, scan_threshold=0)
+    for text in ("abcd", "abc", "xbc", "ab", "zzabc", ""):
+        assert matcher.search(text) == _scan(keywords, text)
+
+
+def test_keyword_matcher_below_threshold_uses_scan():
+    """キーワードが少ない場合は部分文字列検索で同じ結果を返す"""
+    keywords = ["返品", "交換"]
+    matcher = KeywordMatcher(keywords)
+    assert matcher.search("交換と返品") == 0b11
+    assert matcher.search("問い合わせ") == 0
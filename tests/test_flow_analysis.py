@@ -0,0 +1,106 @@
+from src.agent_builder.agent_types import AgentConfig, AgentConnection, AgentFlow, ConnectionType
+from src.agent_flow.flow_plan import compile_flow
+from src.config.settings import FLOW_LOOP_ITERATIONS, FLOW_MAX_EXECUTIONS
+
+
+def make_flow(agent_count, edges, entry=0):
+    """エージェント番号の組 (接続元, 接続先, 接続タイプ[, 条件]) のリストからフローを作成する"""
+    agents = [AgentConfig(name=f"agent{index}", instructions="test", model="gpt-3.5-turbo")
+              for index in range(agent_count)]
+    connections = [
+        AgentConnection(source_id=agents[edge[0]].id, target_id=agents[edge[1]].id,
+                        connection_type=edge[2], condition=edge[3] if len(edge) > 3 else None)
+        for edge in edges
+    ]
+    return AgentFlow(name="test", description="test", agents=agents, connections=connections,
+                     entry_point_id=agents[entry].id if entry is not None else None)
+
+
+def analyze(flow):
+    """フローをコンパイルして静的解析の結果を返す"""
+    return compile_flow(flow).analysis
+
+
+def codes(analysis):
+    """見つかった問題のコードの集合"""
+    return {issue.code for issue in analysis.issues}
+
+
+def test_execution_bound_chain():
+    """直列のフローでは上限がエージェント数になる"""
+    flow = make_flow(4, [(0, 1, ConnectionType.SEQUENTIAL), (1, 2, ConnectionType.SEQUENTIAL),
+                         (2, 3, ConnectionType.SEQUENTIAL)])
+    analysis = analyze(flow)
+    assert analysis.cycles == ()
+    assert analysis.execution_bound == 4
+
+
+def test_execution_bound_counts_paths():
+    """合流するエージェントは経路の数だけ数えられる"""
+    flow = make_flow(4, [
+        (0, 1, ConnectionType.CONDITIONAL, "contains('a')"),
+        (0, 2, ConnectionType.CONDITIONAL, "contains('b')"),
+        (1, 3, ConnectionType.SEQUENTIAL),
+        (2, 3, ConnectionType.SEQUENTIAL),
+    ])
+    assert analyze(flow).execution_bound == 5
+
+
+def test_execution_bound_parallel_branches():
+    """並列実行の枝はそれぞれ別の経路として数えられる"""
+    flow = make_flow(4, [
+        (0, 1, ConnectionType.PARALLEL), (0, 2, ConnectionType.PARALLEL),
+        (1, 3, ConnectionType.JOIN), (2, 3, ConnectionType.JOIN),
+    ])
+    assert analyze(flow).execution_bound == 5
+
+
+def test_execution_bound_not_capped_without_cycles():
+    """循環がないフローは FLOW_MAX_EXECUTIONS を超える上限でも打ち切らない"""
+    agent_count = FLOW_MAX_EXECUTIONS + 20
+    flow = make_flow(agent_count, [(index, index + 1, ConnectionType.SEQUENTIAL)
+                                   for index in range(agent_count - 1)])
+    analysis = analyze(flow)
+    assert analysis.execution_bound == agent_count
+    assert "execution_bound_capped" not in codes(analysis)
+
+
+def test_execution_bound_with_cycle():
+    """循環があるフローでは到達可能なエージェント数 × FLOW_LOOP_ITERATIONS が上限になる"""
+    flow = make_flow(2, [(0, 1, ConnectionType.SEQUENTIAL), (1, 0, ConnectionType.SEQUENTIAL)])
+    analysis = analyze(flow)
+    assert len(analysis.cycles) == 1
+    assert analysis.execution_bound == 2 * FLOW_LOOP_ITERATIONS
+    assert "unconditional_cycle" in codes(analysis)
+
+
+def test_execution_bound_with_cycle_is_capped():
+    """循環があるフローの上限は FLOW_MAX_EXECUTIONS で打ち切られる"""
+    agent_count = FLOW_MAX_EXECUTIONS // FLOW_LOOP_ITERATIONS + 5
+    edges = [(index, index + 1, ConnectionType.SEQUENTIAL) for index in range(agent_count - 1)]
+    edges.append((agent_count - 1, 0, ConnectionType.CONDITIONAL, "contains('again')"))
+    analysis = analyze(make_flow(agent_count, edges))
+    assert analysis.execution_bound == FLOW_MAX_EXECUTIONS
+    assert {"cycle", "execution_bound_capped"} <= codes(analysis)
+
+
+def test_unreachable_agents_are_excluded():
+    """エントリーポイントから到達できないエージェントは上限に含まれない"""
+    flow = make_flow(3, [(0, 1, ConnectionType.SEQUENTIAL), (2, 2, ConnectionType.SEQUENTIAL)])
+    analysis = analyze(flow)
+    assert len(analysis.reachable) == 2
+    assert analysis.cycles == ()
+    assert analysis.execution_bound == 2
+
+
+def test_missing_entry_point():
+    """エントリーポイントがない場合はエラーになり、上限は0になる"""
+    analysis = analyze(make_flow(2, [(0, 1, ConnectionType.SEQUENTIAL)], entry=None))
+    assert "entry_point_missing" in {issue.code for issue in analysis.errors}
+    assert analysis.execution_bound == 0
+
+
+def test_condition_syntax_error_is_reported():
+    """条件式の構文エラーは保存できない問題として報告される"""
+    flow = make_flow(2, [(0, 1, ConnectionType.CONDITIONAL, "contains(")])
+    assert "condition_syntax" in {issue.code for issue in analyze(flow).errors}
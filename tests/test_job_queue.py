@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+from agents import RunConfig
+
+from src.agent_builder.agent_types import AgentConfig, AgentConnection, AgentFlow, ConnectionType
+from src.agent_flow import flow_runtime
+from src.agent_flow.checkpoint import CheckpointStore
+from src.agent_flow.job_queue import CANCELLED, COMPLETED, FAILED, QUEUED, RUNNING, JobQueue
+from src.agent_flow.worker import FlowWorker
+from src.models.agent import AgentManager
+from src.models.local_model import LocalModelProvider
+
+
+@pytest.fixture
+def queue(tmp_path):
+    """一時ディレクトリのジョブキュー"""
+    return JobQueue(str(tmp_path / "jobs.sqlite3"))
+
+
+@pytest.fixture
+def checkpoints(monkeypatch, tmp_path):
+    """エージェントの呼び出し先をローカルモデルに切り替え、ワーカーのチェックポイントの保存先を一時ディレクトリにする"""
+    previous = AgentManager.run_config
+    AgentManager.run_config = RunConfig(model_provider=LocalModelProvider(output_tokens=5), tracing_disabled=True)
+    monkeypatch.setattr(flow_runtime, "TRACE_EXPORT_PATH", "")
+    store = CheckpointStore(str(tmp_path / "checkpoints"))
+    monkeypatch.setattr(flow_runtime, "get_checkpoint_store", lambda: store)
+    yield store
+    AgentManager.run_config = previous
+
+
+def make_chain(count):
+    """レスポンスキャッシュを使わない直列のフローを作成する"""
+    agents = [AgentConfig(name=f"agent{index}", instructions=f"step {index}", model="gpt-3.5-turbo",
+                          cache_enabled=False) for index in range(count)]
+    connections = [AgentConnection(source_id=agents[index].id, target_id=agents[index + 1].id,
+                                   connection_type=ConnectionType.SEQUENTIAL) for index in range(count - 1)]
+    return AgentFlow(name="chain", description="test", agents=agents, connections=connections,
+                     entry_point_id=agents[0].id)
+
+
+def execute(queue, worker_id="worker"):
+    """ジョブを1件取得し、ワーカーで最後まで実行する"""
+    worker = FlowWorker(queue)
+    worker.worker_id = worker_id
+    job = queue.claim(worker_id)
+    worker._events[job["id"]] = []
+    asyncio.run(worker._execute(job))
+    return queue.get(job["id"], include_result=True)
+
+
+def test_claim_and_finish(queue):
+    """古い順に取得して実行中にし、終了と残りのイベントを記録する"""
+    flow = make_chain(1)
+    first = queue.submit(flow, "一つ目")
+    second = queue.submit(flow, "二つ目")
+
+    job = queue.claim("worker")
+    assert job["id"] == first and job["status"] == RUNNING and job["attempts"] == 1
+    assert job["flow"]["id"] == flow.id
+
+    queue.finish(first, "worker", COMPLETED, [("log", {"message": "done"})], result={"final_response": "ok"})
+    assert queue.get(first, include_result=True)["result"] == {"final_response": "ok"}
+    assert [event["type"] for event in queue.events(first)] == ["log", "status"]
+    assert queue.events(first, after_seq=1)[0]["data"] == {"status": COMPLETED}
+    assert queue.count_by_status() == {QUEUED: 1, RUNNING: 0, COMPLETED: 1, FAILED: 0, CANCELLED: 0}
+
+    assert queue.cancel(second)
+    assert queue.get(second)["status"] == CANCELLED
+    assert not queue.cancel(second)
+
+
+def test_stale_job_is_handed_over(queue):
+    """ハートビートが途絶えたジョブは再開の指定付きで実行待ちに戻り、元のワーカーの書き込みは無視される"""
+    job_id = queue.submit(make_chain(1), "質問")
+    queue.claim("old")
+    assert queue.requeue_stale(stale_seconds=-1) == 1
+
+    job = queue.get(job_id)
+    assert job["status"] == QUEUED and job["resume"]
+    cancelled, lost = queue.heartbeat("old", {job_id: [("log", {"message": "late"})]})
+    assert cancelled == [] and lost == [job_id]
+
+    assert queue.claim("new")["attempts"] == 2
+    queue.finish(job_id, "old", COMPLETED)
+    assert queue.get(job_id)["status"] == RUNNING
+    assert queue.events(job_id) == []
+
+
+def test_cancel_running_job_is_reported_to_worker(queue):
+    """実行中のジョブの取り消しは、次のハートビートでワーカーに伝わる"""
+    job_id = queue.submit(make_chain(1), "質問")
+    queue.claim("worker")
+    assert queue.cancel(job_id)
+    assert queue.heartbeat("worker", {job_id: []}) == ([job_id], [])
+
+
+def test_worker_runs_job(queue, checkpoints):
+    """ワーカーはジョブのフローを実行し、結果を記録してチェックポイントを削除する"""
+    job_id = queue.submit(make_chain(2), "質問", stream=True)
+    job = execute(queue)
+    assert job["status"] == COMPLETED and job["error"] is None
+    assert [hop["replayed"] for hop in job["result"]["hops"]] == [False, False]
+    assert checkpoints.load(job["run_id"]) is None
+    assert queue.events(job_id)[-1]["data"] == {"status": COMPLETED}
+
+
+def test_worker_resumes_from_checkpoint(queue, checkpoints):
+    """再開のジョブは記録済みのホップを呼び出さずに、失敗したホップから実行する"""
+    flow = make_chain(2)
+    first, second = flow.agents
+    checkpoints.start("interrupted", flow, flow_runtime.FlowRuntime(flow).plan.fingerprint, "質問")
+    checkpoints.record_hop("interrupted", first.id, "質問", "一つ目の応答", second.id)
+    checkpoints.record_failure("interrupted", second.id, "boom")
+    queue.submit(flow, "", resume_run_id="interrupted")
+
+    job = execute(queue)
+    assert job["status"] == COMPLETED
+    assert [hop["replayed"] for hop in job["result"]["hops"]] == [True, False]
+
+
+def test_resume_without_checkpoint_fails(queue, checkpoints):
+    """チェックポイントが削除された再開のジョブは、空の入力で最初から実行せずに失敗する"""
+    queue.submit(make_chain(1), "", resume_run_id="expired")
+    job = execute(queue)
+    assert job["status"] == FAILED and job["result"] is None
+    assert "expired" in job["error"] and "チェックポイント" in job["error"]
@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+import pytest
+from agents import RunConfig
+
+from src.agent_builder.agent_types import AgentConfig, AgentFlow
+from src.agent_flow import flow_runtime, job_server
+from src.agent_flow.checkpoint import CheckpointStore
+from src.agent_flow.job_queue import JobQueue
+from src.agent_flow.job_server import JobServer
+from src.agent_flow.worker import FlowWorker
+from src.models.agent import AgentManager
+from src.models.local_model import LocalModelProvider
+
+
+@pytest.fixture
+def flow(monkeypatch):
+    """ジョブAPIが読み込む保存済みのフローを1件にする"""
+    agent = AgentConfig(name="agent", instructions="test", model="gpt-3.5-turbo", cache_enabled=False)
+    flow = AgentFlow(name="test", description="test", agents=[agent], entry_point_id=agent.id)
+    monkeypatch.setattr(job_server, "load_flows", lambda: {flow.id: flow})
+    return flow
+
+
+@pytest.fixture
+def local_model(monkeypatch, tmp_path):
+    """エージェントの呼び出し先を遅延なしのローカルモデルに切り替え、ワーカーの実行の出力先を一時ディレクトリにする"""
+    # ワーカーが作成する共有クライアントにはAPIキーが必要（ローカルモデルでは使われない）
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(flow_runtime, "TRACE_EXPORT_PATH", "")
+    store = CheckpointStore(str(tmp_path / "checkpoints"))
+    monkeypatch.setattr(flow_runtime, "get_checkpoint_store", lambda: store)
+    previous = AgentManager.run_config
+    AgentManager.run_config = RunConfig(model_provider=LocalModelProvider(output_tokens=5), tracing_disabled=True)
+    yield
+    AgentManager.run_config = previous
+
+
+async def request(port, method, path, body=None, headers=""):
+    """1件のリクエストを送り、ステータスコードとボディを返す"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nConnection: close\r\nContent-Length: {len(payload)}\r\n{headers}\r\n"
+                 .encode() + payload)
+    await writer.drain()
+    response = (await reader.read()).decode()
+    writer.close()
+    head, _, content = response.partition("\r\n\r\n")
+    return int(head.split()[1]), content
+
+
+def serve(server, client):
+    """ジョブAPIサーバーを起動し、client(port) を実行する"""
+    async def main():
+        listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+        async with listener:
+            return await asyncio.wait_for(client(listener.sockets[0].getsockname()[1]), 30)
+
+    return asyncio.run(main())
+
+
+def test_token_is_required(tmp_path, flow):
+    """トークンを指定した場合は、正しいBearerトークンのないリクエストを 401 で拒否する"""
+    server = JobServer(JobQueue(str(tmp_path / "jobs.sqlite3")), token="secret")
+
+    async def client(port):
+        return [(await request(port, "GET", "/health", headers=headers))[0]
+                for headers in ("", "Authorization: Bearer wrong\r\n", "Authorization: Bearer secret\r\n")]
+
+    assert serve(server, client) == [401, 401, 200]
+
+
+def test_invalid_requests(tmp_path, flow):
+    """存在しないジョブは 404、負のイベントの連番は 400、実行待ちの上限を超えた投入は 503 を返す"""
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job_id = queue.submit(flow, "質問")
+    server = JobServer(queue, max_queued=1, token=None)
+
+    async def client(port):
+        return [
+            (await request(port, "GET", "/jobs/missing"))[0],
+            (await request(port, "GET", f"/jobs/{job_id}/events?after=-1"))[0],
+            (await request(port, "GET", f"/jobs/{job_id}/events", headers="Last-Event-ID: -1\r\n"))[0],
+            (await request(port, "POST", "/jobs", {"flow": flow.name, "input": "質問"}))[0],
+            (await request(port, "POST", "/jobs", {"flow": "missing", "input": "質問"}))[0],
+        ]
+
+    assert serve(server, client) == [404, 400, 400, 503, 404]
+
+
+def test_jobs_run_on_workers(tmp_path, flow, local_model):
+    """投入したジョブはワーカーが実行し、イベントと結果をジョブキューから受け取れる"""
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    server = JobServer(queue, token=None, poll_interval=0.01)
+
+    async def client(port):
+        status, content = await request(port, "POST", "/jobs", {"flow": flow.name, "input": "質問", "stream": True})
+        assert status == 202
+        job_id = json.loads(content)["job_id"]
+        worker = asyncio.create_task(FlowWorker(queue, poll_interval=0.01).run())
+        try:
+            _, events = await request(port, "GET", f"/jobs/{job_id}/events")
+            result = await request(port, "GET", f"/jobs/{job_id}/result?wait=5")
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+        return events, result
+
+    events, (status, content) = serve(server, client)
+    event_types = [line.split(": ", 1)[1] for line in events.splitlines() if line.startswith("event: ")]
+    assert event_types[0] == "status" and event_types[-1] == "end" and "message" in event_types
+    job = json.loads(content)
+    assert status == 200 and job["status"] == "completed"
+    assert job["result"]["final_response"]
+
+
+def test_worker_merges_consecutive_deltas(tmp_path):
+    """同じストリームの連続した差分は、書き込むまでに1件にまとめられる"""
+    worker = FlowWorker(JobQueue(str(tmp_path / "jobs.sqlite3")))
+    worker._events["job"] = []
+    for delta in ("こん", "にち", "は"):
+        worker._publish("job", "delta", {"stream": 1, "name": "agent", "delta": delta})
+    worker._publish("job", "delta", {"stream": 2, "name": "other", "delta": "別"})
+    worker._publish("job", "delta", {"stream": 2, "name": "other", "delta": "の応答"})
+    assert worker._events["job"] == [
+        ("delta", {"stream": 1, "name": "agent", "delta": "こんにちは"}),
+        ("delta", {"stream": 2, "name": "other", "delta": "別の応答"}),
+    ]
@@ -0,0 +1,86 @@
+import os
+import pickle
+
+import pytest
+
+from src.agent_builder.agent_types import AgentConfig, AgentFlow
+from src.utils import persistence
+from src.utils.persistence import ObjectStore, record_digests
+
+
+@pytest.fixture
+def store_path(tmp_path, monkeypatch):
+    """一時ディレクトリのストアのパス（移行元のpickleファイルも一時ディレクトリにする）"""
+    monkeypatch.setattr(persistence, "AGENTS_FILE", str(tmp_path / "agents.pickle"))
+    monkeypatch.setattr(persistence, "FLOWS_FILE", str(tmp_path / "flows.pickle"))
+    return str(tmp_path / "store.sqlite3")
+
+
+def make_agent(name):
+    """エージェント設定を作成する"""
+    return AgentConfig(name=name, instructions=f"{name} の指示", model="gpt-3.5-turbo")
+
+
+def updated_at(store, table):
+    """レコードごとの最終更新時刻を取得する"""
+    return dict(store._db.execute(f"SELECT id, updated_at FROM {table}"))
+
+
+def test_save_and_load(store_path):
+    """保存したレコードを読み込め、読み込んだレコードを変更してもストアには影響しない"""
+    store = ObjectStore(store_path)
+    agent = make_agent("agent")
+    flow = AgentFlow(name="flow", description="test", agents=[agent], entry_point_id=agent.id)
+    store.save("agents", {agent.id: agent}, {})
+    store.save("flows", {flow.id: flow}, {})
+
+    loaded = store.load("agents")
+    assert loaded[agent.id].name == "agent"
+    loaded[agent.id].name = "changed"
+    assert store.load("agents")[agent.id].name == "agent"
+    assert store.load("flows")[flow.id].agents[0].id == agent.id
+
+
+def test_save_writes_only_changes(store_path):
+    """変更されたレコードだけを書き込み、なくなったレコードは削除する"""
+    store = ObjectStore(store_path)
+    first, second, third = make_agent("first"), make_agent("second"), make_agent("third")
+    saved = store.save("agents", {first.id: first, second.id: second, third.id: third}, {})
+    before = updated_at(store, "agents")
+
+    second.instructions = "変更した指示"
+    saved = store.save("agents", {first.id: first, second.id: second}, saved)
+
+    after = updated_at(store, "agents")
+    assert set(after) == {first.id, second.id}
+    assert after[first.id] == before[first.id] and after[second.id] > before[second.id]
+    assert store.load("agents")[second.id].instructions == "変更した指示"
+    assert saved == record_digests({first.id: first, second.id: second})
+
+
+def test_changes_from_other_processes_are_loaded(store_path):
+    """同じファイルを使う別のストア（別のプロセス）の書き込みは、次の読み込みで反映される"""
+    reader = ObjectStore(store_path)
+    writer = ObjectStore(store_path)
+    agent = make_agent("agent")
+    assert reader.load("agents") == {}
+
+    writer.save("agents", {agent.id: agent}, {})
+    assert list(reader.load("agents")) == [agent.id]
+
+
+def test_pickle_files_are_migrated(store_path):
+    """以前のバージョンのpickleファイルはストアに取り込み、取り込み済みとして名前を変更する"""
+    agent = make_agent("agent")
+    flow = AgentFlow(name="flow", description="test", agents=[agent], entry_point_id=agent.id)
+    with open(persistence.AGENTS_FILE, "wb") as f:
+        pickle.dump({agent.id: agent}, f)
+    with open(persistence.FLOWS_FILE, "wb") as f:
+        pickle.dump({flow.id: flow}, f)
+
+    store = ObjectStore(store_path)
+
+    assert store.load("agents")[agent.id].name == "agent"
+    assert store.load("flows")[flow.id].name == "flow"
+    assert not os.path.exists(persistence.AGENTS_FILE)
+    assert os.path.exists(persistence.AGENTS_FILE + ".migrated")
@@ -0,0 +1,72 @@
+import time
+
+from src.models.response_cache import ResponseCache
+
+
+def make_cache(tmp_path, **options):
+    """一時ディレクトリのSQLiteファイルを使うキャッシュを作成する"""
+    return ResponseCache(str(tmp_path / "responses.sqlite3"), **options)
+
+
+def test_memory_and_disk_hits(tmp_path):
+    """メモリから溢れたエントリはディスクから取得でき、メモリに戻される"""
+    cache = make_cache(tmp_path, max_memory_entries=1)
+    cache.set("a", "応答A")
+    cache.set("b", "応答B")
+
+    assert cache.get("b") == "応答B"
+    assert cache.get("a") == "応答A"
+    assert cache.get("missing") is None
+    stats = cache.get_stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["memory_entries"] == 1 and stats["disk_entries"] == 2
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    """有効期限を過ぎたエントリは返さずに削除する"""
+    cache = make_cache(tmp_path, ttl=0.01)
+    cache.set("a", "応答A")
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.get_stats()["disk_entries"] == 0
+
+
+def test_disk_eviction_removes_least_recently_used(tmp_path):
+    """件数が上限を超えた場合は、最後に参照された時刻が古いエントリから削除する"""
+    cache = make_cache(tmp_path, max_memory_entries=0, max_disk_entries=2)
+    cache.set("a", "応答A")
+    cache.set("b", "応答B")
+    cache.get("a")
+    cache.set("c", "応答C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "応答A" and cache.get("c") == "応答C"
+    assert cache.get_stats()["disk_entries"] == 2
+
+
+def test_overwrite_does_not_count_twice(tmp_path):
+    """同じキーの上書きでは件数が増えない"""
+    cache = make_cache(tmp_path, max_memory_entries=0, max_disk_entries=2)
+    for response in ("一回目", "二回目", "三回目"):
+        cache.set("a", response)
+    cache.set("b", "応答B")
+
+    assert cache.get("a") == "三回目" and cache.get("b") == "応答B"
+    assert cache.get_stats()["disk_entries"] == 2
+
+
+def test_entry_count_is_shared_between_processes(tmp_path):
+    """同じファイルを使う別のインスタンス（別のプロセス）の書き込みも件数と上限に反映される"""
+    first = make_cache(tmp_path, max_memory_entries=0, max_disk_entries=3)
+    second = make_cache(tmp_path, max_memory_entries=0, max_disk_entries=3)
+    first.set("a", "応答A")
+    second.set("b", "応答B")
+    second.set("c", "応答C")
+    assert first.get_stats()["disk_entries"] == 3
+
+    first.set("d", "応答D")
+    assert first.get_stats()["disk_entries"] == second.get_stats()["disk_entries"] == 3
+    assert second.get("a") is None
+
+    second.clear()
+    assert first.get_stats()["disk_entries"] == 0
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from src.models.scheduler import RequestScheduler
+
+MODEL = "test-model"
+
+
+def make_scheduler(rpm=6, tpm=1_000_000, share=1.0):
+    """補充が遅く、待ち時間を比較しやすいスケジューラを作成する"""
+    return RequestScheduler({MODEL: {"rpm": rpm, "tpm": tpm}}, share=share)
+
+
+def test_reserve_waits_when_bucket_is_empty():
+    """容量を使い切ると、以降の予約には補充までの待ち時間が付く"""
+    scheduler = make_scheduler()
+    reservations = [scheduler.reserve(MODEL, 10) for _ in range(6)]
+    assert all(reservation.wait == 0 for reservation in reservations)
+    # 1分あたり6回 = 10秒に1回補充される
+    assert scheduler.reserve(MODEL, 10).wait == pytest.approx(10, abs=0.1)
+
+
+def test_release_returns_the_reserved_turn():
+    """返却した予約の分は、次の予約で使える"""
+    scheduler = make_scheduler()
+    reservations = [scheduler.reserve(MODEL, 10) for _ in range(6)]
+    waiting = scheduler.reserve(MODEL, 10)
+    scheduler.release(waiting)
+    scheduler.release(reservations[0])
+    assert scheduler.reserve(MODEL, 10).wait == 0
+
+
+def test_release_is_idempotent():
+    """同じ予約を2回返却しても、返却されるのは1回分だけ"""
+    scheduler = make_scheduler()
+    reservations = [scheduler.reserve(MODEL, 10) for _ in range(6)]
+    scheduler.release(reservations[0])
+    assert scheduler.release(reservations[0]) == 0.0
+    assert scheduler.reserve(MODEL, 10).wait == 0
+    assert scheduler.reserve(MODEL, 10).wait > 0
+
+
+def test_used_reservation_is_not_released():
+    """run で使用した予約は返却されない"""
+    scheduler = make_scheduler()
+    reservation = scheduler.reserve(MODEL, 10)
+
+    async def call():
+        return "ok"
+
+    assert asyncio.run(scheduler.run(MODEL, 10, call, reservation=reservation)) == "ok"
+    assert reservation.used
+    assert scheduler.release(reservation) == 0.0
+    # 使用した1回分とこれから予約する5回分で容量を使い切る
+    assert all(scheduler.reserve(MODEL, 10).wait == 0 for _ in range(5))
+    assert scheduler.reserve(MODEL, 10).wait > 0
+
+
+def test_share_scales_limits():
+    """share の割合だけレート制限を分け合う"""
+    scheduler = make_scheduler(rpm=60, share=0.5)
+    assert all(scheduler.reserve(MODEL, 10).wait == 0 for _ in range(30))
+    assert scheduler.reserve(MODEL, 10).wait > 0
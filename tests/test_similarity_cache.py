@@ -0,0 +1,71 @@
+from src.models.similarity_cache import SimilarityCache, normalize_text, shingles
+
+QUESTION = "注文した商品がまだ届かないのですが、配送状況を確認する方法を教えてください。"
+
+
+def make_cache(tmp_path, **options):
+    """一時ディレクトリのSQLiteファイルを使うキャッシュを作成する"""
+    return SimilarityCache(str(tmp_path / "similarity.sqlite3"), **options)
+
+
+def test_normalize_strips_polite_phrases_at_clause_boundaries():
+    """前置きは文・節の始め、丁寧な言い方は文・節の終わりにある場合だけ取り除く"""
+    assert normalize_text("すみません、注文した商品が届きません。お願いします") == "注文した商品が届きません"
+    assert normalize_text("恐れ入りますが、返品の方法を教えてください！") == "返品の方法を"
+    assert normalize_text("ＡＰＩの　上限は？") == "apiの上限は"
+
+
+def test_normalize_keeps_phrases_inside_words():
+    """文中の「ますます」「済ます」などは丁寧表現として取り除かない"""
+    assert normalize_text("ますます便利になりますか？") == "ますます便利になり"
+    assert normalize_text("支払いを済ますにはどうすればいいですか") == "支払いを済ますにはどうすればいい"
+    assert normalize_text("ますます") == "ます"
+    assert normalize_text("ご連絡ください、すみません") == "ご連絡"
+
+
+def test_shingles():
+    """文字2-gramに分割し、短い入力はそのまま1つの要素にする"""
+    assert shingles("abcd") == frozenset({"ab", "bc", "cd"})
+    assert shingles("a") == frozenset({"a"})
+    assert shingles("") == frozenset()
+
+
+def test_lookup_reuses_paraphrased_question(tmp_path):
+    """句読点や丁寧表現だけが異なる質問には、保存した応答を返す"""
+    cache = make_cache(tmp_path)
+    cache.add("agent", QUESTION, "配送状況はマイページで確認できます。")
+
+    hit = cache.lookup("agent", "すみません、注文した商品がまだ届かないのですが配送状況を確認する方法を教えて下さい")
+    assert hit is not None and hit.question == QUESTION
+    assert hit.response == "配送状況はマイページで確認できます。"
+    assert cache.lookup("other", QUESTION) is None
+
+
+def test_lookup_distinguishes_different_questions(tmp_path):
+    """1語だけ異なる質問や、語を入れ替えた質問には応答を再利用しない"""
+    cache = make_cache(tmp_path)
+    cache.add("agent", QUESTION, "配送状況はマイページで確認できます。")
+
+    assert cache.lookup("agent", QUESTION.replace("届かない", "届いた")) is None
+    assert cache.lookup("agent", "配送状況を確認する方法を教えてください。注文した商品がまだ届かないのですが") is None
+
+
+def test_false_hit_reports_block_reuse(tmp_path):
+    """報告された質問ではその応答を再利用せず、報告が上限に達した応答は再利用の対象から外す"""
+    cache = make_cache(tmp_path, max_false_hits=2)
+    cache.add("agent", QUESTION, "配送状況はマイページで確認できます。")
+    paraphrase = QUESTION.replace("配送状況", "配送の状況")
+    entry_id = cache.lookup("agent", paraphrase).entry_id
+
+    assert cache.report_false_hit(entry_id, paraphrase)
+    assert cache.lookup("agent", paraphrase + "！") is None
+    assert cache.lookup("agent", "すみません、" + QUESTION) is not None
+
+    assert cache.report_false_hit(entry_id, QUESTION)
+    assert cache.lookup("agent", QUESTION) is None
+
+
+def test_entries_are_reloaded_from_disk(tmp_path):
+    """保存した質問は、新しいインスタンス（別のプロセス）でも再利用できる"""
+    make_cache(tmp_path).add("agent", QUESTION, "配送状況はマイページで確認できます。")
+    assert make_cache(tmp_path).lookup("agent", QUESTION + "！") is not None
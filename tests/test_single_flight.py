@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from src.models.single_flight import SingleFlight
+
+
+class Counter:
+    """呼び出し回数を数え、指定した時間待ってから結果を返す関数"""
+
+    def __init__(self, delay=0.05, result="ok", error=None):
+        self.calls = 0
+        self.delay = delay
+        self.result = result
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_calls_are_coalesced():
+    """同時に実行中の同じキーの呼び出しは1回の実行の結果を共有する"""
+    single_flight = SingleFlight()
+    func = Counter()
+
+    async def main():
+        return await asyncio.gather(*(single_flight.run("key", func) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert func.calls == 1
+    assert [result for result, _ in results] == ["ok"] * 5
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    stats = single_flight.get_stats()
+    assert stats["coalesced"] == 4 and stats["in_flight"] == 0
+
+
+def test_errors_are_shared():
+    """実行が失敗した場合は、待っていた呼び出しにも同じ例外が渡される"""
+    single_flight = SingleFlight()
+    func = Counter(error=RuntimeError("boom"))
+
+    async def main():
+        return await asyncio.gather(*(single_flight.run("key", func) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert func.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert single_flight.get_stats()["in_flight"] == 0
+
+
+def test_waiter_takes_over_when_leader_is_cancelled():
+    """リーダーが取り消された場合は、待っていた呼び出しが改めて実行する"""
+    single_flight = SingleFlight()
+    func = Counter()
+
+    async def main():
+        leader = asyncio.create_task(single_flight.run("key", func))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(single_flight.run("key", func))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(main()) == ("ok", False)
+    assert func.calls == 2
+    stats = single_flight.get_stats()
+    assert stats["takeovers"] == 1 and stats["in_flight"] == 0
+
+
+def test_waiter_takes_over_when_leader_exits_with_base_exception():
+    """リーダーが Exception 以外の例外で抜けた場合もキーを手放し、待っていた呼び出しが実行する"""
+    single_flight = SingleFlight()
+
+    class Interrupted(BaseException):
+        pass
+
+    calls = []
+
+    async def func():
+        calls.append(None)
+        await asyncio.sleep(0.05)
+        if len(calls) == 1:
+            raise Interrupted()
+        return "ok"
+
+    async def main():
+        leader = asyncio.create_task(single_flight.run("key", func))
+        await asyncio.sleep(0.01)
+        # キーが残ったままだと待ち続けるため、時間を区切る
+        waiter = asyncio.create_task(asyncio.wait_for(single_flight.run("key", func), 1.0))
+        return await asyncio.gather(leader, waiter, return_exceptions=True)
+
+    leader_result, waiter_result = asyncio.run(main())
+    assert isinstance(leader_result, Interrupted)
+    assert waiter_result == ("ok", False)
+    assert single_flight.get_stats()["in_flight"] == 0
+
+
+def test_cancelled_waiter_does_not_cancel_leader():
+    """待っている呼び出しが取り消されても、リーダーの実行は続く"""
+    single_flight = SingleFlight()
+    func = Counter()
+
+    async def main():
+        leader = asyncio.create_task(single_flight.run("key", func))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(single_flight.run("key", func))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        return await leader
+
+    assert asyncio.run(main()) == ("ok", False)
+    assert func.calls == 1